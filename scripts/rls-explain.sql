@@ -0,0 +1,44 @@
+-- ============================================================
+-- rls-explain.sql
+-- EXPLAIN (ANALYZE) of a read as a given user, for
+-- tests/rls/tracing.py (run_rls_tests.py --explain-slowest).
+-- Sets the caller's JWT claims and role for the transaction so the
+-- plan includes the RLS policy predicates, then switches back.
+-- Callable by service_role only; single SELECT statements only.
+-- service_role must be allowed to SET ROLE to anon/authenticated.
+-- Run manually in Supabase SQL Editor
+-- Date: 2026-10-17
+-- ============================================================
+
+BEGIN;
+
+GRANT anon, authenticated TO service_role;
+
+CREATE OR REPLACE FUNCTION public.rls_explain(p_claims jsonb, p_query text)
+RETURNS json AS $$
+DECLARE
+  v_caller text := current_user;
+  v_role text := COALESCE(p_claims ->> 'role', 'anon');
+  v_plan json;
+BEGIN
+  IF v_role NOT IN ('anon', 'authenticated') THEN
+    RAISE EXCEPTION 'rls_explain: role % not allowed', v_role;
+  END IF;
+  IF p_query !~* '^\s*select\s' OR position(';' IN p_query) > 0 THEN
+    RAISE EXCEPTION 'rls_explain: only a single SELECT statement is allowed';
+  END IF;
+
+  PERFORM set_config('request.jwt.claims', p_claims::text, true);
+  PERFORM set_config('request.jwt.claim.sub', COALESCE(p_claims ->> 'sub', ''), true);
+  EXECUTE format('SET LOCAL ROLE %I', v_role);
+  EXECUTE 'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ' || p_query INTO v_plan;
+  EXECUTE format('SET LOCAL ROLE %I', v_caller);
+
+  RETURN v_plan;
+END;
+$$ LANGUAGE plpgsql VOLATILE;
+
+REVOKE ALL ON FUNCTION public.rls_explain(jsonb, text) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.rls_explain(jsonb, text) TO service_role;
+
+COMMIT;
@@ -0,0 +1,48 @@
+-- ============================================================
+-- rls-fixture-snapshot.sql
+-- Single-call fixture snapshot for tests/rls/run_rls_tests.py
+-- (--snapshot-rpc). Returns the same samples discover_test_data()
+-- otherwise collects with eight separate PostgREST requests.
+-- Callable by service_role only.
+-- Run manually in Supabase SQL Editor
+-- Date: 2026-10-17
+-- ============================================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.rls_fixture_snapshot()
+RETURNS json AS $$
+  SELECT json_build_object(
+    'profiles', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'email', email, 'full_name', full_name, 'role', role))
+      FROM profiles), '[]'::json),
+    'groups', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'name', name))
+      FROM groups), '[]'::json),
+    'members', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'group_id', group_id, 'user_id', user_id,
+                                        'role_in_group', role_in_group))
+      FROM group_members), '[]'::json),
+    'rocks', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'title', title, 'group_id', group_id, 'owner_id', owner_id))
+      FROM (SELECT * FROM rocks LIMIT 10) r), '[]'::json),
+    'issues', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'description', description, 'group_id', group_id,
+                                        'raised_by', raised_by))
+      FROM (SELECT * FROM issues LIMIT 5) i), '[]'::json),
+    'meetings', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'meeting_date', meeting_date, 'group_id', group_id))
+      FROM (SELECT * FROM meetings LIMIT 5) m), '[]'::json),
+    'quarters', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'label', label, 'is_current', is_current))
+      FROM (SELECT * FROM quarters LIMIT 5) q), '[]'::json),
+    'rock_ideas', COALESCE((
+      SELECT json_agg(json_build_object('id', id, 'description', description, 'group_id', group_id))
+      FROM (SELECT * FROM rock_ideas LIMIT 5) ri), '[]'::json)
+  );
+$$ LANGUAGE sql STABLE;
+
+REVOKE ALL ON FUNCTION public.rls_fixture_snapshot() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.rls_fixture_snapshot() TO service_role;
+
+COMMIT;
@@ -0,0 +1,666 @@
+-- ============================================================
+-- rls-initplan-helpers.sql
+-- Evaluate the RLS helper lookups once per statement instead of
+-- once per row
+-- Depends on: 00002_rls_policies.sql, fix-rls-security.sql,
+--   scorecard-schema.sql, scorecard-rls.sql
+-- Run manually in Supabase SQL Editor AFTER scorecard-rls.sql
+-- Date: 2026-10-17
+-- ============================================================
+--
+-- Problem: user_group_ids(), user_role() and is_admin_or_sysadmin()
+-- are SECURITY DEFINER, so the planner cannot inline them, and a
+-- policy such as
+--
+--   group_id = ANY(public.user_group_ids())
+--
+-- calls them, and re-reads group_members / profiles, for every row
+-- the policy filters. scorecard_measure_group(measure_id) and
+-- is_group_lead_or_exec(group_id) take a per-row argument and run a
+-- three-table join or a group_members lookup per row on top of that.
+-- For a user in many groups reading scorecard_entries this is the
+-- bulk of the query time.
+--
+-- Solution: every policy below is recreated with the same meaning
+-- but with its helper calls (and auth.uid()) wrapped in a scalar
+-- sub-select:
+--
+--   group_id = ANY ((SELECT public.user_group_ids()))
+--
+-- A sub-select that does not reference the row becomes an InitPlan,
+-- run once per statement and reused for every row. Per-row lookups
+-- are turned around: instead of asking for the group of each row,
+-- new set-returning helpers list the rows' keys the caller may
+-- see, once per statement, and the policy tests membership with a
+-- hashed sub-plan:
+--
+--   measure_id IN (SELECT public.user_scorecard_measures())
+--
+-- A per-transaction cache (set_config) was not used: memberships
+-- change inside transactions (RPCs, fixtures), and an InitPlan can
+-- never be stale.
+--
+-- Policies that only compare a column with auth.uid() are left as
+-- they are. tests/rls/policy_cost.py measures every SELECT policy
+-- before and after this script.
+-- ============================================================
+
+BEGIN;
+
+-- ============================================================
+-- Helpers: per-statement lookups
+-- ============================================================
+
+-- Groups in which the caller is group_lead or executive
+-- (is_group_lead_or_exec(g) = is_admin_or_sysadmin() OR g = ANY(this))
+CREATE OR REPLACE FUNCTION public.user_lead_group_ids()
+RETURNS uuid[] AS $$
+  SELECT COALESCE(array_agg(group_id), '{}')
+  FROM group_members
+  WHERE user_id = auth.uid()
+    AND role_in_group IN ('group_lead', 'executive')
+$$ LANGUAGE sql SECURITY DEFINER STABLE;
+
+-- Templates of the caller's groups
+CREATE OR REPLACE FUNCTION public.user_scorecard_templates()
+RETURNS SETOF uuid AS $$
+  SELECT id FROM scorecard_templates
+  WHERE group_id = ANY ((SELECT public.user_group_ids()));
+$$ LANGUAGE sql SECURITY DEFINER STABLE;
+
+-- Sections of the caller's groups (via template)
+CREATE OR REPLACE FUNCTION public.user_scorecard_sections()
+RETURNS SETOF uuid AS $$
+  SELECT s.id
+  FROM scorecard_sections s
+  JOIN scorecard_templates t ON t.id = s.template_id
+  WHERE t.group_id = ANY ((SELECT public.user_group_ids()));
+$$ LANGUAGE sql SECURITY DEFINER STABLE;
+
+-- Measures of the caller's groups (via section -> template)
+CREATE OR REPLACE FUNCTION public.user_scorecard_measures()
+RETURNS SETOF uuid AS $$
+  SELECT m.id
+  FROM scorecard_measures m
+  JOIN scorecard_sections s ON s.id = m.section_id
+  JOIN scorecard_templates t ON t.id = s.template_id
+  WHERE t.group_id = ANY ((SELECT public.user_group_ids()));
+$$ LANGUAGE sql SECURITY DEFINER STABLE;
+
+-- Measures of the groups the caller leads (via section -> template)
+CREATE OR REPLACE FUNCTION public.user_lead_scorecard_measures()
+RETURNS SETOF uuid AS $$
+  SELECT m.id
+  FROM scorecard_measures m
+  JOIN scorecard_sections s ON s.id = m.section_id
+  JOIN scorecard_templates t ON t.id = s.template_id
+  WHERE t.group_id = ANY ((SELECT public.user_lead_group_ids()));
+$$ LANGUAGE sql SECURITY DEFINER STABLE;
+
+-- ============================================================
+-- profiles
+-- ============================================================
+DROP POLICY IF EXISTS "profiles_update_admin" ON profiles;
+CREATE POLICY "profiles_update_admin" ON profiles FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- groups
+-- ============================================================
+DROP POLICY IF EXISTS "groups_select" ON groups;
+CREATE POLICY "groups_select" ON groups FOR SELECT
+  USING (
+    id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "groups_insert" ON groups;
+CREATE POLICY "groups_insert" ON groups FOR INSERT
+  WITH CHECK ((SELECT public.is_admin_or_sysadmin()));
+
+DROP POLICY IF EXISTS "groups_update" ON groups;
+CREATE POLICY "groups_update" ON groups FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- group_members
+-- ============================================================
+DROP POLICY IF EXISTS "group_members_select" ON group_members;
+CREATE POLICY "group_members_select" ON group_members FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "group_members_insert" ON group_members;
+CREATE POLICY "group_members_insert" ON group_members FOR INSERT
+  WITH CHECK (
+    (SELECT public.is_admin_or_sysadmin())
+    OR EXISTS (
+      SELECT 1 FROM group_members
+      WHERE group_id = group_members.group_id
+      AND user_id = (SELECT auth.uid())
+      AND role_in_group = 'admin'
+    )
+  );
+
+DROP POLICY IF EXISTS "group_members_delete" ON group_members;
+CREATE POLICY "group_members_delete" ON group_members FOR DELETE
+  USING (
+    (SELECT public.is_admin_or_sysadmin())
+    OR EXISTS (
+      SELECT 1 FROM group_members gm
+      WHERE gm.group_id = group_members.group_id
+      AND gm.user_id = (SELECT auth.uid())
+      AND gm.role_in_group = 'admin'
+    )
+  );
+
+-- ============================================================
+-- quarters
+-- ============================================================
+DROP POLICY IF EXISTS "quarters_insert" ON quarters;
+CREATE POLICY "quarters_insert" ON quarters FOR INSERT
+  WITH CHECK ((SELECT public.is_admin_or_sysadmin()));
+
+DROP POLICY IF EXISTS "quarters_update" ON quarters;
+CREATE POLICY "quarters_update" ON quarters FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- rocks
+-- ============================================================
+DROP POLICY IF EXISTS "rocks_select" ON rocks;
+CREATE POLICY "rocks_select" ON rocks FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "rocks_insert" ON rocks;
+CREATE POLICY "rocks_insert" ON rocks FOR INSERT
+  WITH CHECK (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "rocks_update" ON rocks;
+CREATE POLICY "rocks_update" ON rocks FOR UPDATE
+  USING (
+    owner_id = (SELECT auth.uid())
+    OR EXISTS (
+      SELECT 1 FROM group_members
+      WHERE group_id = rocks.group_id
+      AND user_id = (SELECT auth.uid())
+      AND role_in_group = 'admin'
+    )
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "rocks_delete" ON rocks;
+CREATE POLICY "rocks_delete" ON rocks FOR DELETE
+  USING (
+    owner_id = (SELECT auth.uid())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- milestones
+-- ============================================================
+DROP POLICY IF EXISTS "milestones_select" ON milestones;
+CREATE POLICY "milestones_select" ON milestones FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM rocks
+      WHERE rocks.id = milestones.rock_id
+      AND (
+        rocks.group_id = ANY ((SELECT public.user_group_ids()))
+        OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+      )
+    )
+  );
+
+DROP POLICY IF EXISTS "milestones_insert" ON milestones;
+CREATE POLICY "milestones_insert" ON milestones FOR INSERT
+  WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM rocks
+      WHERE rocks.id = milestones.rock_id
+      AND rocks.group_id = ANY ((SELECT public.user_group_ids()))
+    )
+  );
+
+DROP POLICY IF EXISTS "milestones_update" ON milestones;
+CREATE POLICY "milestones_update" ON milestones FOR UPDATE
+  USING (
+    EXISTS (
+      SELECT 1 FROM rocks
+      WHERE rocks.id = milestones.rock_id
+      AND (
+        rocks.owner_id = (SELECT auth.uid())
+        OR EXISTS (
+          SELECT 1 FROM group_members
+          WHERE group_id = rocks.group_id
+          AND user_id = (SELECT auth.uid())
+          AND role_in_group = 'admin'
+        )
+        OR (SELECT public.is_admin_or_sysadmin())
+      )
+    )
+  );
+
+DROP POLICY IF EXISTS "milestones_delete" ON milestones;
+CREATE POLICY "milestones_delete" ON milestones FOR DELETE
+  USING (
+    EXISTS (
+      SELECT 1 FROM rocks
+      WHERE rocks.id = milestones.rock_id
+      AND (rocks.owner_id = (SELECT auth.uid()) OR (SELECT public.is_admin_or_sysadmin()))
+    )
+  );
+
+-- ============================================================
+-- milestone_collaborators
+-- ============================================================
+DROP POLICY IF EXISTS "milestone_collabs_select" ON milestone_collaborators;
+CREATE POLICY "milestone_collabs_select" ON milestone_collaborators FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM milestones m
+      JOIN rocks r ON r.id = m.rock_id
+      WHERE m.id = milestone_collaborators.milestone_id
+      AND (
+        r.group_id = ANY ((SELECT public.user_group_ids()))
+        OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+      )
+    )
+  );
+
+DROP POLICY IF EXISTS "milestone_collabs_insert" ON milestone_collaborators;
+CREATE POLICY "milestone_collabs_insert" ON milestone_collaborators FOR INSERT
+  WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM milestones m
+      JOIN rocks r ON r.id = m.rock_id
+      WHERE m.id = milestone_collaborators.milestone_id
+      AND r.group_id = ANY ((SELECT public.user_group_ids()))
+    )
+  );
+
+DROP POLICY IF EXISTS "milestone_collabs_delete" ON milestone_collaborators;
+CREATE POLICY "milestone_collabs_delete" ON milestone_collaborators FOR DELETE
+  USING (
+    EXISTS (
+      SELECT 1 FROM milestones m
+      JOIN rocks r ON r.id = m.rock_id
+      WHERE m.id = milestone_collaborators.milestone_id
+      AND (r.owner_id = (SELECT auth.uid()) OR (SELECT public.is_admin_or_sysadmin()))
+    )
+  );
+
+-- ============================================================
+-- focus_snapshots
+-- ============================================================
+DROP POLICY IF EXISTS "focus_snapshots_select" ON focus_snapshots;
+CREATE POLICY "focus_snapshots_select" ON focus_snapshots FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+-- ============================================================
+-- focus_items
+-- ============================================================
+DROP POLICY IF EXISTS "focus_items_select" ON focus_items;
+CREATE POLICY "focus_items_select" ON focus_items FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM focus_snapshots fs
+      WHERE fs.id = focus_items.snapshot_id
+      AND (
+        fs.group_id = ANY ((SELECT public.user_group_ids()))
+        OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+      )
+    )
+  );
+
+-- ============================================================
+-- issues
+-- ============================================================
+DROP POLICY IF EXISTS "issues_select" ON issues;
+CREATE POLICY "issues_select" ON issues FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "issues_insert" ON issues;
+CREATE POLICY "issues_insert" ON issues FOR INSERT
+  WITH CHECK (group_id = ANY ((SELECT public.user_group_ids())));
+
+DROP POLICY IF EXISTS "issues_update" ON issues;
+CREATE POLICY "issues_update" ON issues FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- todos
+-- ============================================================
+DROP POLICY IF EXISTS "todos_select" ON todos;
+CREATE POLICY "todos_select" ON todos FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "todos_insert" ON todos;
+CREATE POLICY "todos_insert" ON todos FOR INSERT
+  WITH CHECK (group_id = ANY ((SELECT public.user_group_ids())));
+
+DROP POLICY IF EXISTS "todos_update" ON todos;
+CREATE POLICY "todos_update" ON todos FOR UPDATE
+  USING (
+    assigned_to_id = (SELECT auth.uid())
+    OR group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- meetings
+-- ============================================================
+DROP POLICY IF EXISTS "meetings_select" ON meetings;
+CREATE POLICY "meetings_select" ON meetings FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "meetings_insert" ON meetings;
+CREATE POLICY "meetings_insert" ON meetings FOR INSERT
+  WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM group_members
+      WHERE group_id = meetings.group_id
+      AND user_id = (SELECT auth.uid())
+      AND role_in_group = 'admin'
+    )
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "meetings_update" ON meetings;
+CREATE POLICY "meetings_update" ON meetings FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- meeting_attendees
+-- ============================================================
+DROP POLICY IF EXISTS "meeting_attendees_select" ON meeting_attendees;
+CREATE POLICY "meeting_attendees_select" ON meeting_attendees FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM meetings m
+      WHERE m.id = meeting_attendees.meeting_id
+      AND (
+        m.group_id = ANY ((SELECT public.user_group_ids()))
+        OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+      )
+    )
+  );
+
+DROP POLICY IF EXISTS "meeting_attendees_insert" ON meeting_attendees;
+CREATE POLICY "meeting_attendees_insert" ON meeting_attendees FOR INSERT
+  WITH CHECK (
+    EXISTS (
+      SELECT 1 FROM meetings m
+      WHERE m.id = meeting_attendees.meeting_id
+      AND m.group_id = ANY ((SELECT public.user_group_ids()))
+    )
+  );
+
+DROP POLICY IF EXISTS "meeting_attendees_update" ON meeting_attendees;
+CREATE POLICY "meeting_attendees_update" ON meeting_attendees FOR UPDATE
+  USING (
+    user_id = (SELECT auth.uid())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- rock_ideas
+-- ============================================================
+DROP POLICY IF EXISTS "rock_ideas_select" ON rock_ideas;
+CREATE POLICY "rock_ideas_select" ON rock_ideas FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.user_role()) IN ('executive', 'system_admin')
+  );
+
+DROP POLICY IF EXISTS "rock_ideas_insert" ON rock_ideas;
+CREATE POLICY "rock_ideas_insert" ON rock_ideas FOR INSERT
+  WITH CHECK (group_id = ANY ((SELECT public.user_group_ids())));
+
+DROP POLICY IF EXISTS "rock_ideas_update" ON rock_ideas;
+CREATE POLICY "rock_ideas_update" ON rock_ideas FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- scorecard_templates
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_templates_select" ON scorecard_templates;
+CREATE POLICY "scorecard_templates_select" ON scorecard_templates FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_templates_insert" ON scorecard_templates;
+CREATE POLICY "scorecard_templates_insert" ON scorecard_templates FOR INSERT
+  WITH CHECK ((SELECT public.is_admin_or_sysadmin()));
+
+DROP POLICY IF EXISTS "scorecard_templates_update" ON scorecard_templates;
+CREATE POLICY "scorecard_templates_update" ON scorecard_templates FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- scorecard_sections
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_sections_select" ON scorecard_sections;
+CREATE POLICY "scorecard_sections_select" ON scorecard_sections FOR SELECT
+  USING (
+    template_id IN (SELECT public.user_scorecard_templates())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_sections_insert" ON scorecard_sections;
+CREATE POLICY "scorecard_sections_insert" ON scorecard_sections FOR INSERT
+  WITH CHECK ((SELECT public.is_admin_or_sysadmin()));
+
+DROP POLICY IF EXISTS "scorecard_sections_update" ON scorecard_sections;
+CREATE POLICY "scorecard_sections_update" ON scorecard_sections FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- scorecard_measures
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_measures_select" ON scorecard_measures;
+CREATE POLICY "scorecard_measures_select" ON scorecard_measures FOR SELECT
+  USING (
+    section_id IN (SELECT public.user_scorecard_sections())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_measures_insert" ON scorecard_measures;
+CREATE POLICY "scorecard_measures_insert" ON scorecard_measures FOR INSERT
+  WITH CHECK ((SELECT public.is_admin_or_sysadmin()));
+
+DROP POLICY IF EXISTS "scorecard_measures_update" ON scorecard_measures;
+CREATE POLICY "scorecard_measures_update" ON scorecard_measures FOR UPDATE
+  USING ((SELECT public.is_admin_or_sysadmin()));
+
+-- ============================================================
+-- scorecard_goals
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_goals_select" ON scorecard_goals;
+CREATE POLICY "scorecard_goals_select" ON scorecard_goals FOR SELECT
+  USING (
+    measure_id IN (SELECT public.user_scorecard_measures())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_goals_insert" ON scorecard_goals;
+CREATE POLICY "scorecard_goals_insert" ON scorecard_goals FOR INSERT
+  WITH CHECK (
+    measure_id IN (SELECT public.user_lead_scorecard_measures())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_goals_update" ON scorecard_goals;
+CREATE POLICY "scorecard_goals_update" ON scorecard_goals FOR UPDATE
+  USING (
+    measure_id IN (SELECT public.user_lead_scorecard_measures())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- goal_change_log
+-- ============================================================
+DROP POLICY IF EXISTS "goal_change_log_select" ON goal_change_log;
+CREATE POLICY "goal_change_log_select" ON goal_change_log FOR SELECT
+  USING (
+    (SELECT public.is_admin_or_sysadmin())
+    OR EXISTS (
+      SELECT 1 FROM scorecard_goals g
+      WHERE g.id = goal_change_log.goal_id
+        AND g.measure_id IN (SELECT public.user_lead_scorecard_measures())
+    )
+  );
+
+-- ============================================================
+-- scorecard_entries
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_entries_select" ON scorecard_entries;
+CREATE POLICY "scorecard_entries_select" ON scorecard_entries FOR SELECT
+  USING (
+    measure_id IN (SELECT public.user_scorecard_measures())
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- scorecard_entry_details
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_entry_details_select" ON scorecard_entry_details;
+CREATE POLICY "scorecard_entry_details_select" ON scorecard_entry_details FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM scorecard_entries e
+      WHERE e.id = scorecard_entry_details.entry_id
+        AND (
+          e.measure_id IN (SELECT public.user_scorecard_measures())
+          OR (SELECT public.is_admin_or_sysadmin())
+        )
+    )
+  );
+
+-- ============================================================
+-- campaigns
+-- ============================================================
+DROP POLICY IF EXISTS "campaigns_select" ON campaigns;
+CREATE POLICY "campaigns_select" ON campaigns FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "campaigns_insert" ON campaigns;
+CREATE POLICY "campaigns_insert" ON campaigns FOR INSERT
+  WITH CHECK (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "campaigns_update" ON campaigns;
+CREATE POLICY "campaigns_update" ON campaigns FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- campaign_weekly_data
+-- ============================================================
+DROP POLICY IF EXISTS "campaign_weekly_data_select" ON campaign_weekly_data;
+CREATE POLICY "campaign_weekly_data_select" ON campaign_weekly_data FOR SELECT
+  USING (
+    EXISTS (
+      SELECT 1 FROM campaigns c
+      WHERE c.id = campaign_weekly_data.campaign_id
+        AND (
+          c.group_id = ANY ((SELECT public.user_group_ids()))
+          OR (SELECT public.is_admin_or_sysadmin())
+        )
+    )
+  );
+
+-- ============================================================
+-- campaign_metric_definitions
+-- ============================================================
+DROP POLICY IF EXISTS "campaign_metric_defs_select" ON campaign_metric_definitions;
+CREATE POLICY "campaign_metric_defs_select" ON campaign_metric_definitions FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "campaign_metric_defs_insert" ON campaign_metric_definitions;
+CREATE POLICY "campaign_metric_defs_insert" ON campaign_metric_definitions FOR INSERT
+  WITH CHECK (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "campaign_metric_defs_update" ON campaign_metric_definitions;
+CREATE POLICY "campaign_metric_defs_update" ON campaign_metric_definitions FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "campaign_metric_defs_delete" ON campaign_metric_definitions;
+CREATE POLICY "campaign_metric_defs_delete" ON campaign_metric_definitions FOR DELETE
+  USING (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+-- ============================================================
+-- scorecard_settings
+-- ============================================================
+DROP POLICY IF EXISTS "scorecard_settings_select" ON scorecard_settings;
+CREATE POLICY "scorecard_settings_select" ON scorecard_settings FOR SELECT
+  USING (
+    group_id = ANY ((SELECT public.user_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_settings_insert" ON scorecard_settings;
+CREATE POLICY "scorecard_settings_insert" ON scorecard_settings FOR INSERT
+  WITH CHECK (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+DROP POLICY IF EXISTS "scorecard_settings_update" ON scorecard_settings;
+CREATE POLICY "scorecard_settings_update" ON scorecard_settings FOR UPDATE
+  USING (
+    group_id = ANY ((SELECT public.user_lead_group_ids()))
+    OR (SELECT public.is_admin_or_sysadmin())
+  );
+
+COMMIT;
@@ -0,0 +1,42 @@
+-- ============================================================
+-- rls-schema-objects.sql
+-- Live policy, function and trigger definitions for
+-- tests/rls/result_cache.py, which fingerprints them to decide
+-- whether a cached suite result is still valid (RLS_RESULT_CACHE).
+-- Callable by service_role only.
+-- Run manually in Supabase SQL Editor
+-- Date: 2026-10-17
+-- ============================================================
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION public.rls_schema_objects()
+RETURNS json AS $$
+  SELECT json_build_object(
+    'policies', COALESCE((
+      SELECT json_agg(json_build_object('tablename', tablename, 'policyname', policyname,
+                                        'permissive', permissive, 'roles', roles, 'cmd', cmd,
+                                        'qual', qual, 'with_check', with_check)
+                      ORDER BY tablename, policyname)
+      FROM pg_policies WHERE schemaname = 'public'), '[]'::json),
+    'functions', COALESCE((
+      SELECT json_agg(json_build_object('name', p.proname, 'definition', pg_get_functiondef(p.oid))
+                      ORDER BY p.proname, p.oid)
+      FROM pg_proc p JOIN pg_namespace n ON n.oid = p.pronamespace
+      WHERE n.nspname = 'public' AND p.prokind IN ('f', 'p')), '[]'::json),
+    'triggers', COALESCE((
+      SELECT json_agg(json_build_object('name', t.tgname, 'tablename', c.relname,
+                                        'function', p.proname, 'definition', pg_get_triggerdef(t.oid))
+                      ORDER BY c.relname, t.tgname)
+      FROM pg_trigger t
+      JOIN pg_class c ON c.oid = t.tgrelid
+      JOIN pg_namespace n ON n.oid = c.relnamespace
+      JOIN pg_proc p ON p.oid = t.tgfoid
+      WHERE n.nspname = 'public' AND NOT t.tgisinternal), '[]'::json)
+  );
+$$ LANGUAGE sql STABLE;
+
+REVOKE ALL ON FUNCTION public.rls_schema_objects() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.rls_schema_objects() TO service_role;
+
+COMMIT;
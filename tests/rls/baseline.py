@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Benchmark Baseline Store
+========================
+Keeps every --bench and rpc_bench.py run in one JSON lines file (one run
+per line) and gates new runs against a rolling baseline, so a policy edit
+that doubles a table's read latency fails instead of shipping.
+
+A run records, per metric (table/role/op for --bench, rpc/c<concurrency>
+for rpc_bench.py): the sample count, mean and standard deviation of the
+log latency, p50/p95 and throughput. It is keyed by git commit (plus a
+dirty flag), the fingerprint of the policy/function/trigger definitions
+and the benchmark settings; only runs with the same source, target and
+settings are compared.
+
+The baseline for a metric pools the last BASELINE_WINDOW runs that passed
+the gate. A metric regresses when its log latency is higher than the
+baseline's with one-sided Welch t-test p < BASELINE_ALPHA *and* its
+geometric-mean latency is at least BASELINE_MIN_SLOWDOWN slower: the
+test rules out noise, the threshold rules out differences too small to
+matter. With fewer than BASELINE_MIN_RUNS comparable runs the run is only
+recorded. Throughput changes are reported, not gated (one value per run).
+
+    RLS_BASELINE=.rls-baseline.jsonl python run_rls_tests.py --bench   # record + gate
+    python rpc_bench.py --baseline .rls-baseline.jsonl
+    python baseline.py compare bench.json --store .rls-baseline.jsonl  # gate a saved report
+    python baseline.py record bench.json --store .rls-baseline.jsonl
+    python baseline.py history --store .rls-baseline.jsonl --metric scorecard_entries/team_member/SELECT
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import impact
+from config import (
+    BASELINE_FILE, BASELINE_WINDOW, BASELINE_MIN_RUNS, BASELINE_ALPHA, BASELINE_MIN_SLOWDOWN,
+)
+
+
+# -- What a run records --
+
+def bench_metrics(report: dict) -> dict:
+    """Metrics of a bench.py report: 'table/role/op' -> stats."""
+    return {f"{r['table']}/{r['role']}/{r['op']}": _metric(r, r["throughput_rps"])
+            for r in report["results"] if r["n"]}
+
+
+def rpc_metrics(report: dict) -> dict:
+    """Metrics of an rpc_bench.py report: 'rpc/c<concurrency>' -> stats."""
+    return {f"{row['rpc']}/c{row['concurrency']}": _metric(row, row["throughput_cps"], row["ok"])
+            for r in report["results"] for row in r["levels"] if row["ok"]}
+
+
+def _metric(row: dict, throughput: float, n: int = None) -> dict:
+    return {
+        "n": row["n"] if n is None else n,
+        "log_mean": row["log_ms"]["mean"],
+        "log_sd": row["log_ms"]["sd"],
+        "p50": row["latency_ms"]["p50"],
+        "p95": row["latency_ms"]["p95"],
+        "throughput": throughput,
+    }
+
+
+def report_run(report: dict, schema: str = None) -> dict:
+    """Store record for a bench.py or rpc_bench.py report."""
+    meta = report["meta"]
+    if "dsn" in meta:
+        source, target, metrics = "rpc_bench", meta["dsn"], rpc_metrics(report)
+        settings = {k: meta[k] for k in ("duration", "warmup", "contention", "lock_timeout", "tenant")}
+    else:
+        source, target, metrics = "bench", meta["url"], bench_metrics(report)
+        settings = {k: meta[k] for k in ("iterations", "warmup", "concurrency")}
+    commit, dirty = git_revision()
+    return {
+        "timestamp": meta.get("timestamp") or time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "dirty": dirty,
+        "schema": schema or sql_schema_fingerprint(),
+        "source": source,
+        "target": target,
+        "settings": fingerprint(settings),
+        "metrics": metrics,
+        "gate": None,
+    }
+
+
+def fingerprint(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def git_revision() -> tuple[str | None, bool]:
+    """-> (HEAD commit or None outside git, whether tracked files have uncommitted changes)."""
+    head = subprocess.run(["git", "rev-parse", "HEAD"], cwd=impact.REPO_ROOT, capture_output=True, text=True)
+    if head.returncode != 0:
+        return None, False
+    status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                            cwd=impact.REPO_ROOT, capture_output=True, text=True)
+    return head.stdout.strip(), bool(status.stdout.strip())
+
+
+def schema_key(objects: dict) -> str:
+    """Fingerprint of every policy, function and trigger definition (impact.py object shape)."""
+    return fingerprint(sorted([list(key), obj["text"]] for key, obj in objects.items()))
+
+
+def sql_schema_fingerprint() -> str:
+    return schema_key(impact.parse_objects(impact.read_sources()))
+
+
+# -- Store --
+
+class BaselineStore:
+    """Append-only JSON lines file of runs."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def runs(self) -> list[dict]:
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def append(self, run: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(run, separators=(",", ":")) + "\n")
+
+    def baseline(self, run: dict, window: int = BASELINE_WINDOW) -> list[dict]:
+        """The last `window` passing runs comparable with `run`, oldest first."""
+        same = [r for r in self.runs()
+                if r["source"] == run["source"] and r["target"] == run["target"]
+                and r["settings"] == run["settings"] and r.get("gate") != "fail"]
+        return same[-window:]
+
+
+# -- Statistics --
+
+def pooled(metrics: list[dict]) -> dict:
+    """Combine per-run log-latency stats into one sample (within- and between-run variance)."""
+    n = sum(m["n"] for m in metrics)
+    mean = sum(m["n"] * m["log_mean"] for m in metrics) / n
+    ss = sum((m["n"] - 1) * m["log_sd"] ** 2 + m["n"] * (m["log_mean"] - mean) ** 2 for m in metrics)
+    return {"n": n, "log_mean": mean, "log_sd": math.sqrt(ss / (n - 1)) if n > 1 else 0.0,
+            "throughput": sum(m["throughput"] for m in metrics) / len(metrics)}
+
+
+def welch_p(current: dict, base: dict) -> float:
+    """One-sided p-value that `current` has a higher mean log latency than `base`."""
+    v1 = current["log_sd"] ** 2 / current["n"]
+    v2 = base["log_sd"] ** 2 / base["n"]
+    diff = current["log_mean"] - base["log_mean"]
+    if v1 + v2 == 0:
+        return 0.0 if diff > 0 else 1.0
+    # Welch-Satterthwaite degrees of freedom
+    df = (v1 + v2) ** 2 / (v1 ** 2 / max(current["n"] - 1, 1) + v2 ** 2 / max(base["n"] - 1, 1))
+    return t_sf(diff / math.sqrt(v1 + v2), df)
+
+
+def t_sf(t: float, df: float) -> float:
+    """P(T > t) for Student's t with `df` degrees of freedom."""
+    tail = 0.5 * _betainc(df / 2, 0.5, df / (df + t * t))
+    return tail if t > 0 else 1.0 - tail
+
+
+def _betainc(a: float, b: float, x: float) -> float:
+    """Regularized incomplete beta I_x(a, b) (continued fraction, Numerical Recipes betacf)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) + a * math.log(x) + b * math.log(1 - x))
+    if x > (a + 1) / (a + b + 2):
+        return 1.0 - _betainc(b, a, 1 - x)
+    tiny = 1e-300
+    c, d = 1.0, 1.0 - (a + b) * x / (a + 1)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 300):
+        for num in (m * (b - m) * x / ((a + 2 * m - 1) * (a + 2 * m)),
+                    -(a + m) * (a + b + m) * x / ((a + 2 * m) * (a + 2 * m + 1))):
+            d = 1.0 + num * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + num / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-12:
+            break
+    return front * h / a
+
+
+# -- Gate --
+
+def compare(run: dict, history: list[dict], alpha: float = BASELINE_ALPHA,
+            min_slowdown: float = BASELINE_MIN_SLOWDOWN, min_runs: int = BASELINE_MIN_RUNS) -> dict:
+    """JSON-ready verdict for every metric of `run` against the runs in `history`."""
+    rows = []
+    for key, cur in sorted(run["metrics"].items()):
+        past = [r["metrics"][key] for r in history if key in r["metrics"]]
+        if len(past) < min_runs:
+            rows.append({"metric": key, "status": "new", "runs": len(past)})
+            continue
+        base = pooled(past)
+        ratio = math.exp(cur["log_mean"] - base["log_mean"])
+        p = welch_p(cur, base)
+        regressed = p < alpha and ratio >= 1 + min_slowdown
+        rows.append({
+            "metric": key,
+            "status": "regressed" if regressed else "ok",
+            "runs": len(past),
+            "latency_ratio": ratio,
+            "p_value": p,
+            "throughput_ratio": cur["throughput"] / base["throughput"] if base["throughput"] else None,
+            "p50_ms": cur["p50"],
+        })
+    schemas = {r["schema"] for r in history}
+    return {
+        "meta": {"commit": run["commit"], "dirty": run["dirty"], "source": run["source"],
+                 "baseline_runs": len(history), "schema_changed": bool(schemas) and run["schema"] not in schemas,
+                 "alpha": alpha, "min_slowdown": min_slowdown},
+        "results": rows,
+        "regressions": [r["metric"] for r in rows if r["status"] == "regressed"],
+    }
+
+
+def gate(store: BaselineStore, run: dict, window: int = BASELINE_WINDOW) -> dict:
+    """Compare `run` with its rolling baseline, then record it with the verdict."""
+    verdict = compare(run, store.baseline(run, window))
+    if verdict["meta"]["baseline_runs"] >= BASELINE_MIN_RUNS:
+        run["gate"] = "fail" if verdict["regressions"] else "pass"
+    store.append(run)
+    return verdict
+
+
+def print_verdict(verdict: dict):
+    meta = verdict["meta"]
+    print(f"\nBaseline: {meta['baseline_runs']} comparable runs"
+          f"{', policy definitions changed since' if meta['schema_changed'] else ''}")
+    for r in verdict["results"]:
+        if r["status"] == "new":
+            print(f"  {r['metric']:<44} no baseline yet ({r['runs']} runs)")
+            continue
+        tput = f"{r['throughput_ratio']:.2f}x" if r["throughput_ratio"] else "-"
+        flag = "REGRESSED" if r["status"] == "regressed" else ""
+        print(f"  {r['metric']:<44} latency {r['latency_ratio']:>5.2f}x  p={r['p_value']:.4f}  "
+              f"throughput {tput:>6}  {flag}")
+    if verdict["regressions"]:
+        print(f"\n{len(verdict['regressions'])} regressions: {', '.join(verdict['regressions'])}")
+
+
+def print_history(store: BaselineStore, metric: str = None):
+    print(f"{'timestamp':<22}{'commit':<10}{'source':<11}{'gate':<6}{'metrics':>8}"
+          + (f"{'p50':>9}{'p95':>9}" if metric else ""))
+    for r in store.runs():
+        m = r["metrics"].get(metric) if metric else None
+        if metric and m is None:
+            continue
+        line = (f"{r['timestamp']:<22}{(r['commit'] or '-')[:8] + ('+' if r['dirty'] else ''):<10}"
+                f"{r['source']:<11}{r.get('gate') or '-':<6}{len(r['metrics']):>8}")
+        if m:
+            line += f"{m['p50']:>9.1f}{m['p95']:>9.1f}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark baseline store and regression gate")
+    parser.add_argument("command", choices=["record", "compare", "history"])
+    parser.add_argument("report", nargs="?", help="bench.py (--bench-out) or rpc_bench.py (--out) JSON report")
+    parser.add_argument("--store", default=BASELINE_FILE, help="JSON lines store (default: $RLS_BASELINE)")
+    parser.add_argument("--window", type=int, default=BASELINE_WINDOW, help="passing runs in the baseline")
+    parser.add_argument("--metric", help="history: only runs with this metric, with its latency")
+    args = parser.parse_args()
+
+    if not args.store:
+        parser.error("--store or RLS_BASELINE is required")
+    store = BaselineStore(args.store)
+    if args.command == "history":
+        print_history(store, args.metric)
+        return
+    if not args.report:
+        parser.error(f"{args.command} needs a report file")
+    with open(args.report) as f:
+        run = report_run(json.load(f))
+    if args.command == "record":
+        store.append(run)
+        print(f"Recorded {len(run['metrics'])} metrics in {args.store}")
+        return
+    verdict = gate(store, run, args.window)
+    print_verdict(verdict)
+    sys.exit(1 if verdict["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
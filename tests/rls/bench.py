@@ -0,0 +1,183 @@
+"""
+RLS Policy Benchmark
+====================
+Measures what each table's policies cost per role, using the same
+SupabaseClient sessions as the correctness suite.
+
+For every (table, role) pair it runs SELECT, INSERT and UPDATE with a
+warmup, a fixed iteration count and a configurable concurrency, and
+reports throughput and latency percentiles. Denied operations are
+benchmarked too (their status is recorded): the policy still has to be
+evaluated to reject them. Rows the benchmark manages to insert are
+removed with the service role afterwards.
+
+    python run_rls_tests.py --bench --bench-iterations 200 --bench-concurrency 8
+"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from config import SUPABASE_URL
+from fixtures import Fixtures
+from result_collector import log_latency, percentile
+from fixture_manager import FixtureManager
+from supabase_client import SupabaseClient
+
+BENCH_TABLES = ["profiles", "groups", "rocks", "issues", "focus_snapshots", "meetings", "quarters",
+                "scorecard_entries"]
+
+
+def _far_week(i: int) -> str:
+    """Distinct far-future Mondays so unique (user, group, week) keys never clash."""
+    return (date(2100, 1, 4) + timedelta(weeks=i)).isoformat()
+
+
+def insert_row(table: str, i: int, user_id: str, data: Fixtures) -> dict | None:
+    """Row the given user would plausibly insert, or None if the table takes no inserts."""
+    gids = data.user_groups.get(user_id) or [g.id for g in data.groups[:1]]
+    group_id = gids[0] if gids else None
+    quarter = data.sample_quarter
+    if table == "groups":
+        return {"name": f"RLS Bench Group {i}"}
+    if table == "rocks" and group_id and quarter:
+        return {"title": f"RLS Bench Rock {i}", "group_id": group_id, "owner_id": user_id, "quarter_id": quarter.id}
+    if table == "issues" and group_id:
+        return {"description": f"RLS bench issue {i}", "group_id": group_id, "raised_by": user_id}
+    if table == "focus_snapshots" and group_id:
+        return {"user_id": user_id, "group_id": group_id, "week_date": _far_week(i)}
+    if table == "meetings" and group_id:
+        return {"group_id": group_id, "meeting_date": _far_week(i)}
+    if table == "quarters":
+        day = _far_week(i)
+        return {"label": f"RLS Bench Q{i}", "start_date": day, "end_date": day}
+    return None
+
+
+UPDATE_FIELDS = {
+    "groups": ("name", "RLS Bench Group"),
+    "rocks": ("title", "RLS Bench Rock"),
+    "issues": ("description", "RLS bench issue"),
+    "focus_snapshots": ("is_current", False),
+    "meetings": ("notes", "RLS bench"),
+    "quarters": ("label", "RLS Bench Q"),
+}
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    resp = fn()
+    return time.perf_counter() - start, resp
+
+
+def run_op(calls: list, warmup: int, concurrency: int, seen: list = None) -> tuple[list, list, float]:
+    """
+    Run warmup calls, then the measured ones; -> (durations, responses, wall seconds).
+    Every response, warmup included, is appended to `seen` when given.
+    """
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        warm = list(pool.map(lambda fn: fn(), calls[:warmup]))
+        start = time.perf_counter()
+        timed = list(pool.map(_timed, calls[warmup:]))
+        wall = time.perf_counter() - start
+    responses = [r for _, r in timed]
+    if seen is not None:
+        seen.extend(warm + responses)
+    return [d for d, _ in timed], responses, wall
+
+
+def summarize(table: str, role: str, op: str, durations: list, responses: list, wall: float) -> dict:
+    statuses = {}
+    for r in responses:
+        statuses[str(r.status_code)] = statuses.get(str(r.status_code), 0) + 1
+    values = sorted(durations)
+    return {
+        "table": table,
+        "role": role,
+        "op": op,
+        "n": len(values),
+        "errors": sum(1 for r in responses if r.status_code >= 500),
+        "statuses": statuses,
+        "throughput_rps": len(values) / wall if wall else 0.0,
+        "latency_ms": {
+            "mean": sum(values) / len(values) * 1000 if values else 0.0,
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "max": (values[-1] if values else 0.0) * 1000,
+        },
+        "log_ms": log_latency(values),
+    }
+
+
+def bench_table(client: SupabaseClient, table: str, role: str, user_id: str, data: Fixtures,
+                iterations: int, warmup: int, concurrency: int) -> list[dict]:
+    total = warmup + iterations
+    out = []
+
+    calls = [lambda: client.select(table, "id")] * total
+    out.append(summarize(table, role, "SELECT", *run_op(calls, warmup, concurrency)))
+
+    fixtures = FixtureManager()
+    rows = [insert_row(table, i, user_id, data) for i in range(total)]
+    if rows[0] is not None:
+        calls = [lambda row=fixtures.tagged(table, row): client.insert(table, row) for row in rows]
+        seen = []
+        out.append(summarize(table, role, "INSERT", *run_op(calls, warmup, concurrency, seen)))
+        for r in seen:
+            fixtures.track(table, r)
+    created = fixtures.created.get(table, [])
+
+    if table == "profiles":
+        name = data.profiles_by_id[user_id].full_name
+        calls = [lambda: client.update("profiles", {"full_name": name}, {"id": user_id})] * total
+        out.append(summarize(table, role, "UPDATE", *run_op(calls, warmup, concurrency)))
+    elif created:
+        field, value = UPDATE_FIELDS[table]
+        targets = [created[i % len(created)] for i in range(total)]
+        calls = [lambda rid=rid: client.update(table, {field: value}, {"id": rid}) for rid in targets]
+        out.append(summarize(table, role, "UPDATE", *run_op(calls, warmup, concurrency)))
+
+    fixtures.teardown()
+    return out
+
+
+def run_bench(clients: dict, roles: list, data: Fixtures, iterations: int = 50, warmup: int = 5,
+              concurrency: int = 1, tables: list = None) -> dict:
+    """
+    clients: role -> SupabaseClient; roles: [(role, Profile)].
+    Returns the JSON-ready report.
+    """
+    results = []
+    for role, user in roles:
+        for table in tables or BENCH_TABLES:
+            results.extend(bench_table(clients[role], table, role, user.id, data,
+                                       iterations, warmup, concurrency))
+    return {
+        "meta": {
+            "url": SUPABASE_URL,
+            "iterations": iterations,
+            "warmup": warmup,
+            "concurrency": concurrency,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{'table':<18}{'role':<14}{'op':<8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}  statuses")
+    for r in report["results"]:
+        lat = r["latency_ms"]
+        print(f"{r['table']:<18}{r['role']:<14}{r['op']:<8}{r['throughput_rps']:>9.1f}"
+              f"{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}  {r['statuses']}")
+
+
+def write_report(report: dict, path: str = None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
@@ -0,0 +1,166 @@
+"""
+Embedded-Resource Checks
+========================
+Child tables whose policies join through a parent (milestones ->
+rocks.group_id, scorecard_entry_details -> ... -> scorecard_templates),
+checked with one embedded PostgREST read per role instead of one read per
+table:
+
+    rocks?select=id,group_id,milestones(id,rock_id,milestone_collaborators(id,milestone_id))
+
+The trees are built from policy_matrix.SCOPE. The same read with the
+service role is the ground truth, fetched right before each role's read
+so rows written by earlier suites (test_rocks' admin rock, ...) are in
+both and serial and parallel runs agree. For every table
+in a tree the role must see exactly the truth rows under the parents it
+sees, and at the root exactly the rows of the groups policy_matrix.MATRIX
+allows it (ALL or OWN):
+
+    extra    a row the role should not see (leak)
+    missing  a row the role should see but does not (over-restrictive policy)
+
+Embedding only reaches children through visible parents, so a child row
+readable while its parent is hidden is not caught here; the --matrix
+SELECT cells read every child table directly.
+
+savings() counts the reads the embedded requests replaced: one per table
+in the tree, for each role and for the ground truth.
+"""
+
+import threading
+
+from policy_matrix import ALL, MATRIX, SCOPE
+from supabase_client import SupabaseClient, admin_stream
+
+# Child tables checked through their parents; the paths up to a group-scoped root come from SCOPE
+CHILD_TABLES = ("milestones", "milestone_collaborators", "focus_items", "meeting_attendees",
+                "scorecard_entry_details")
+
+SELECT_EXPECT = {table: expect for table, op, expect in MATRIX if op == "SELECT"}
+
+
+class EmbedTree:
+    """A table, the column pointing at its parent (group_id at the root) and its embedded children."""
+
+    __slots__ = ("table", "column", "children")
+
+    def __init__(self, table: str, column: str):
+        self.table = table
+        self.column = column
+        self.children = []
+
+    def select(self) -> str:
+        """'id,group_id,milestones(id,rock_id,...)'"""
+        return ",".join(["id", self.column] + [f"{c.table}({c.select()})" for c in self.children])
+
+    def tables(self) -> list[str]:
+        return [self.table] + [t for c in self.children for t in c.tables()]
+
+
+def build_trees(tables=CHILD_TABLES) -> list[EmbedTree]:
+    """Merge each table's SCOPE path up to its root into one tree per root."""
+    roots, nodes = {}, {}
+    for table in tables:
+        path = []
+        while table:
+            path.append(table)
+            table = SCOPE[table][1]
+        parent = None
+        for table in reversed(path):
+            node = nodes.get(table)
+            if node is None:
+                node = nodes[table] = EmbedTree(table, SCOPE[table][0])
+                if parent is None:
+                    roots[table] = node
+                else:
+                    parent.children.append(node)
+            parent = node
+    return list(roots.values())
+
+
+TREES = build_trees()
+
+
+def index(rows: list, tree: EmbedTree, into: dict = None) -> dict:
+    """{table: {id: parent id (group id at the root)}} for every row of a nested result."""
+    if into is None:
+        into = {table: {} for table in tree.tables()}
+    for row in rows:
+        into[tree.table][row["id"]] = row[tree.column]
+        for child in tree.children:
+            index(row.get(child.table) or [], child, into)
+    return into
+
+
+def expected(truth: dict, tree: EmbedTree, parents, into: dict = None) -> dict:
+    """
+    The part of the truth index a role may see: at the root the rows of
+    the `parents` groups (None: every group), below it the children of
+    the rows kept one level up.
+    """
+    if into is None:
+        into = {}
+    into[tree.table] = {i: p for i, p in truth[tree.table].items() if parents is None or p in parents}
+    for child in tree.children:
+        expected(truth, child, set(into[tree.table]), into)
+    return into
+
+
+def diff(seen: dict, want: dict) -> list[str]:
+    """One line per table whose visible rows differ from the expected ones."""
+    problems = []
+    for table, rows in want.items():
+        got = seen.get(table, {})
+        extra = [i for i, p in got.items() if i not in rows or rows[i] != p]
+        missing = [i for i in rows if i not in got]
+        if extra:
+            problems.append(f"{table}: {len(extra)} rows it should not see (e.g. {extra[0]})")
+        if missing:
+            problems.append(f"{table}: {len(missing)} rows hidden (e.g. {missing[0]})")
+    return problems
+
+
+def allowed_groups(tree: EmbedTree, role: str, user_id: str, data) -> frozenset | None:
+    """None when the role reads every group of the tree's root table."""
+    return None if SELECT_EXPECT[tree.table][role] == ALL else data.groups_of(user_id)
+
+
+# -- Ground truth and savings --
+
+_lock = threading.Lock()
+_stats = {"requests": 0, "separate": 0}
+
+
+def _count(pages: int, tables: int):
+    with _lock:
+        _stats["requests"] += pages
+        _stats["separate"] += tables
+
+
+def truth(tree: EmbedTree) -> dict | None:
+    """Service-role index of the whole tree as it is now (None when it is not in the schema)."""
+    stream = admin_stream(tree.table, tree.select())
+    if not stream.ok:
+        return None
+    rows = list(stream)
+    _count(stream.pages, len(tree.tables()))
+    return index(rows, tree)
+
+
+def check_tree(client: SupabaseClient, tree: EmbedTree, allowed: frozenset | None) -> tuple:
+    """-> (first response, problems); problems is None when the tree is not in the schema."""
+    want = truth(tree)
+    if want is None:
+        return None, None
+    stream = client.stream(tree.table, tree.select())
+    if not stream.ok:
+        return stream.resp, [f"status {stream.status_code}"]
+    seen = index(list(stream), tree)
+    _count(stream.pages, len(tree.tables()))
+    return stream.resp, diff(seen, expected(want, tree, allowed))
+
+
+def savings() -> dict:
+    """Requests sent for embedded checks vs one read per table; saved = separate - requests."""
+    with _lock:
+        return dict(_stats, saved=_stats["separate"] - _stats["requests"])
@@ -0,0 +1,143 @@
+"""
+RLS Fixture Manager
+===================
+Tracks every row a test run creates or modifies and cleans up in bulk.
+
+Rows inserted through create() are tagged with the run id (appended to
+their text column as `[rls:<run id>]`) and recorded per table; teardown()
+removes them with one `DELETE ... id=in.(...)` per table, children
+before parents, counts the rows each DELETE returns and raises
+TeardownError if any was rejected. Changes to existing rows are registered with revert()
+before they are made and restored by apply_reverts(), which the runner
+calls after every suite so a role change never outlives its test.
+
+PostgREST has no multi-request transactions, so the tag is what makes
+a crashed run recoverable: sweep() deletes every tagged row left behind
+(by one run id, or by any run).
+
+With RLS_BACKEND=postgres every request is rolled back (pg_backend.py),
+so a manager records nothing and teardown() has nothing to do.
+
+    python run_rls_tests.py --sweep    # remove rows left by earlier runs
+"""
+
+import threading
+import uuid
+
+from config import RLS_BACKEND
+from supabase_client import SupabaseClient, admin_delete_where, admin_update
+
+# Text column each taggable table carries; other tables are tracked by id only
+TAG_COLUMNS = {
+    "groups": "name",
+    "quarters": "label",
+    "rocks": "title",
+    "issues": "description",
+    "todos": "description",
+    "rock_ideas": "description",
+    "meetings": "notes",
+    "scorecard_templates": "name",
+    "campaigns": "name",
+    "campaign_metric_definitions": "label",
+}
+
+# Ids per DELETE request; keeps the in.() list well inside URL limits
+DELETE_CHUNK = 200
+
+
+class TeardownError(RuntimeError):
+    """Bulk deletes that failed; the rows stay behind until sweep()."""
+
+    def __init__(self, deleted: int, failures: list):
+        super().__init__(f"{len(failures)} bulk deletes failed ({deleted} rows removed): " + "; ".join(failures))
+        self.deleted = deleted
+        self.failures = failures
+
+
+def tag_marker(run_id: str) -> str:
+    return f"[rls:{run_id}]"
+
+
+class FixtureManager:
+    """Rows created and changed by one run, keyed by table, safe across threads."""
+
+    def __init__(self, run_id: str = None, transactional: bool = RLS_BACKEND == "postgres"):
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.transactional = transactional  # rows never outlive their request: track nothing
+        self.created = {}   # table -> [ids], dict order = first creation
+        self.reverts = {}   # (table, id) -> original values
+        self._lock = threading.Lock()
+
+    def tagged(self, table: str, row: dict) -> dict:
+        """Copy of row with the run tag appended to the table's text column."""
+        column = TAG_COLUMNS.get(table)
+        if not column:
+            return row
+        text = row.get(column)
+        marker = tag_marker(self.run_id)
+        return dict(row, **{column: f"{text} {marker}" if text else marker})
+
+    def track(self, table: str, resp):
+        """Record the ids from a 201 insert response (anything else is ignored)."""
+        if resp.status_code == 201:
+            self.record(table, [row["id"] for row in resp.json()])
+
+    def record(self, table: str, ids: list):
+        """Record rows created some other way (e.g. by an RPC)."""
+        if self.transactional:
+            return
+        with self._lock:
+            self.created.setdefault(table, []).extend(ids)
+
+    def create(self, client: SupabaseClient, table: str, row: dict):
+        """Insert as `client`, tagged and tracked. Returns the raw Response for status checks."""
+        resp = client.insert(table, self.tagged(table, row))
+        self.track(table, resp)
+        return resp
+
+    def revert(self, table: str, row_id: str, original: dict):
+        """Register the values to restore on row_id; the first registration wins."""
+        if self.transactional:
+            return
+        with self._lock:
+            current = self.reverts.setdefault((table, row_id), {})
+            for column, value in original.items():
+                current.setdefault(column, value)
+
+    def apply_reverts(self):
+        with self._lock:
+            pending, self.reverts = self.reverts, {}
+        for (table, row_id), values in pending.items():
+            admin_update(table, values, {"id": row_id})
+
+    def teardown(self) -> int:
+        """
+        Restore changed rows, then delete created ones in bulk; -> rows deleted,
+        as returned by the DELETEs. Raises TeardownError once every table has
+        been tried if any DELETE was rejected.
+        """
+        self.apply_reverts()
+        with self._lock:
+            created, self.created = self.created, {}
+        deleted, failures = 0, []
+        # Reverse creation order so child rows go before the parents they reference
+        for table, ids in reversed(list(created.items())):
+            for i in range(0, len(ids), DELETE_CHUNK):
+                chunk = ids[i:i + DELETE_CHUNK]
+                resp = admin_delete_where(table, f"id=in.({','.join(chunk)})", returning=True)
+                if resp.status_code != 200:
+                    failures.append(f"{table}: status {resp.status_code} for {len(chunk)} ids ({resp.text[:200]})")
+                    continue
+                deleted += len(resp.json() or [])
+        if failures:
+            raise TeardownError(deleted, failures)
+        return deleted
+
+
+def sweep(run_id: str = None) -> dict:
+    """Delete tagged rows left by run_id (or by any run); -> {table: status}."""
+    pattern = f"*{tag_marker(run_id)}*" if run_id else "*[rls:*"
+    return {
+        table: admin_delete_where(table, f"{column}=like.{pattern}").status_code
+        for table, column in TAG_COLUMNS.items()
+    }
@@ -0,0 +1,142 @@
+"""
+RLS Test Fixtures
+=================
+Typed, indexed view of the data discover_test_data() samples.
+
+Rows become small __slots__ records, and every lookup the suites need
+(users by role, members of a group, groups of a user, rocks and ideas
+per group, a group each user is NOT in) is built once up front, so the
+suites never rescan the fixture lists. `digest` identifies the snapshot
+the fixtures were built from (result_cache.py keys on it).
+"""
+
+import hashlib
+import json
+
+
+class Record:
+    """Base for fixture rows: attributes named after the selected columns."""
+
+    __slots__ = ()
+
+    def __init__(self, row: dict):
+        for field in self.__slots__:
+            setattr(self, field, row.get(field))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.id})"
+
+
+class Profile(Record):
+    __slots__ = ("id", "email", "full_name", "role")
+
+
+class Group(Record):
+    __slots__ = ("id", "name")
+
+
+class Membership(Record):
+    __slots__ = ("id", "group_id", "user_id", "role_in_group")
+
+
+class Rock(Record):
+    __slots__ = ("id", "title", "group_id", "owner_id")
+
+
+class Issue(Record):
+    __slots__ = ("id", "description", "group_id", "raised_by")
+
+
+class Meeting(Record):
+    __slots__ = ("id", "meeting_date", "group_id")
+
+
+class Quarter(Record):
+    __slots__ = ("id", "label", "is_current")
+
+
+class RockIdea(Record):
+    __slots__ = ("id", "description", "group_id")
+
+
+def _index(records: list, attr: str) -> dict:
+    index = {}
+    for r in records:
+        index.setdefault(getattr(r, attr), []).append(r)
+    return index
+
+
+class Fixtures:
+    """Fixture lists plus the lookup indexes built from them."""
+
+    def __init__(self, rows: dict):
+        self.digest = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()
+        self.profiles = [Profile(r) for r in rows["profiles"]]
+        self.groups = [Group(r) for r in rows["groups"]]
+        self.members = [Membership(r) for r in rows["members"]]
+        self.rocks = [Rock(r) for r in rows["rocks"]]
+        self.issues = [Issue(r) for r in rows["issues"]]
+        self.meetings = [Meeting(r) for r in rows["meetings"]]
+        self.quarters = [Quarter(r) for r in rows["quarters"]]
+        self.rock_ideas = [RockIdea(r) for r in rows.get("rock_ideas", [])]
+
+        self.profiles_by_id = {p.id: p for p in self.profiles}
+        self.users_by_role = _index(self.profiles, "role")
+        self.rocks_by_group = _index(self.rocks, "group_id")
+        self.ideas_by_group = _index(self.rock_ideas, "group_id")
+
+        # One pass over memberships builds both directions of the mapping
+        self.user_groups = {}
+        self.group_members = {}
+        for m in self.members:
+            self.user_groups.setdefault(m.user_id, []).append(m.group_id)
+            self.group_members.setdefault(m.group_id, []).append(m.user_id)
+        self.user_group_sets = {uid: frozenset(gids) for uid, gids in self.user_groups.items()}
+
+        self.foreign_group = {p.id: self._first_group_not_containing(p.id) for p in self.profiles}
+
+    def _first_group_not_containing(self, user_id: str) -> Group | None:
+        gids = self.user_group_sets.get(user_id, frozenset())
+        for g in self.groups:
+            if g.id not in gids:
+                return g
+        return None
+
+    def groups_of(self, user_id: str) -> frozenset:
+        return self.user_group_sets.get(user_id, frozenset())
+
+    def first_user(self, role: str) -> Profile | None:
+        users = self.users_by_role.get(role)
+        return users[0] if users else None
+
+    def other_user(self, user_id: str) -> Profile | None:
+        """Any profile other than user_id."""
+        for p in self.profiles[:2]:
+            if p.id != user_id:
+                return p
+        return None
+
+    def group_not_containing(self, user_id: str) -> Group | None:
+        if user_id in self.foreign_group:
+            return self.foreign_group[user_id]
+        return self._first_group_not_containing(user_id)
+
+    def _first_foreign(self, by_group: dict, user_id: str):
+        # by_group preserves first-appearance order, so this is the first
+        # row of the sample that lives outside the user's groups.
+        gids = self.groups_of(user_id)
+        for group_id, rows in by_group.items():
+            if group_id not in gids:
+                return rows[0]
+        return None
+
+    def foreign_rock(self, user_id: str) -> Rock | None:
+        return self._first_foreign(self.rocks_by_group, user_id)
+
+    def foreign_idea(self, user_id: str) -> RockIdea | None:
+        return self._first_foreign(self.ideas_by_group, user_id)
+
+    @property
+    def sample_quarter(self) -> Quarter | None:
+        """The quarter the suites attach test rows to (first sampled)."""
+        return self.quarters[0] if self.quarters else None
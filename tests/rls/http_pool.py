@@ -0,0 +1,383 @@
+"""
+HTTP Connection Pool
+====================
+Shared keep-alive transport for SupabaseClient and the admin helpers.
+
+One adapter (and therefore one urllib3 pool per host) is shared by every
+thread; each thread gets its own requests.Session mounted on it. Requests
+that hit 429/503 are retried with exponential backoff, honouring
+Retry-After; after a connection error only GET/HEAD/OPTIONS are resent. Counters record how many TCP connections were opened versus
+how many requests rode an existing keep-alive connection. Every request
+is reported to tracing.tracer when hooks are registered. With
+RLS_BACKEND=postgres the process-wide pool is a pg_backend.PgTransport.
+
+AsyncHttpPool is the asyncio equivalent (aiohttp, imported on first use)
+for keeping hundreds of requests in flight from one event loop.
+get_async_pool() keeps one per running loop; await close_async_pool()
+before the loop ends (asyncio.run) to close its connections.
+"""
+
+import asyncio
+import json
+import threading
+import time
+import weakref
+from datetime import timedelta
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+from config import (
+    HTTP_POOL_SIZE, HTTP_TIMEOUT, HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, ASYNC_HTTP_POOL_SIZE, RLS_BACKEND,
+)
+from tracing import tracer
+
+RETRY_STATUSES = (429, 503)
+# Methods resent after a connection error; a dropped POST/PATCH/DELETE may
+# already have been applied by the server
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class WriteSafeRetry(Retry):
+    """
+    Retry that still backs off on 429/503 for every method (the request was
+    not processed), but never resends a write after a connection error.
+    """
+
+    def increment(self, method=None, url=None, *args, **kwargs):
+        if kwargs.get("error") is not None and (method or "").upper() not in IDEMPOTENT_METHODS:
+            return Retry.increment(self.new(connect=0, other=0), method, url, *args, **kwargs)
+        return super().increment(method, url, *args, **kwargs)
+
+
+class PoolStats:
+    """Thread-safe counters for connections opened and requests sent."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+
+    def record_open(self):
+        with self._lock:
+            self.opened += 1
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    @property
+    def reused(self) -> int:
+        """Requests that did not need a fresh TCP/TLS handshake."""
+        return max(self.requests - self.opened, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            opened, sent = self.opened, self.requests
+        return {"opened": opened, "requests": sent, "reused": max(sent - opened, 0)}
+
+
+def _counting_pool_classes(stats: PoolStats) -> dict:
+    """Build urllib3 pool classes whose connections report to `stats`."""
+
+    class CountingHTTPConnection(HTTPConnection):
+        def _new_conn(self):
+            stats.record_open()
+            return super()._new_conn()
+
+    class CountingHTTPSConnection(HTTPSConnection):
+        def _new_conn(self):
+            stats.record_open()
+            return super()._new_conn()
+
+    class CountingHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = CountingHTTPConnection
+
+        def urlopen(self, *args, **kwargs):
+            stats.record_request()
+            return super().urlopen(*args, **kwargs)
+
+    class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = CountingHTTPSConnection
+
+        def urlopen(self, *args, **kwargs):
+            stats.record_request()
+            return super().urlopen(*args, **kwargs)
+
+    return {"http": CountingHTTPConnectionPool, "https": CountingHTTPSConnectionPool}
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with a default timeout and connection counters."""
+
+    def __init__(self, stats: PoolStats, timeout, **kwargs):
+        self.stats = stats
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = _counting_pool_classes(self.stats)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class HttpPool:
+    """Keep-alive connection pool with retry/backoff and default timeouts."""
+
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout=HTTP_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    ):
+        self.stats = PoolStats()
+        retry = WriteSafeRetry(
+            total=max_retries,
+            read=0,
+            other=0,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=None,  # 429/503 mean the request was not processed; see WriteSafeRetry
+            respect_retry_after_header=True,
+            raise_on_status=False,  # tests inspect the final status themselves
+        )
+        self.adapter = PooledAdapter(
+            self.stats,
+            timeout,
+            pool_maxsize=pool_size,
+            max_retries=retry,
+        )
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        """Per-thread session mounted on the shared adapter."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self.adapter)
+            session.mount("https://", self.adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not tracer.enabled:
+            return self.session.request(method, url, **kwargs)
+        event = tracer.start(method, url, kwargs.get("headers"), kwargs.get("json"))
+        try:
+            resp = self.session.request(method, url, **kwargs)
+        except Exception as e:
+            tracer.finish(event, error=e)
+            raise
+        tracer.finish(event, resp)
+        return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> requests.Response:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _new_pool(**kwargs) -> HttpPool:
+    if RLS_BACKEND == "postgres":
+        from pg_backend import PgTransport
+        return PgTransport(**kwargs)
+    return HttpPool(**kwargs)
+
+
+def get_pool() -> HttpPool:
+    """Return the process-wide pool (a PgTransport for RLS_BACKEND=postgres), creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _new_pool()
+    return _pool
+
+
+def configure_pool(**kwargs) -> HttpPool:
+    """Replace the process-wide pool, e.g. to size it for --workers."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = _new_pool(**kwargs)
+    return _pool
+
+
+# -- asyncio variant (optional: pip install aiohttp) --
+
+class AsyncResponse:
+    """The parts of requests.Response the suite uses, read from an aiohttp reply."""
+
+    __slots__ = ("status_code", "headers", "text", "url", "elapsed")
+
+    def __init__(self, status_code: int, headers: dict, text: str, url: str, elapsed: timedelta):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)  # as requests.Response: Content-Range == content-range
+        self.text = text
+        self.url = url
+        self.elapsed = elapsed
+
+    def json(self):
+        return json.loads(self.text) if self.text else None
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error for url: {self.url}", response=self)
+
+
+class AsyncHttpPool:
+    """
+    aiohttp session with the same retry/backoff, timeout and counter
+    behaviour as HttpPool. Create and use it inside one running event loop.
+    """
+
+    def __init__(
+        self,
+        pool_size: int = ASYNC_HTTP_POOL_SIZE,
+        timeout=HTTP_TIMEOUT,
+        max_retries: int = HTTP_MAX_RETRIES,
+        backoff_factor: float = HTTP_BACKOFF_FACTOR,
+    ):
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise ImportError("AsyncHttpPool needs aiohttp: pip install aiohttp") from e
+        self._aiohttp = aiohttp
+        self.stats = PoolStats()
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+        async def on_connection_create_end(session, ctx, params):
+            self.stats.record_open()
+
+        async def on_request_start(session, ctx, params):
+            self.stats.record_request()
+
+        trace = aiohttp.TraceConfig()
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_request_start.append(on_request_start)
+
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size, limit_per_host=pool_size),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect, sock_read=read),
+            trace_configs=[trace],
+        )
+
+    def _backoff(self, attempt: int, retry_after: str = None) -> float:
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff_factor * (2 ** attempt)
+
+    async def request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        if not tracer.enabled:
+            return await self._request(method, url, **kwargs)
+        event = tracer.start(method, url, kwargs.get("headers"), kwargs.get("json"))
+        try:
+            resp = await self._request(method, url, **kwargs)
+        except Exception as e:
+            tracer.finish(event, error=e)
+            raise
+        tracer.finish(event, resp)
+        return resp
+
+    async def _request(self, method: str, url: str, **kwargs) -> AsyncResponse:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self.session.request(method, url, **kwargs) as resp:
+                    text = await resp.text()
+            except self._aiohttp.ClientConnectorError:
+                if attempt >= self.max_retries or method.upper() not in IDEMPOTENT_METHODS:
+                    raise
+                await asyncio.sleep(self._backoff(attempt))
+                attempt += 1
+                continue
+            if resp.status in RETRY_STATUSES and attempt < self.max_retries:
+                await asyncio.sleep(self._backoff(attempt, resp.headers.get("Retry-After")))
+                attempt += 1
+                continue
+            elapsed = timedelta(seconds=time.perf_counter() - start)
+            return AsyncResponse(resp.status, resp.headers, text, str(resp.url), elapsed)
+
+    async def get(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def head(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("HEAD", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def patch(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("PATCH", url, **kwargs)
+
+    async def delete(self, url: str, **kwargs) -> AsyncResponse:
+        return await self.request("DELETE", url, **kwargs)
+
+    async def close(self):
+        await self.session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+_async_pools = weakref.WeakKeyDictionary()  # event loop -> AsyncHttpPool
+_async_pools_lock = threading.Lock()
+
+
+def get_async_pool() -> AsyncHttpPool:
+    """Return the pool for the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _async_pools_lock:
+        # A pool's session refers to its loop, so entries of loops that ended
+        # without close_async_pool() are only freed by dropping them here
+        for stale in [lp for lp in _async_pools if lp.is_closed()]:
+            del _async_pools[stale]
+        pool = _async_pools.get(loop)
+        if pool is None or pool.session.closed:
+            pool = _async_pools[loop] = AsyncHttpPool()
+    return pool
+
+
+async def close_async_pool():
+    """Close the running loop's pool; await it before the loop ends (e.g. last in asyncio.run's coroutine)."""
+    with _async_pools_lock:
+        pool = _async_pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
@@ -0,0 +1,238 @@
+"""
+RLS Change Impact
+=================
+Works out which tables and RPCs a change to the policy SQL can affect,
+so run_rls_tests.py can run only the suites and matrix cells behind them.
+
+    python run_rls_tests.py --changed-since origin/main
+    python impact.py origin/main          # just print the impact
+
+SQL_FILES are parsed (in the order they are applied) into objects:
+policies, functions and triggers, each with the functions it calls and
+the tables it reads. The object texts at the git ref and in the working
+tree are compared, and every changed object is expanded to its targets:
+
+- a policy            -> its table, plus tables whose policies read that
+                         table in a subquery (those subqueries run under RLS)
+- a function          -> every function calling it, transitively; every
+                         policy using any of them (-> its table); triggers
+                         executing them (-> their table); and the RPC
+                         itself when the suites call it ("rpc:<name>")
+- a trigger           -> its table
+
+Functions here are SECURITY DEFINER, so a table read inside one does not
+pull in that table's policies. If the test harness itself changed, or the
+ref cannot be read, everything is selected.
+"""
+
+import os
+import re
+import subprocess
+import sys
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+SQL_FILES = [
+    "supabase/migrations/00002_rls_policies.sql",
+    "supabase/migrations/00003_rpc_functions.sql",
+    "scripts/fix-rls-security.sql",
+    "scripts/scorecard-rls.sql",
+    "scripts/rls-initplan-helpers.sql",
+]
+
+# Functions the suites call through /rest/v1/rpc/
+RPCS = {"start_new_week", "roll_forward_rock", "promote_rock_idea"}
+
+HARNESS_DIR = "tests/rls"
+
+EVERYTHING = None  # impact() result meaning "run all"
+
+_POLICY = re.compile(r'CREATE\s+POLICY\s+"([^"]+)"\s+ON\s+(?:public\.)?(\w+)', re.IGNORECASE)
+_DROP_POLICY = re.compile(r'DROP\s+POLICY\s+(?:IF\s+EXISTS\s+)?"([^"]+)"\s+ON\s+(?:public\.)?(\w+)', re.IGNORECASE)
+_FUNCTION = re.compile(r'CREATE\s+(?:OR\s+REPLACE\s+)?FUNCTION\s+(?:public\.)?(\w+)\s*\(', re.IGNORECASE)
+_TRIGGER = re.compile(r'CREATE\s+TRIGGER\s+(\w+).*?\sON\s+(?:public\.)?(\w+).*?EXECUTE\s+(?:FUNCTION|PROCEDURE)\s+'
+                      r'(?:public\.)?(\w+)', re.IGNORECASE | re.DOTALL)
+_CALL = re.compile(r'(?:public\.)?(\w+)\s*\(')
+_READ = re.compile(r'\b(?:FROM|JOIN)\s+(?:public\.)?(\w+)', re.IGNORECASE)
+
+
+def split_statements(sql: str) -> list[str]:
+    """Split on top-level semicolons, skipping comments, quotes and $$ bodies."""
+    statements, start, i, n = [], 0, 0, len(sql)
+    while i < n:
+        if sql.startswith("--", i):
+            end = sql.find("\n", i)
+            i = n if end < 0 else end
+        elif sql[i] == "'":
+            end = sql.find("'", i + 1)
+            i = n if end < 0 else end + 1
+        elif sql[i] == "$" and (m := re.match(r"\$\w*\$", sql[i:])):
+            end = sql.find(m.group(), i + len(m.group()))
+            i = n if end < 0 else end + len(m.group())
+        elif sql[i] == ";":
+            statements.append(sql[start:i].strip())
+            start = i = i + 1
+        else:
+            i += 1
+    if sql[start:].strip():
+        statements.append(sql[start:].strip())
+    return statements
+
+
+def _normalise(statement: str) -> str:
+    """Statement text without comments or whitespace differences."""
+    return " ".join(re.sub(r"--[^\n]*", "", statement).split())
+
+
+def parse_objects(sources: list[str]) -> dict:
+    """
+    -> {key: {"text", "calls", "reads", "table"}} where key is
+    ("policy", table, name), ("function", name) or ("trigger", table, name).
+    Later definitions replace earlier ones, as when the files are applied in order.
+    """
+    objects = {}
+    for sql in sources:
+        for statement in split_statements(sql):
+            body = _normalise(statement)
+            if m := _DROP_POLICY.match(body):
+                objects.pop(("policy", m.group(2), m.group(1)), None)
+            elif m := _POLICY.match(body):
+                objects[("policy", m.group(2), m.group(1))] = {
+                    "text": body, "table": m.group(2), "calls": set(_CALL.findall(body[m.end():])),
+                    "reads": set(_READ.findall(body)),
+                }
+            elif m := _FUNCTION.match(body):
+                objects[("function", m.group(1))] = {
+                    "text": body, "table": None, "calls": set(_CALL.findall(body[m.end():])) - {m.group(1)},
+                    "reads": set(_READ.findall(body)),
+                }
+            elif m := _TRIGGER.match(body):
+                objects[("trigger", m.group(2), m.group(1))] = {
+                    "text": body, "table": m.group(2), "calls": {m.group(3)}, "reads": set(),
+                }
+    return objects
+
+
+def catalog_objects(catalog: dict) -> dict:
+    """
+    parse_objects() shape from live definitions, as returned by the
+    rls_schema_objects() RPC (scripts/rls-schema-objects.sql).
+    Overloaded functions share one key, their definitions joined.
+    """
+    objects = {}
+    for p in catalog.get("policies", []):
+        body = _normalise(" ".join(str(p.get(k)) for k in ("permissive", "roles", "cmd", "qual", "with_check")))
+        objects[("policy", p["tablename"], p["policyname"])] = {
+            "text": body, "table": p["tablename"], "calls": set(_CALL.findall(body)),
+            "reads": set(_READ.findall(body)),
+        }
+    for f in catalog.get("functions", []):
+        body = _normalise(f["definition"])
+        obj = objects.setdefault(("function", f["name"]), {"text": "", "table": None, "calls": set(), "reads": set()})
+        obj["text"] = f"{obj['text']} {body}".strip()
+        obj["calls"] |= set(_CALL.findall(body)) - {f["name"]}
+        obj["reads"] |= set(_READ.findall(body))
+    for t in catalog.get("triggers", []):
+        objects[("trigger", t["tablename"], t["name"])] = {
+            "text": _normalise(t["definition"]), "table": t["tablename"], "calls": {t["function"]}, "reads": set(),
+        }
+    return objects
+
+
+def read_sources(ref: str = None) -> list[str]:
+    """SQL_FILES at `ref` (git) or in the working tree; missing files read as empty."""
+    sources = []
+    for rel in SQL_FILES:
+        if ref is None:
+            path = os.path.join(REPO_ROOT, rel)
+            sources.append(open(path).read() if os.path.exists(path) else "")
+            continue
+        out = subprocess.run(["git", "show", f"{ref}:{rel}"], cwd=REPO_ROOT, capture_output=True, text=True)
+        sources.append(out.stdout if out.returncode == 0 else "")
+    return sources
+
+
+def changed_objects(before: dict, after: dict) -> set:
+    return {key for key in before.keys() | after.keys()
+            if (before.get(key) or {}).get("text") != (after.get(key) or {}).get("text")}
+
+
+def expand(changed: set, objects: dict) -> set:
+    """Targets ('<table>' or 'rpc:<function>') reachable from the changed objects."""
+    functions = {key[1] for key in objects if key[0] == "function"}
+    callers = {}
+    for key, obj in objects.items():
+        for fn in obj["calls"] & functions:
+            callers.setdefault(fn, set()).add(key)
+    readers = {}
+    for key, obj in objects.items():
+        if key[0] == "policy":
+            for table in obj["reads"]:
+                readers.setdefault(table, set()).add(key)
+
+    targets, seen = set(), set()
+    stack = list(changed)
+    while stack:
+        key = stack.pop()
+        if key in seen:
+            continue
+        seen.add(key)
+        if key[0] == "function":
+            if key[1] in RPCS:
+                targets.add(f"rpc:{key[1]}")
+            stack.extend(callers.get(key[1], ()))
+        else:
+            table = key[1]
+            if table not in targets:
+                targets.add(table)
+                if key[0] == "policy":
+                    stack.extend(readers.get(table, ()))
+    return targets
+
+
+def affecting(objects: dict, targets: set) -> set:
+    """Keys of the objects whose change would reach any of `targets`."""
+    return {key for key in objects if expand({key}, objects) & targets}
+
+
+def harness_changed(ref: str) -> bool:
+    out = subprocess.run(["git", "diff", "--name-only", ref, "--", HARNESS_DIR],
+                         cwd=REPO_ROOT, capture_output=True, text=True)
+    return out.returncode != 0 or bool(out.stdout.strip())
+
+
+def impact(ref: str) -> tuple[set | None, set]:
+    """
+    -> (targets, changed object keys) for working tree vs ref.
+    targets is EVERYTHING (None) when the harness changed or ref is unreadable.
+    """
+    check = subprocess.run(["git", "rev-parse", "--verify", f"{ref}^{{commit}}"],
+                           cwd=REPO_ROOT, capture_output=True, text=True)
+    if check.returncode != 0:
+        return EVERYTHING, set()
+    after = parse_objects(read_sources())
+    changed = changed_objects(parse_objects(read_sources(ref)), after)
+    if harness_changed(ref):
+        return EVERYTHING, changed
+    # Expand against the current definitions; a dropped object still names its table
+    return expand(changed, after | {k: {"calls": set(), "reads": set()} for k in changed - after.keys()}), changed
+
+
+def describe(key: tuple) -> str:
+    return f"{key[0]} {'.'.join(key[1:])}"
+
+
+def main():
+    ref = sys.argv[1] if len(sys.argv) > 1 else "HEAD"
+    targets, changed = impact(ref)
+    print(f"Changed since {ref}:")
+    for key in sorted(changed):
+        print(f"  {describe(key)}")
+    if targets is EVERYTHING:
+        print("Affected: everything (test harness changed or ref unreadable)")
+    else:
+        print(f"Affected: {', '.join(sorted(targets)) or 'nothing'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""
+RLS Load Generator
+==================
+Replays a weighted, per-role mix of app-like operations against the RLS
+layer at a fixed request rate for a fixed duration, to see how the
+rocks, issues, todos, meetings and scorecard policies hold up under
+sustained concurrent load.
+
+The schedule is open-loop: request i is due at start + i / rps no matter
+how slow earlier requests were, and its latency is measured from that due
+time. A saturated database therefore shows up as growing latency instead
+of a silently lower request rate.
+
+Results are bucketed per interval (throughput, error rate, percentiles)
+with an overall latency histogram per operation.
+
+    python run_rls_tests.py --load --load-rps 50 --load-duration 120
+    python run_rls_tests.py --load --load-mix "rocks_read=5,issue_insert=1"
+"""
+
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+from config import SUPABASE_URL
+from fixture_manager import DELETE_CHUNK, FixtureManager, TeardownError
+from fixtures import Fixtures
+from result_collector import percentile
+from supabase_client import SupabaseClient, admin_delete_where, admin_query
+
+HISTOGRAM_BOUNDS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+def _load_week(i: int) -> str:
+    """Far-future Mondays, distinct from the ones bench.py uses."""
+    return (date(2200, 1, 6) + timedelta(weeks=i)).isoformat()
+
+
+class LoadContext:
+    """What an operation needs: the role's client and user, fixtures, created rows."""
+
+    def __init__(self, client: SupabaseClient, user_id: str, data: Fixtures, created: FixtureManager):
+        self.client = client
+        self.user_id = user_id
+        self.data = data
+        self.created = created
+        gids = data.user_groups.get(user_id) or [g.id for g in data.groups[:1]]
+        self.group_id = gids[0] if gids else None
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_kept = False
+
+    def keep_current_snapshot(self):
+        """
+        Before the first start_new_week: register the user's current focus
+        snapshot for revert, since the RPC marks it is_current = false and
+        teardown only deletes the snapshots the run created.
+        """
+        with self._snapshot_lock:
+            if self._snapshot_kept:
+                return
+            for row in admin_query("focus_snapshots", "id", f"user_id=eq.{self.user_id}"
+                                   f"&group_id=eq.{self.group_id}&is_current=eq.true"):
+                self.created.revert("focus_snapshots", row["id"], {"is_current": True})
+            self._snapshot_kept = True
+
+
+# -- Operations: fn(ctx, i) -> Response --
+
+def op_focus_read(ctx: LoadContext, i: int):
+    """Weekly focus page: the user's current snapshot."""
+    return ctx.client.select("focus_snapshots", "*",
+                             {"user_id": f"eq.{ctx.user_id}", "is_current": "eq.true"})
+
+
+def op_focus_items_read(ctx: LoadContext, i: int):
+    return ctx.client.select("focus_items", "*")
+
+
+def op_start_new_week(ctx: LoadContext, i: int):
+    ctx.keep_current_snapshot()
+    resp = ctx.client.rpc("start_new_week", {
+        "p_user_id": ctx.user_id,
+        "p_group_id": ctx.group_id,
+        "p_new_week_date": _load_week(i),
+    })
+    if resp.status_code == 200 and resp.json():
+        ctx.created.record("focus_snapshots", [resp.json()])
+    return resp
+
+
+def op_rocks_read(ctx: LoadContext, i: int):
+    return ctx.client.select("rocks", "id,title,status,group_id,owner_id")
+
+
+def op_issues_read(ctx: LoadContext, i: int):
+    return ctx.client.select("issues", "id,description,status,group_id")
+
+
+def op_issue_insert(ctx: LoadContext, i: int):
+    return ctx.created.create(ctx.client, "issues", {
+        "description": f"RLS load issue {i}", "group_id": ctx.group_id, "raised_by": ctx.user_id,
+    })
+
+
+def op_todos_read(ctx: LoadContext, i: int):
+    return ctx.client.select("todos", "id,description,status,group_id")
+
+
+def op_meetings_read(ctx: LoadContext, i: int):
+    return ctx.client.select("meetings", "id,meeting_date,group_id")
+
+
+def op_scorecard_read(ctx: LoadContext, i: int):
+    return ctx.client.select("scorecard_entries", "id,measure_id,user_id,week_ending,value")
+
+
+OPERATIONS = {
+    "focus_read": op_focus_read,
+    "focus_items_read": op_focus_items_read,
+    "start_new_week": op_start_new_week,
+    "rocks_read": op_rocks_read,
+    "issues_read": op_issues_read,
+    "issue_insert": op_issue_insert,
+    "todos_read": op_todos_read,
+    "meetings_read": op_meetings_read,
+    "scorecard_read": op_scorecard_read,
+}
+
+# Rough shape of real traffic: team members live on the weekly focus and
+# scorecard pages, executives and admins read across groups.
+DEFAULT_MIX = {
+    "team_member": {
+        "focus_read": 6, "focus_items_read": 4, "rocks_read": 3, "issues_read": 2, "todos_read": 2,
+        "scorecard_read": 3, "meetings_read": 1, "issue_insert": 1, "start_new_week": 0.2,
+    },
+    "executive": {
+        "rocks_read": 5, "issues_read": 3, "scorecard_read": 5, "meetings_read": 2, "todos_read": 1,
+        "focus_read": 1,
+    },
+    "system_admin": {
+        "rocks_read": 3, "issues_read": 3, "scorecard_read": 3, "meetings_read": 2, "todos_read": 2,
+        "issue_insert": 0.5,
+    },
+}
+
+
+def parse_mix(text: str) -> dict:
+    """'rocks_read=5,issue_insert=1' -> {op: weight}; applied to every role."""
+    mix = {}
+    for part in filter(None, (p.strip() for p in text.split(","))):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"unknown operation '{name}' (known: {', '.join(OPERATIONS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def build_schedule(roles: list, mix: dict, count: int, seed: int) -> list[tuple[str, str]]:
+    """Deterministic list of (role, op) picks; roles share traffic equally."""
+    rng = random.Random(seed)
+    plans = []
+    for role, _ in roles:
+        weights = mix or DEFAULT_MIX.get(role, DEFAULT_MIX["team_member"])
+        ops = [op for op, w in weights.items() if w > 0]
+        plans.append((role, ops, [weights[op] for op in ops]))
+    schedule = []
+    for _ in range(count):
+        role, ops, weights = plans[rng.randrange(len(plans))]
+        schedule.append((role, rng.choices(ops, weights)[0]))
+    return schedule
+
+
+class Sample:
+    __slots__ = ("due", "role", "op", "latency", "status")
+
+    def __init__(self, due: float, role: str, op: str, latency: float, status: int):
+        self.due = due
+        self.role = role
+        self.op = op
+        self.latency = latency
+        self.status = status  # 0 = no response (connection error)
+
+
+def histogram(latencies_ms: list) -> dict:
+    """Counts per HISTOGRAM_BOUNDS_MS bucket, keyed by upper bound ('inf' last)."""
+    counts = dict.fromkeys([str(b) for b in HISTOGRAM_BOUNDS_MS] + ["inf"], 0)
+    for ms in latencies_ms:
+        for bound in HISTOGRAM_BOUNDS_MS:
+            if ms <= bound:
+                counts[str(bound)] += 1
+                break
+        else:
+            counts["inf"] += 1
+    return counts
+
+
+def _stats(samples: list, seconds: float) -> dict:
+    values = sorted(s.latency for s in samples)
+    errors = sum(1 for s in samples if s.status == 0 or s.status >= 500)
+    denied = sum(1 for s in samples if 400 <= s.status < 500)
+    return {
+        "n": len(values),
+        "rps": len(values) / seconds if seconds else 0.0,
+        "errors": errors,
+        "error_rate": errors / len(values) if values else 0.0,
+        "denied": denied,
+        "latency_ms": {
+            "p50": percentile(values, 50) * 1000,
+            "p95": percentile(values, 95) * 1000,
+            "p99": percentile(values, 99) * 1000,
+            "max": (values[-1] if values else 0.0) * 1000,
+        },
+    }
+
+
+def run_load(clients: dict, roles: list, data: Fixtures, rps: float = 20.0, duration: float = 60.0,
+             mix: dict = None, workers: int = 16, interval: float = 5.0, seed: int = 0,
+             progress: bool = True) -> dict:
+    """
+    clients: role -> SupabaseClient; roles: [(role, Profile)].
+    Drives `rps` requests/second for `duration` seconds and returns the JSON-ready report.
+    """
+    if rps <= 0:
+        raise ValueError(f"rps must be > 0, got {rps}")
+    created = FixtureManager()
+    contexts = {role: LoadContext(clients[role], user.id, data, created) for role, user in roles}
+    schedule = build_schedule(roles, mix, int(rps * duration), seed)
+    samples = []
+    samples_lock = threading.Lock()
+
+    def fire(i: int, due: float, role: str, op: str):
+        try:
+            status = OPERATIONS[op](contexts[role], i).status_code
+        except Exception:
+            status = 0
+        sample = Sample(due, role, op, time.perf_counter() - due, status)
+        with samples_lock:
+            samples.append(sample)
+
+    start = time.perf_counter()
+    next_report = interval
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, (role, op) in enumerate(schedule):
+            due = start + i / rps
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(fire, i, due, role, op)
+            if progress and due - start >= next_report:
+                with samples_lock:
+                    window = [s for s in samples if s.due - start >= next_report - interval]
+                _print_interval(next_report, _stats(window, interval))
+                next_report += interval
+    elapsed = time.perf_counter() - start
+
+    timeline = []
+    for n in range(int(elapsed // interval) + 1):
+        window = [s for s in samples if n * interval <= s.due - start < (n + 1) * interval]
+        if window:
+            timeline.append(dict(_stats(window, interval), t=n * interval,
+                                 histogram=histogram([s.latency * 1000 for s in window])))
+
+    by_op = {}
+    for s in samples:
+        by_op.setdefault((s.role, s.op), []).append(s)
+    operations = [
+        dict(_stats(group, elapsed), role=role, op=op, histogram=histogram([s.latency * 1000 for s in group]))
+        for (role, op), group in sorted(by_op.items())
+    ]
+
+    # start_new_week copies focus items into the snapshots it creates
+    snapshots = created.created.get("focus_snapshots", [])
+    for n in range(0, len(snapshots), DELETE_CHUNK):
+        admin_delete_where("focus_items", f"snapshot_id=in.({','.join(snapshots[n:n + DELETE_CHUNK])})")
+    try:
+        created.teardown()
+    except TeardownError as e:
+        print(f"  Load teardown FAILED: {e}\n  remove the leftovers with: python run_rls_tests.py --sweep")
+
+    return {
+        "meta": {
+            "url": SUPABASE_URL,
+            "target_rps": rps,
+            "duration": duration,
+            "elapsed": elapsed,
+            "workers": workers,
+            "interval": interval,
+            "seed": seed,
+            "mix": mix or {role: DEFAULT_MIX.get(role, DEFAULT_MIX["team_member"]) for role, _ in roles},
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "overall": dict(_stats(samples, elapsed), histogram=histogram([s.latency * 1000 for s in samples])),
+        "timeline": timeline,
+        "operations": operations,
+    }
+
+
+def _print_interval(t: float, stats: dict):
+    lat = stats["latency_ms"]
+    print(f"  t={t:>6.0f}s  {stats['rps']:>7.1f} rps  err {stats['error_rate']:>6.1%}  "
+          f"p50 {lat['p50']:>7.1f}  p95 {lat['p95']:>7.1f}  p99 {lat['p99']:>7.1f} ms")
+
+
+def print_report(report: dict):
+    overall = report["overall"]
+    meta = report["meta"]
+    print(f"\nLoad: {overall['n']} requests in {meta['elapsed']:.1f}s "
+          f"({overall['rps']:.1f} rps, target {meta['target_rps']}), "
+          f"{overall['errors']} errors, {overall['denied']} denied")
+
+    print(f"\n{'role':<14}{'op':<18}{'n':>7}{'rps':>8}{'err%':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for r in report["operations"]:
+        lat = r["latency_ms"]
+        print(f"{r['role']:<14}{r['op']:<18}{r['n']:>7}{r['rps']:>8.1f}{r['error_rate'] * 100:>7.1f}"
+              f"{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}")
+
+    print("\nLatency histogram (ms)")
+    total = overall["n"] or 1
+    for bound, count in overall["histogram"].items():
+        label = f"<= {bound}" if bound != "inf" else f">  {HISTOGRAM_BOUNDS_MS[-1]}"
+        print(f"  {label:>8}  {count:>7}  {'#' * round(40 * count / total)}")
+
+
+def write_report(report: dict, path: str = None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
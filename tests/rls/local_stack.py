@@ -0,0 +1,959 @@
+"""
+Local Supabase Stand-in
+=======================
+In-process emulation of the PostgREST and GoTrue endpoints the RLS suite
+calls, so run_rls_tests.py can run offline with no network latency.
+
+    RLS_BACKEND=local python run_rls_tests.py     # starts the stand-in itself
+    python local_stack.py --port 54329            # or run it standalone
+
+Emulated endpoints:
+    GET/HEAD/POST/PATCH/DELETE /rest/v1/<table>
+    POST /rest/v1/rpc/<function>
+    POST /auth/v1/admin/generate_link, /auth/v1/verify,
+         /auth/v1/token?grant_type=refresh_token
+
+GET honours the Range header (Range-Unit: items) and Prefer: count=exact,
+answering with Content-Range the way PostgREST does. select= embeds
+one-to-many children (EMBEDS), each read under its own SELECT policy.
+
+Row-level security is enforced by POLICIES below: one Python predicate per
+CREATE POLICY in supabase/migrations/00002_rls_policies.sql,
+scripts/fix-rls-security.sql, scripts/scorecard-rls.sql and
+scripts/rls-initplan-helpers.sql, under the same name. check_policy_drift() compares the two sets so an SQL policy without
+a Python counterpart is reported at startup. The RPCs and triggers mirror
+00003_rpc_functions.sql as patched by fix-rls-security.sql.
+
+The app is a plain WSGI callable (LocalStack.wsgi_app); make_server() wraps it in
+a threaded HTTP/1.1 server so clients keep their connections alive.
+"""
+
+import argparse
+import json
+import os
+import re
+import secrets
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl, unquote
+
+from pgrest_sql import parse_select
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+POLICY_FILES = [
+    "supabase/migrations/00002_rls_policies.sql",
+    "scripts/fix-rls-security.sql",
+    "scripts/scorecard-rls.sql",
+    "scripts/rls-initplan-helpers.sql",
+]
+
+LOCAL_SERVICE_ROLE_KEY = "local-service-role-key"
+LOCAL_ANON_KEY = "local-anon-key"
+SESSION_TTL = 3600
+
+
+class PgError(Exception):
+    """An error PostgREST/GoTrue would surface as an HTTP status + JSON body."""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+# -- Storage --
+
+class Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows = []
+        self.by_id = {}
+
+    def add(self, row: dict) -> dict:
+        self.rows.append(row)
+        self.by_id[row["id"]] = row
+        return row
+
+    def remove(self, rows: list):
+        ids = {r["id"] for r in rows}
+        self.rows = [r for r in self.rows if r["id"] not in ids]
+        for i in ids:
+            self.by_id.pop(i, None)
+
+
+class Database:
+    def __init__(self):
+        self.tables = {name: Table(name) for name in TABLES}
+        self.lock = threading.RLock()
+
+    def table(self, name: str) -> Table:
+        if name not in self.tables:
+            raise PgError(404, "42P01", f'relation "public.{name}" does not exist')
+        return self.tables[name]
+
+    def get(self, name: str, row_id):
+        return self.tables[name].by_id.get(row_id)
+
+    def insert(self, name: str, row: dict) -> dict:
+        row = dict(row)
+        row.setdefault("id", str(uuid.uuid4()))
+        row.setdefault("created_at", _now())
+        return self.tables[name].add(row)
+
+
+# -- Request context (auth.uid() and the RLS helper functions) --
+
+class Ctx:
+    """Per-request auth state. Helpers are memoised like STABLE functions."""
+
+    def __init__(self, db: Database, uid: str = None, service: bool = False):
+        self.db = db
+        self.uid = uid
+        self.service = service
+        self._group_ids = None
+        self._role = None
+
+    @property
+    def anon(self) -> bool:
+        return not self.service and self.uid is None
+
+    @property
+    def group_ids(self) -> set:
+        """public.user_group_ids()"""
+        if self._group_ids is None:
+            self._group_ids = {
+                m["group_id"] for m in self.db.tables["group_members"].rows
+                if m["user_id"] == self.uid
+            }
+        return self._group_ids
+
+    @property
+    def role(self):
+        """public.user_role()"""
+        if self._role is None:
+            profile = self.db.get("profiles", self.uid)
+            self._role = profile["role"] if profile else ""
+        return self._role or None
+
+    @property
+    def is_admin(self) -> bool:
+        """public.is_admin_or_sysadmin()"""
+        return self.role == "system_admin"
+
+    @property
+    def sees_all(self) -> bool:
+        return self.role in ("executive", "system_admin")
+
+    def member(self, group_id) -> bool:
+        return group_id in self.group_ids
+
+    def group_admin(self, group_id) -> bool:
+        return any(
+            m["group_id"] == group_id and m["user_id"] == self.uid and m["role_in_group"] == "admin"
+            for m in self.db.tables["group_members"].rows
+        )
+
+    def is_group_lead_or_exec(self, group_id) -> bool:
+        if self.is_admin:
+            return True
+        return any(
+            m["group_id"] == group_id and m["user_id"] == self.uid
+            and m["role_in_group"] in ("group_lead", "executive")
+            for m in self.db.tables["group_members"].rows
+        )
+
+    def template_group(self, template_id):
+        t = self.db.get("scorecard_templates", template_id)
+        return t["group_id"] if t else None
+
+    def section_group(self, section_id):
+        s = self.db.get("scorecard_sections", section_id)
+        return self.template_group(s["template_id"]) if s else None
+
+    def measure_group(self, measure_id):
+        m = self.db.get("scorecard_measures", measure_id)
+        return self.section_group(m["section_id"]) if m else None
+
+    def entry_owner(self, entry_id):
+        e = self.db.get("scorecard_entries", entry_id)
+        return e["user_id"] if e else None
+
+    def parent(self, table: str, row_id):
+        return self.db.get(table, row_id)
+
+
+# -- Policies (name -> predicate, mirroring the SQL) --
+
+POLICIES = {}
+
+
+def policy(name: str, table: str, command: str, predicate):
+    POLICIES.setdefault(table, {}).setdefault(command, []).append((name, predicate))
+
+
+def _group_visible(c: Ctx, group_id) -> bool:
+    return c.member(group_id) or c.sees_all
+
+
+def _group_visible_sc(c: Ctx, group_id) -> bool:
+    return c.member(group_id) or c.is_admin
+
+
+def _rock_admin(c: Ctx, rock: dict) -> bool:
+    return rock["owner_id"] == c.uid or c.group_admin(rock["group_id"]) or c.is_admin
+
+
+def _snapshot_owned_this_week(c: Ctx, snapshot_id) -> bool:
+    fs = c.parent("focus_snapshots", snapshot_id)
+    if not fs or fs["user_id"] != c.uid:
+        return False
+    today = datetime.now(timezone.utc).date()
+    monday = today.toordinal() - today.weekday()
+    return str(fs["week_date"]) == datetime.fromordinal(monday).date().isoformat()
+
+
+def _milestone_rock(c: Ctx, milestone_id):
+    m = c.parent("milestones", milestone_id)
+    return c.parent("rocks", m["rock_id"]) if m else None
+
+
+# profiles
+policy("profiles_select", "profiles", "SELECT", lambda c, r: True)
+policy("profiles_update_own", "profiles", "UPDATE", lambda c, r: r["id"] == c.uid)
+policy("profiles_update_admin", "profiles", "UPDATE", lambda c, r: c.is_admin)
+
+# groups
+policy("groups_select", "groups", "SELECT", lambda c, r: _group_visible(c, r["id"]))
+policy("groups_insert", "groups", "INSERT", lambda c, r: c.is_admin)
+policy("groups_update", "groups", "UPDATE", lambda c, r: c.is_admin)
+
+# group_members
+policy("group_members_select", "group_members", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+# The SQL compares group_members.group_id with itself, so any group admin passes.
+policy("group_members_insert", "group_members", "INSERT", lambda c, r: c.is_admin or any(
+    m["user_id"] == c.uid and m["role_in_group"] == "admin" for m in c.db.tables["group_members"].rows))
+policy("group_members_delete", "group_members", "DELETE",
+       lambda c, r: c.is_admin or c.group_admin(r["group_id"]))
+
+# quarters
+policy("quarters_select", "quarters", "SELECT", lambda c, r: True)
+policy("quarters_insert", "quarters", "INSERT", lambda c, r: c.is_admin)
+policy("quarters_update", "quarters", "UPDATE", lambda c, r: c.is_admin)
+
+# rocks (rocks_insert as replaced by fix-rls-security.sql)
+policy("rocks_select", "rocks", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("rocks_insert", "rocks", "INSERT", lambda c, r: c.member(r["group_id"]) or c.is_admin)
+policy("rocks_update", "rocks", "UPDATE", _rock_admin)
+policy("rocks_delete", "rocks", "DELETE", lambda c, r: r["owner_id"] == c.uid or c.is_admin)
+
+# milestones
+policy("milestones_select", "milestones", "SELECT", lambda c, r: bool(
+    (rock := c.parent("rocks", r["rock_id"])) and _group_visible(c, rock["group_id"])))
+policy("milestones_insert", "milestones", "INSERT", lambda c, r: bool(
+    (rock := c.parent("rocks", r["rock_id"])) and c.member(rock["group_id"])))
+policy("milestones_update", "milestones", "UPDATE", lambda c, r: bool(
+    (rock := c.parent("rocks", r["rock_id"])) and _rock_admin(c, rock)))
+policy("milestones_delete", "milestones", "DELETE", lambda c, r: bool(
+    (rock := c.parent("rocks", r["rock_id"])) and (rock["owner_id"] == c.uid or c.is_admin)))
+
+# milestone_collaborators
+policy("milestone_collabs_select", "milestone_collaborators", "SELECT", lambda c, r: bool(
+    (rock := _milestone_rock(c, r["milestone_id"])) and _group_visible(c, rock["group_id"])))
+policy("milestone_collabs_insert", "milestone_collaborators", "INSERT", lambda c, r: bool(
+    (rock := _milestone_rock(c, r["milestone_id"])) and c.member(rock["group_id"])))
+policy("milestone_collabs_delete", "milestone_collaborators", "DELETE", lambda c, r: bool(
+    (rock := _milestone_rock(c, r["milestone_id"])) and (rock["owner_id"] == c.uid or c.is_admin)))
+
+# focus_snapshots / focus_items
+policy("focus_snapshots_select", "focus_snapshots", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("focus_snapshots_insert", "focus_snapshots", "INSERT", lambda c, r: r["user_id"] == c.uid)
+policy("focus_snapshots_update", "focus_snapshots", "UPDATE", lambda c, r: r["user_id"] == c.uid)
+policy("focus_items_select", "focus_items", "SELECT", lambda c, r: bool(
+    (fs := c.parent("focus_snapshots", r["snapshot_id"])) and _group_visible(c, fs["group_id"])))
+policy("focus_items_insert", "focus_items", "INSERT", lambda c, r: _snapshot_owned_this_week(c, r["snapshot_id"]))
+policy("focus_items_update", "focus_items", "UPDATE", lambda c, r: _snapshot_owned_this_week(c, r["snapshot_id"]))
+policy("focus_items_delete", "focus_items", "DELETE", lambda c, r: _snapshot_owned_this_week(c, r["snapshot_id"]))
+
+# issues
+policy("issues_select", "issues", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("issues_insert", "issues", "INSERT", lambda c, r: c.member(r["group_id"]))
+policy("issues_update", "issues", "UPDATE", lambda c, r: c.member(r["group_id"]) or c.is_admin)
+
+# todos
+policy("todos_select", "todos", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("todos_insert", "todos", "INSERT", lambda c, r: c.member(r["group_id"]))
+policy("todos_update", "todos", "UPDATE",
+       lambda c, r: r["assigned_to_id"] == c.uid or c.member(r["group_id"]) or c.is_admin)
+
+# meetings / meeting_attendees
+policy("meetings_select", "meetings", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("meetings_insert", "meetings", "INSERT", lambda c, r: c.group_admin(r["group_id"]) or c.is_admin)
+policy("meetings_update", "meetings", "UPDATE", lambda c, r: c.member(r["group_id"]) or c.is_admin)
+policy("meeting_attendees_select", "meeting_attendees", "SELECT", lambda c, r: bool(
+    (m := c.parent("meetings", r["meeting_id"])) and _group_visible(c, m["group_id"])))
+policy("meeting_attendees_insert", "meeting_attendees", "INSERT", lambda c, r: bool(
+    (m := c.parent("meetings", r["meeting_id"])) and c.member(m["group_id"])))
+policy("meeting_attendees_update", "meeting_attendees", "UPDATE", lambda c, r: r["user_id"] == c.uid or c.is_admin)
+
+# rock_ideas
+policy("rock_ideas_select", "rock_ideas", "SELECT", lambda c, r: _group_visible(c, r["group_id"]))
+policy("rock_ideas_insert", "rock_ideas", "INSERT", lambda c, r: c.member(r["group_id"]))
+policy("rock_ideas_update", "rock_ideas", "UPDATE", lambda c, r: c.member(r["group_id"]) or c.is_admin)
+
+# scorecard (scripts/scorecard-rls.sql)
+policy("scorecard_templates_select", "scorecard_templates", "SELECT",
+       lambda c, r: _group_visible_sc(c, r["group_id"]))
+policy("scorecard_templates_insert", "scorecard_templates", "INSERT", lambda c, r: c.is_admin)
+policy("scorecard_templates_update", "scorecard_templates", "UPDATE", lambda c, r: c.is_admin)
+policy("scorecard_sections_select", "scorecard_sections", "SELECT",
+       lambda c, r: _group_visible_sc(c, c.template_group(r["template_id"])))
+policy("scorecard_sections_insert", "scorecard_sections", "INSERT", lambda c, r: c.is_admin)
+policy("scorecard_sections_update", "scorecard_sections", "UPDATE", lambda c, r: c.is_admin)
+policy("scorecard_measures_select", "scorecard_measures", "SELECT",
+       lambda c, r: _group_visible_sc(c, c.section_group(r["section_id"])))
+policy("scorecard_measures_insert", "scorecard_measures", "INSERT", lambda c, r: c.is_admin)
+policy("scorecard_measures_update", "scorecard_measures", "UPDATE", lambda c, r: c.is_admin)
+policy("scorecard_goals_select", "scorecard_goals", "SELECT",
+       lambda c, r: _group_visible_sc(c, c.measure_group(r["measure_id"])))
+policy("scorecard_goals_insert", "scorecard_goals", "INSERT",
+       lambda c, r: c.is_group_lead_or_exec(c.measure_group(r["measure_id"])))
+policy("scorecard_goals_update", "scorecard_goals", "UPDATE",
+       lambda c, r: c.is_group_lead_or_exec(c.measure_group(r["measure_id"])))
+policy("goal_change_log_select", "goal_change_log", "SELECT", lambda c, r: c.is_admin or bool(
+    (g := c.parent("scorecard_goals", r["goal_id"])) and c.is_group_lead_or_exec(c.measure_group(g["measure_id"]))))
+policy("goal_change_log_insert", "goal_change_log", "INSERT", lambda c, r: True)
+policy("scorecard_entries_select", "scorecard_entries", "SELECT",
+       lambda c, r: _group_visible_sc(c, c.measure_group(r["measure_id"])))
+policy("scorecard_entries_insert", "scorecard_entries", "INSERT", lambda c, r: r["user_id"] == c.uid)
+policy("scorecard_entries_update", "scorecard_entries", "UPDATE", lambda c, r: r["user_id"] == c.uid)
+policy("scorecard_entries_delete", "scorecard_entries", "DELETE", lambda c, r: r["user_id"] == c.uid)
+policy("scorecard_entry_details_select", "scorecard_entry_details", "SELECT", lambda c, r: bool(
+    (e := c.parent("scorecard_entries", r["entry_id"])) and _group_visible_sc(c, c.measure_group(e["measure_id"]))))
+policy("scorecard_entry_details_insert", "scorecard_entry_details", "INSERT",
+       lambda c, r: c.entry_owner(r["entry_id"]) == c.uid)
+policy("scorecard_entry_details_update", "scorecard_entry_details", "UPDATE",
+       lambda c, r: c.entry_owner(r["entry_id"]) == c.uid)
+policy("scorecard_entry_details_delete", "scorecard_entry_details", "DELETE",
+       lambda c, r: c.entry_owner(r["entry_id"]) == c.uid)
+policy("campaigns_select", "campaigns", "SELECT", lambda c, r: _group_visible_sc(c, r["group_id"]))
+policy("campaigns_insert", "campaigns", "INSERT", lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("campaigns_update", "campaigns", "UPDATE", lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("campaign_weekly_data_select", "campaign_weekly_data", "SELECT", lambda c, r: bool(
+    (cp := c.parent("campaigns", r["campaign_id"])) and _group_visible_sc(c, cp["group_id"])))
+policy("campaign_weekly_data_insert", "campaign_weekly_data", "INSERT", lambda c, r: r["entered_by"] == c.uid)
+policy("campaign_weekly_data_update", "campaign_weekly_data", "UPDATE", lambda c, r: r["entered_by"] == c.uid)
+policy("campaign_metric_defs_select", "campaign_metric_definitions", "SELECT",
+       lambda c, r: _group_visible_sc(c, r["group_id"]))
+policy("campaign_metric_defs_insert", "campaign_metric_definitions", "INSERT",
+       lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("campaign_metric_defs_update", "campaign_metric_definitions", "UPDATE",
+       lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("campaign_metric_defs_delete", "campaign_metric_definitions", "DELETE",
+       lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("scorecard_settings_select", "scorecard_settings", "SELECT", lambda c, r: _group_visible_sc(c, r["group_id"]))
+policy("scorecard_settings_insert", "scorecard_settings", "INSERT", lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+policy("scorecard_settings_update", "scorecard_settings", "UPDATE", lambda c, r: c.is_group_lead_or_exec(r["group_id"]))
+
+TABLES = sorted(POLICIES)
+
+
+def allowed(ctx: Ctx, table: str, command: str, row: dict) -> bool:
+    """Permissive policies OR together; the service role bypasses RLS."""
+    if ctx.service:
+        return True
+    return any(pred(ctx, row) for _, pred in POLICIES[table].get(command, []))
+
+
+def sql_policy_names() -> set:
+    """Names of every CREATE POLICY in POLICY_FILES."""
+    pattern = re.compile(r'CREATE POLICY\s+"([^"]+)"', re.IGNORECASE)
+    names = set()
+    for rel in POLICY_FILES:
+        path = os.path.join(REPO_ROOT, rel)
+        if os.path.exists(path):
+            with open(path) as f:
+                names.update(pattern.findall(f.read()))
+    return names
+
+
+def check_policy_drift() -> tuple[set, set]:
+    """(policies only in SQL, policies only in the stand-in)."""
+    ours = {name for cmds in POLICIES.values() for preds in cmds.values() for name, _ in preds}
+    theirs = sql_policy_names()
+    return theirs - ours, ours - theirs
+
+
+# -- Triggers --
+
+def before_update(ctx: Ctx, table: str, old: dict, new: dict):
+    if table == "profiles" and new.get("role") != old.get("role"):
+        # prevent_role_escalation(): NULL != 'system_admin' is NULL, so the
+        # service role (no auth.uid()) passes, as in Postgres.
+        if not ctx.service and ctx.role != "system_admin":
+            raise PgError(400, "P0001", "Only system admins can change user roles")
+    if table == "quarters" and new.get("is_current"):
+        for q in ctx.db.tables["quarters"].rows:
+            if q["id"] != new["id"]:
+                q["is_current"] = False
+    if "updated_at" in old:
+        new["updated_at"] = _now()
+
+
+# -- RPCs (00003_rpc_functions.sql + fix-rls-security.sql) --
+
+def rpc_start_new_week(ctx: Ctx, p_user_id, p_group_id, p_new_week_date):
+    if p_user_id != ctx.uid:
+        raise PgError(400, "P0001", "Can only create focus snapshots for yourself")
+    if not ctx.member(p_group_id):
+        raise PgError(400, "P0001", "Not a member of this group")
+    db = ctx.db
+    old = next((s for s in db.tables["focus_snapshots"].rows
+                if s["user_id"] == p_user_id and s["group_id"] == p_group_id and s.get("is_current")), None)
+    if old:
+        old["is_current"] = False
+    if any(s["user_id"] == p_user_id and s["group_id"] == p_group_id and s["week_date"] == p_new_week_date
+           for s in db.tables["focus_snapshots"].rows):
+        raise PgError(409, "23505", "duplicate key value violates unique constraint")
+    new = db.insert("focus_snapshots", {
+        "user_id": p_user_id, "group_id": p_group_id, "week_date": p_new_week_date, "is_current": True,
+    })
+    if old:
+        items = sorted((i for i in db.tables["focus_items"].rows if i["snapshot_id"] == old["id"]),
+                       key=lambda i: i.get("sort_order") or 0)
+        for item in items:
+            copy = {k: v for k, v in item.items() if k not in ("id", "created_at", "updated_at")}
+            db.insert("focus_items", dict(copy, snapshot_id=new["id"], weekly_action=None))
+    return new["id"]
+
+
+def rpc_roll_forward_rock(ctx: Ctx, p_rock_id, p_new_quarter_id):
+    db = ctx.db
+    rock = db.get("rocks", p_rock_id)
+    if not rock:
+        raise PgError(400, "P0001", f"Rock not found: {p_rock_id}")
+    if not (rock["owner_id"] == ctx.uid or ctx.member(rock["group_id"]) or ctx.is_admin):
+        raise PgError(400, "P0001", "Not authorized to roll forward this rock")
+    rock["completion"] = "rolled_forward"
+    new = db.insert("rocks", {
+        "title": rock["title"], "owner_id": rock["owner_id"], "group_id": rock["group_id"],
+        "quarter_id": p_new_quarter_id, "status": "on_track", "completion": "in_progress",
+        "notes": rock.get("notes"), "rolled_from_rock_id": p_rock_id,
+    })
+    for m in [m for m in db.tables["milestones"].rows if m["rock_id"] == p_rock_id]:
+        nm = db.insert("milestones", {
+            "rock_id": new["id"], "title": m["title"], "status": "not_started",
+            "sort_order": m.get("sort_order", 0),
+        })
+        for mc in [mc for mc in db.tables["milestone_collaborators"].rows if mc["milestone_id"] == m["id"]]:
+            db.insert("milestone_collaborators", {"milestone_id": nm["id"], "user_id": mc["user_id"]})
+    return new["id"]
+
+
+def rpc_promote_rock_idea(ctx: Ctx, p_idea_id, p_quarter_id, p_owner_id):
+    db = ctx.db
+    idea = db.get("rock_ideas", p_idea_id)
+    if not idea:
+        raise PgError(400, "P0001", f"Rock idea not found: {p_idea_id}")
+    if not (ctx.member(idea["group_id"]) or ctx.is_admin):
+        raise PgError(400, "P0001", "Not authorized to promote this rock idea")
+    rock = db.insert("rocks", {
+        "title": idea["description"], "owner_id": p_owner_id, "group_id": idea["group_id"],
+        "quarter_id": p_quarter_id, "status": "on_track", "completion": "in_progress",
+    })
+    idea["promoted_to_rock_id"] = rock["id"]
+    return rock["id"]
+
+
+def rpc_rls_fixture_snapshot(ctx: Ctx):
+    if not ctx.service:
+        raise PgError(403, "42501", "permission denied for function rls_fixture_snapshot")
+
+    def pick(table, cols, limit=None):
+        rows = ctx.db.tables[table].rows[:limit] if limit else ctx.db.tables[table].rows
+        return [{c: r.get(c) for c in cols} for r in rows]
+
+    return {
+        "profiles": pick("profiles", ("id", "email", "full_name", "role")),
+        "groups": pick("groups", ("id", "name")),
+        "members": pick("group_members", ("id", "group_id", "user_id", "role_in_group")),
+        "rocks": pick("rocks", ("id", "title", "group_id", "owner_id"), 10),
+        "issues": pick("issues", ("id", "description", "group_id", "raised_by"), 5),
+        "meetings": pick("meetings", ("id", "meeting_date", "group_id"), 5),
+        "quarters": pick("quarters", ("id", "label", "is_current"), 5),
+        "rock_ideas": pick("rock_ideas", ("id", "description", "group_id"), 5),
+    }
+
+
+RPCS = {
+    "start_new_week": rpc_start_new_week,
+    "roll_forward_rock": rpc_roll_forward_rock,
+    "promote_rock_idea": rpc_promote_rock_idea,
+    "rls_fixture_snapshot": rpc_rls_fixture_snapshot,
+}
+
+
+# -- PostgREST query handling --
+
+def _text(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _compare(a, b) -> int:
+    try:
+        x, y = float(a), float(b)
+    except (TypeError, ValueError):
+        x, y = _text(a), _text(b)
+    return (x > y) - (x < y)
+
+
+def _in_list(value: str) -> list:
+    inner = value[1:-1] if value.startswith("(") and value.endswith(")") else value
+    return [v.strip().strip('"') for v in inner.split(",") if v.strip()]
+
+
+def _match(row: dict, column: str, expr: str) -> bool:
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, value = expr.partition(".")
+    actual = row.get(column)
+    if actual is None and op != "is":
+        return False  # SQL: any comparison with NULL (negated or not) is not true
+    if op == "eq":
+        result = _text(actual) == value
+    elif op == "neq":
+        result = _text(actual) != value
+    elif op in ("gt", "gte", "lt", "lte"):
+        cmp = _compare(actual, value)
+        result = {"gt": cmp > 0, "gte": cmp >= 0, "lt": cmp < 0, "lte": cmp <= 0}[op]
+    elif op == "in":
+        result = _text(actual) in _in_list(value)
+    elif op == "is":
+        result = _text(actual) == value
+    elif op in ("like", "ilike"):
+        pattern = "".join(".*" if ch in "*%" else "." if ch == "_" else re.escape(ch) for ch in value)
+        result = re.fullmatch(pattern, _text(actual), re.IGNORECASE if op == "ilike" else 0) is not None
+    else:
+        raise PgError(400, "PGRST100", f'unknown operator "{op}"')
+    return not result if negate else result
+
+
+RESERVED_PARAMS = {"select", "limit", "offset", "order", "columns", "on_conflict"}
+
+
+def _filters(params: list) -> list:
+    return [(k, v) for k, v in params if k not in RESERVED_PARAMS]
+
+
+def _range(header: str) -> tuple:
+    """'Range: 0-999' (Range-Unit: items) -> (0, 999); open end -> (n, None)."""
+    if not header:
+        return None, None
+    first, _, last = header.partition("-")
+    return int(first), (int(last) if last else None)
+
+
+# One-to-many embeds PostgREST resolves from the schema's foreign keys:
+# (parent table, child table) -> child column referencing the parent's id
+EMBEDS = {
+    **{("groups", child): "group_id" for child in (
+        "group_members", "rocks", "focus_snapshots", "issues", "todos", "meetings", "rock_ideas",
+        "scorecard_templates", "campaigns", "campaign_metric_definitions", "scorecard_settings")},
+    ("rocks", "milestones"): "rock_id",
+    ("milestones", "milestone_collaborators"): "milestone_id",
+    ("focus_snapshots", "focus_items"): "snapshot_id",
+    ("meetings", "meeting_attendees"): "meeting_id",
+    ("scorecard_templates", "scorecard_sections"): "template_id",
+    ("scorecard_sections", "scorecard_measures"): "section_id",
+    ("scorecard_measures", "scorecard_goals"): "measure_id",
+    ("scorecard_goals", "goal_change_log"): "goal_id",
+    ("scorecard_measures", "scorecard_entries"): "measure_id",
+    ("scorecard_entries", "scorecard_entry_details"): "entry_id",
+    ("campaigns", "campaign_weekly_data"): "campaign_id",
+}
+
+
+def _order(rows: list, order: str) -> list:
+    for term in reversed(order.split(",")):
+        column, _, direction = term.partition(".")
+        desc = direction.startswith("desc")
+        present = [r for r in rows if r.get(column) is not None]
+        missing = [r for r in rows if r.get(column) is None]
+        present.sort(key=lambda r: _text(r[column]) if not isinstance(r[column], (int, float)) else r[column],
+                     reverse=desc)
+        rows = present + missing
+    return rows
+
+
+# -- The application --
+
+class LocalStack:
+    """Request router for the emulated PostgREST + GoTrue endpoints."""
+
+    def __init__(self, db: Database = None):
+        self.db = db or seed_demo()
+        self.link_tokens = {}      # hashed_token -> user_id
+        self.access_tokens = {}    # access_token -> (user_id, expires_at)
+        self.refresh_tokens = {}   # refresh_token -> user_id
+
+    # auth
+
+    def _context(self, headers: dict) -> Ctx:
+        if not headers.get("apikey"):
+            raise PgError(401, "PGRST301", "No API key found in request")
+        auth = headers.get("authorization", "")
+        token = auth[7:] if auth.lower().startswith("bearer ") else headers["apikey"]
+        if token == LOCAL_SERVICE_ROLE_KEY:
+            return Ctx(self.db, service=True)
+        if token == LOCAL_ANON_KEY:
+            return Ctx(self.db)
+        entry = self.access_tokens.get(token)
+        if not entry or entry[1] < time.time():
+            raise PgError(401, "PGRST301", "JWT expired")
+        return Ctx(self.db, uid=entry[0])
+
+    def _session(self, user_id: str) -> dict:
+        access, refresh = secrets.token_urlsafe(24), secrets.token_urlsafe(24)
+        expires_at = int(time.time()) + SESSION_TTL
+        self.access_tokens[access] = (user_id, expires_at)
+        self.refresh_tokens[refresh] = user_id
+        profile = self.db.get("profiles", user_id)
+        return {
+            "access_token": access,
+            "token_type": "bearer",
+            "expires_in": SESSION_TTL,
+            "expires_at": expires_at,
+            "refresh_token": refresh,
+            "user": {"id": user_id, "email": profile["email"], "role": "authenticated"},
+        }
+
+    def auth(self, method: str, path: str, params: list, headers: dict, body):
+        if method != "POST":
+            raise PgError(405, "405", "method not allowed")
+        if path == "admin/generate_link":
+            if not self._context(headers).service:
+                raise PgError(403, "403", "User not allowed")
+            user = next((p for p in self.db.tables["profiles"].rows if p["email"] == body.get("email")), None)
+            if not user:
+                raise PgError(404, "user_not_found", "User not found")
+            hashed = secrets.token_hex(28)
+            self.link_tokens[hashed] = user["id"]
+            return 200, {"hashed_token": hashed, "email": user["email"], "verification_type": body.get("type")}
+        if path == "verify":
+            user_id = self.link_tokens.pop(body.get("token_hash"), None)
+            if not user_id:
+                raise PgError(403, "otp_expired", "Email link is invalid or has expired")
+            return 200, self._session(user_id)
+        if path == "token" and dict(params).get("grant_type") == "refresh_token":
+            user_id = self.refresh_tokens.pop(body.get("refresh_token"), None)
+            if not user_id:
+                raise PgError(400, "refresh_token_not_found", "Invalid Refresh Token")
+            return 200, self._session(user_id)
+        raise PgError(404, "404", f"no auth route {path}")
+
+    # rest
+
+    def _visible(self, ctx: Ctx, table: str, params: list, command: str = None) -> list:
+        rows = [r for r in self.db.table(table).rows if allowed(ctx, table, "SELECT", r)]
+        if command:
+            rows = [r for r in rows if allowed(ctx, table, command, r)]
+        for column, expr in _filters(params):
+            rows = [r for r in rows if _match(r, column, expr)]
+        return rows
+
+    def _select(self, ctx: Ctx, table: str, rows: list, select: str) -> list:
+        """Rows shaped by select=, embedded children read under their own SELECT policies."""
+        items = parse_select(select or "*")
+        if items is None:
+            raise PgError(400, "PGRST100", f'failed to parse select parameter ({select})')
+        return self._shape(ctx, table, rows, items)
+
+    def _shape(self, ctx: Ctx, table: str, rows: list, items: list) -> list:
+        embeds = {}  # child table -> {parent id: [shaped child rows]}
+        for name, children in items:
+            if children is None:
+                continue
+            column = EMBEDS.get((table, name))
+            if column is None:
+                raise PgError(400, "PGRST200",
+                              f"Could not find a relationship between '{table}' and '{name}' in the schema cache")
+            kids = self._visible(ctx, name, [])
+            by_parent = embeds[name] = {}
+            for kid, shaped in zip(kids, self._shape(ctx, name, kids, children)):
+                by_parent.setdefault(kid.get(column), []).append(shaped)
+        out = []
+        for row in rows:
+            shaped = {}
+            for name, children in items:
+                if children is not None:
+                    shaped[name] = embeds[name].get(row["id"], [])
+                elif name == "*":
+                    shaped.update(row)
+                else:
+                    shaped[name] = row.get(name)
+            out.append(shaped)
+        return out
+
+    def _violation(self, ctx: Ctx, table: str):
+        status = 401 if ctx.anon else 403
+        return PgError(status, "42501", f'new row violates row-level security policy for table "{table}"')
+
+    def rest(self, method: str, table: str, params: list, headers: dict, body):
+        ctx = self._context(headers)
+        prefer = headers.get("prefer", "")
+        representation = "return=representation" in prefer
+        query = dict(params)
+
+        if table.startswith("rpc/"):
+            fn = RPCS.get(table[4:])
+            if not fn:
+                raise PgError(404, "PGRST202", f"Could not find the function public.{table[4:]}")
+            return 200, fn(ctx, **(body or {}))
+
+        if method in ("GET", "HEAD"):
+            rows = self._visible(ctx, table, params)
+            if "order" in query:
+                rows = _order(rows, query["order"])
+            total = len(rows)
+            offset = int(query.get("offset", 0))
+            rows = rows[offset:]
+            if "limit" in query:
+                rows = rows[:int(query["limit"])]
+            first, last = _range(headers.get("range"))
+            if first is not None:
+                offset += first
+                rows = rows[first:] if last is None else rows[first:last + 1]
+            count = str(total) if "count=exact" in prefer else "*"
+            span = f"{offset}-{offset + len(rows) - 1}" if rows else "*"
+            partial = count != "*" and len(rows) < total
+            return (206 if partial else 200), self._select(ctx, table, rows, query.get("select", "*")), \
+                {"Content-Range": f"{span}/{count}"}
+
+        if method == "POST":
+            new_rows = body if isinstance(body, list) else [body]
+            for row in new_rows:
+                if not allowed(ctx, table, "INSERT", row):
+                    raise self._violation(ctx, table)
+            created = [self.db.insert(table, row) for row in new_rows]
+            return 201, (self._select(ctx, table, created, query.get("select", "*")) if representation else None)
+
+        if method == "PATCH":
+            rows = self._visible(ctx, table, params, "UPDATE")
+            for row in rows:
+                new = dict(row, **body)
+                before_update(ctx, table, row, new)
+                row.update(new)
+            return (200, [dict(r) for r in rows]) if representation else (204, None)
+
+        if method == "DELETE":
+            rows = self._visible(ctx, table, params, "DELETE")
+            self.db.table(table).remove(rows)
+            return (200, [dict(r) for r in rows]) if representation else (204, None)
+
+        raise PgError(405, "405", "method not allowed")
+
+    def handle(self, method: str, raw_path: str, headers: dict, body_bytes: bytes):
+        """-> (status, response headers, body bytes)"""
+        url = urlparse(raw_path)
+        params = [(unquote(k), unquote(v)) for k, v in parse_qsl(url.query, keep_blank_values=True)]
+        headers = {k.lower(): v for k, v in headers.items()}
+        extra = {}
+        try:
+            body = json.loads(body_bytes) if body_bytes else None
+            with self.db.lock:
+                if url.path.startswith("/rest/v1/"):
+                    result = self.rest(method, url.path[len("/rest/v1/"):], params, headers, body)
+                    status, payload, extra = result if len(result) == 3 else (*result, {})
+                elif url.path.startswith("/auth/v1/"):
+                    status, payload = self.auth(method, url.path[len("/auth/v1/"):], params, headers, body or {})
+                else:
+                    raise PgError(404, "404", "not found")
+        except PgError as e:
+            status, payload = e.status, {"code": e.code, "message": e.message, "details": None, "hint": None}
+        except (ValueError, TypeError, KeyError) as e:
+            status, payload = 400, {"code": "PGRST102", "message": str(e), "details": None, "hint": None}
+        data = b"" if payload is None else json.dumps(payload).encode()
+        return status, dict(extra, **{"Content-Type": "application/json; charset=utf-8"}), data
+
+    def wsgi_app(self, environ, start_response):
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = environ["wsgi.input"].read(length) if length else b""
+        headers = {k[5:].replace("_", "-"): v for k, v in environ.items() if k.startswith("HTTP_")}
+        path = environ.get("PATH_INFO", "/")
+        if environ.get("QUERY_STRING"):
+            path += "?" + environ["QUERY_STRING"]
+        status, resp_headers, data = self.handle(environ["REQUEST_METHOD"], path, headers, body)
+        start_response(f"{status} {'OK' if status < 400 else 'Error'}", list(resp_headers.items()))
+        return [b""] if environ["REQUEST_METHOD"] == "HEAD" else [data]
+
+
+# -- Seed data --
+
+def _uid(kind: str, n: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"rls-local/{kind}/{n}"))
+
+
+def seed_demo() -> Database:
+    """Small deterministic tenant: 3 groups, 5 users, a few rows per table."""
+    db = Database()
+    ins = db.insert
+
+    ins("quarters", {"id": "a0000000-0000-0000-0000-000000000001", "label": "Q4 2025",
+                     "start_date": "2025-10-01", "end_date": "2025-12-31", "is_current": False})
+    ins("quarters", {"id": "a0000000-0000-0000-0000-000000000002", "label": "Q1 2026",
+                     "start_date": "2026-01-01", "end_date": "2026-03-31", "is_current": True})
+    quarter = "a0000000-0000-0000-0000-000000000002"
+
+    groups = [("b0000000-0000-0000-0000-000000000001", "BDev"), (_uid("group", 2), "Delivery"),
+              (_uid("group", 3), "India Ops")]
+    for gid, name in groups:
+        ins("groups", {"id": gid, "name": name, "meeting_cadence": "weekly", "updated_at": _now()})
+
+    users = [
+        ("team_member", "member@local.test", "Terry Member", [(0, "member")]),
+        ("team_member", "member2@local.test", "Devi Member", [(1, "member"), (2, "admin")]),
+        ("group_admin", "lead@local.test", "Lee Lead", [(0, "admin")]),
+        ("executive", "exec@local.test", "Eve Exec", [(0, "member")]),
+        ("system_admin", "admin@local.test", "Sam Admin", [(0, "member")]),
+    ]
+    for n, (role, email, name, memberships) in enumerate(users):
+        uid = _uid("user", n)
+        ins("profiles", {"id": uid, "email": email, "full_name": name, "role": role,
+                         "is_active": True, "updated_at": _now()})
+        for g, role_in_group in memberships:
+            ins("group_members", {"group_id": groups[g][0], "user_id": uid,
+                                  "role_in_group": role_in_group, "updated_at": _now()})
+
+    owner = {0: _uid("user", 0), 1: _uid("user", 1), 2: _uid("user", 1)}
+    week = datetime.fromordinal(datetime.now(timezone.utc).toordinal()
+                                 - datetime.now(timezone.utc).weekday()).date().isoformat()
+    for g, (gid, name) in enumerate(groups):
+        uid = owner[g]
+        rock = ins("rocks", {"title": f"{name} rock", "owner_id": uid, "group_id": gid, "quarter_id": quarter,
+                             "status": "on_track", "completion": "in_progress", "updated_at": _now()})
+        ms = ins("milestones", {"rock_id": rock["id"], "title": "Kickoff", "status": "wip",
+                                "sort_order": 0, "updated_at": _now()})
+        ins("milestone_collaborators", {"milestone_id": ms["id"], "user_id": uid})
+        snap = ins("focus_snapshots", {"user_id": uid, "group_id": gid, "week_date": week, "is_current": True})
+        ins("focus_items", {"snapshot_id": snap["id"], "company_subject": f"{name} prospect",
+                            "sort_order": 0, "updated_at": _now()})
+        issue = ins("issues", {"group_id": gid, "raised_by": uid, "description": f"{name} issue",
+                               "status": "open", "updated_at": _now()})
+        ins("todos", {"group_id": gid, "description": f"{name} todo", "assigned_to_id": uid,
+                      "due_date": "2026-03-01", "status": "open", "source_issue_id": issue["id"],
+                      "updated_at": _now()})
+        mtg = ins("meetings", {"group_id": gid, "meeting_date": "2026-02-02", "updated_at": _now()})
+        ins("meeting_attendees", {"meeting_id": mtg["id"], "user_id": uid, "score": 8})
+        ins("rock_ideas", {"group_id": gid, "description": f"{name} idea", "priority_color": "green",
+                           "updated_at": _now()})
+
+        tpl = ins("scorecard_templates", {"group_id": gid, "name": f"{name} Scorecard", "is_active": True,
+                                          "updated_at": _now()})
+        sec = ins("scorecard_sections", {"template_id": tpl["id"], "name": "Team", "display_order": 0,
+                                         "section_type": "team_pipeline", "updated_at": _now()})
+        measure = ins("scorecard_measures", {"section_id": sec["id"], "name": "Contacts Created",
+                                             "display_order": 0, "data_type": "count", "is_calculated": False,
+                                             "updated_at": _now()})
+        goal = ins("scorecard_goals", {"measure_id": measure["id"], "quarter": "2026-Q1", "goal_value": 50,
+                                       "set_by": _uid("user", 4), "updated_at": _now()})
+        ins("goal_change_log", {"goal_id": goal["id"], "previous_value": 40, "new_value": 50,
+                                "changed_by": _uid("user", 4), "changed_at": _now()})
+        entry = ins("scorecard_entries", {"measure_id": measure["id"], "user_id": uid,
+                                          "week_ending": "2026-02-06", "value": 12, "updated_at": _now()})
+        ins("scorecard_entry_details", {"entry_id": entry["id"], "line_name": "Acme", "line_value": 12,
+                                        "display_order": 0, "updated_at": _now()})
+        campaign = ins("campaigns", {"group_id": gid, "name": f"{name} campaign", "status": "active"})
+        ins("campaign_weekly_data", {"campaign_id": campaign["id"], "week_ending": "2026-02-06",
+                                     "data": {"emails_sent": 100}, "entered_by": uid, "updated_at": _now()})
+        ins("campaign_metric_definitions", {"group_id": gid, "metric_key": "emails_sent", "label": "Emails Sent",
+                                            "data_type": "count", "is_required": False, "display_order": 0})
+        ins("scorecard_settings", {"group_id": gid, "setting_key": "week_ending_day",
+                                   "setting_value": "friday", "updated_at": _now()})
+    return db
+
+
+# -- Serving --
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True  # headers and body go out in separate writes
+    stack = None
+
+    def _dispatch(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, data = self.stack.handle(self.command, self.path, dict(self.headers), body)
+        self.send_response(status)
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_DELETE = do_HEAD = _dispatch
+
+    def log_message(self, *args):
+        pass
+
+
+def make_server(host: str = "127.0.0.1", port: int = 0, stack: LocalStack = None) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"stack": stack or LocalStack()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def serve_in_thread(host: str = "127.0.0.1", port: int = 0, stack: LocalStack = None) -> ThreadingHTTPServer:
+    server = make_server(host, port, stack)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def ensure_running(url: str) -> ThreadingHTTPServer | None:
+    """Start the stand-in at url unless something already listens there."""
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+    try:
+        with socket.create_connection((host, port), timeout=0.2):
+            return None
+    except OSError:
+        pass
+    missing, _ = check_policy_drift()
+    if missing:
+        print(f"  [WARN] local stand-in has no rule for SQL policies: {sorted(missing)}")
+    return serve_in_thread(host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local PostgREST/GoTrue stand-in for the RLS suite")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54329)
+    args = parser.parse_args()
+
+    missing, extra = check_policy_drift()
+    if missing:
+        print(f"[WARN] SQL policies without a local rule: {sorted(missing)}")
+    if extra:
+        print(f"[WARN] local rules without an SQL policy: {sorted(extra)}")
+    server = make_server(args.host, args.port)
+    print(f"Local Supabase stand-in on http://{args.host}:{args.port} "
+          f"(service key {LOCAL_SERVICE_ROLE_KEY!r}, anon key {LOCAL_ANON_KEY!r})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
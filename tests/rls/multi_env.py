@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Multi-Environment Runner
+========================
+Runs the RLS suite against several environments at once (staging,
+preview branches, local replicas) and prints one report per environment.
+
+    python multi_env.py environments.json
+    python multi_env.py environments.json --workers 6 --out release.json
+    python multi_env.py environments.json --only staging --only preview-123
+
+environments.json is a list of objects; every key but "name" is optional
+and a "$VAR" value is read from the environment, so keys stay out of the
+file:
+
+    [
+      {"name": "staging", "url": "https://abc.supabase.co",
+       "service_role_key": "$STAGING_SERVICE_ROLE_KEY", "anon_key": "$STAGING_ANON_KEY"},
+      {"name": "preview-123", "url": "https://def.supabase.co", "workers": 2, ...},
+      {"name": "local", "backend": "local"},
+      {"name": "replica", "backend": "postgres", "pg_dsn": "$REPLICA_DSN"}
+    ]
+
+Each environment gets its own worker processes. config.py is read once per
+process, so a worker serves exactly one environment and keeps its own
+connection pool, token cache (a file per worker under --token-cache-dir,
+in memory otherwise) and fixture discovery. The work is the runner's
+role x suite grid:
+
+1. every (role, read-only suite) pair is one shard. Shards are dealt to
+   the environment's workers by role (role i -> worker i mod n), so a
+   worker mostly reuses one session; a worker whose queue runs dry steals
+   from its peers' queues, so a slow role does not serialize its suites
+   behind one worker while the others sit idle;
+2. once all of an environment's read-only shards are in, its exclusive
+   suites (writes other roles can observe) run as one serial shard, as
+   with run_rls_tests.py --workers;
+3. each worker tears down the rows it created.
+
+Shards come back as buffered ResultShards and are merged per environment
+in (role, suite) order, so each report reads like a run_rls_tests.py run.
+Environments run side by side, so the whole release check takes about as
+long as the slowest environment's critical path, not the sum of all runs.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+
+from result_collector import AssertionRecord, ResultCollector, ResultShard
+
+ROLES = ("team_member", "executive", "system_admin")
+
+# environments.json key -> variable config.py reads
+ENV_VARS = {
+    "url": "RLS_SUPABASE_URL",
+    "service_role_key": "RLS_SERVICE_ROLE_KEY",
+    "anon_key": "RLS_ANON_KEY",
+    "backend": "RLS_BACKEND",
+    "local_url": "RLS_LOCAL_URL",
+    "pg_dsn": "RLS_PG_DSN",
+}
+
+STEAL_WAIT = 0.05   # seconds a worker waits on its own queue before trying its peers'
+
+
+def load_environments(path: str, only: list = None) -> list[dict]:
+    with open(path) as f:
+        envs = json.load(f)
+    for env in envs:
+        for key, value in env.items():
+            if isinstance(value, str) and value.startswith("$"):
+                if value[1:] not in os.environ:
+                    raise SystemExit(f"{env['name']}: {key} refers to unset ${value[1:]}")
+                env[key] = os.environ[value[1:]]
+    names = [e["name"] for e in envs]
+    if len(set(names)) != len(names):
+        raise SystemExit("environment names must be unique")
+    return [e for e in envs if not only or e["name"] in only]
+
+
+def worker_environ(env: dict, slot: int, token_cache_dir: str = None) -> dict:
+    """Variables a worker sets before importing the harness (and so config.py)."""
+    out = {var: str(env[key]) for key, var in ENV_VARS.items() if key in env}
+    if token_cache_dir:
+        out["RLS_TOKEN_CACHE"] = os.path.join(token_cache_dir, f"{env['name']}-{slot}.json")
+    return out
+
+
+# -- Worker process --
+
+def _next_task(own, peers: list) -> tuple:
+    """-> (task, stolen) from the worker's own queue, else a peer's; (None, False) when all are empty."""
+    try:
+        return own.get(timeout=STEAL_WAIT), False
+    except queue.Empty:
+        pass
+    for peer in peers:
+        try:
+            return peer.get_nowait(), True
+        except queue.Empty:
+            continue
+    return None, False
+
+
+def _shard_payload(shard: ResultShard, suite: str) -> dict:
+    return {"role": shard.role, "suite": suite, "lines": shard.lines,
+            "records": [r.as_dict() for r in shard.records]}
+
+
+def _shard_from(payload: dict) -> ResultShard:
+    shard = ResultShard(payload["role"])
+    shard.lines = payload["lines"]
+    shard.records = [AssertionRecord(**r) for r in payload["records"]]
+    return shard
+
+
+def worker(env: dict, slot: int, queues: list, results, options: dict):
+    """One environment's worker: run shards until it takes a "stop" task."""
+    os.environ.pop("RLS_TOKEN_CACHE", None)  # never share the parent's cache file between processes
+    os.environ.update(worker_environ(env, slot, options.get("token_cache_dir")))
+    sys.stdout = io.StringIO()  # discovery chatter; shard output is buffered per shard
+    name, own = env["name"], queues[slot]
+    peers = queues[slot + 1:] + queues[:slot]
+    try:
+        import run_rls_tests as runner
+        from supabase_client import SupabaseClient, get_user_token
+        runner.leak_check_mode = options.get("leak_check", "filter")
+        data = runner.discover_test_data(options.get("snapshot_rpc", False))
+        suites = {suite.__name__: suite for suite, _ in runner.SUITES}
+    except Exception:
+        results.put(("failed", name, slot, traceback.format_exc()))
+        return
+    clients = {}
+
+    def run(role: str, suite_name: str) -> dict | None:
+        user = data.first_user(role)
+        if user is None:
+            return None
+        try:
+            if role not in clients:
+                clients[role] = SupabaseClient(get_user_token(user.email)["access_token"])
+            shard = runner.run_shard(suites[suite_name], clients[role], role, user.id, data)
+        except Exception as e:
+            shard = ResultShard(role)
+            shard.fail(f"{suite_name} crashed", f"{type(e).__name__}: {e}")
+        return _shard_payload(shard, suite_name)
+
+    while True:
+        task, stolen = _next_task(own, peers)
+        if task is None:
+            continue
+        if task == "stop":
+            break
+        kind, pairs = task
+        start = time.perf_counter()
+        shards = [run(role, suite) for role, suite in pairs]
+        results.put(("done", name, slot, {"kind": kind, "pairs": pairs, "shards": shards, "stolen": stolen,
+                                          "seconds": time.perf_counter() - start}))
+    try:
+        removed = runner.fixtures.teardown()
+    except Exception as e:
+        removed = f"teardown failed: {e}"
+    results.put(("teardown", name, slot, removed))
+
+
+# -- Scheduler (parent process) --
+
+class Environment:
+    """Queues, worker processes and collected shards of one environment."""
+
+    def __init__(self, env: dict, workers: int, suites: list, ctx):
+        self.env = env
+        self.name = env["name"]
+        self.workers = workers
+        self.suites = [s.__name__ for s, _ in suites]
+        self.read_only = [(role, s.__name__) for role in ROLES for s, exclusive in suites if not exclusive]
+        self.exclusive = [(role, s.__name__) for role in ROLES for s, exclusive in suites if exclusive]
+        self.pending = len(self.read_only)
+        self.queues = [ctx.Queue() for _ in range(workers)]
+        self.processes = []
+        self.shards = {}            # (role, suite) -> payload; None when the role has no user
+        self.started = time.perf_counter()
+        self.finished = None
+        self.busy = 0.0             # summed shard seconds
+        self.slowest = 0.0
+        self.stolen = 0
+        self.exited = {}            # slot -> rows torn down (or why not), or the discovery traceback
+        self.error = None
+
+    def deal(self):
+        for role, suite in self.read_only:
+            self.queues[ROLES.index(role) % self.workers].put(("read-only", [(role, suite)]))
+        if not self.read_only:
+            self.after_read_only()
+
+    def after_read_only(self):
+        if self.exclusive:
+            self.queues[0].put(("exclusive", self.exclusive))
+        else:
+            self.stop()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+        for q in self.queues:
+            q.put("stop")
+
+    def record(self, payload: dict):
+        for pair, shard in zip(payload["pairs"], payload["shards"]):
+            self.shards[tuple(pair)] = shard
+        self.busy += payload["seconds"]
+        self.slowest = max(self.slowest, payload["seconds"])
+        self.stolen += payload["stolen"]
+        if payload["kind"] == "exclusive":
+            self.stop()
+        else:
+            self.pending -= 1
+            if self.pending == 0:
+                self.after_read_only()
+
+    def finish(self):
+        """Every worker has exited; flag work that never came back."""
+        if self.finished is None or self.pending:
+            failures = [v for v in self.exited.values() if isinstance(v, str) and "Traceback" in v]
+            self.error = (failures[0].strip().splitlines()[-1] if failures
+                          else "workers exited before finishing")
+            self.finished = self.finished or time.perf_counter()
+
+
+def run_environments(envs: list[dict], workers: int, options: dict) -> list[Environment]:
+    """Start every environment's workers and schedule shards until all have torn down."""
+    import run_rls_tests as runner  # suite list and order only; config.py is read per worker
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    running = {}
+    for cfg in envs:
+        if cfg.get("backend") == "local":
+            import local_stack  # the stand-in lives in this process so it outlives every worker
+            local_stack.ensure_running(cfg.get("local_url", "http://127.0.0.1:54329"))
+        env = Environment(cfg, int(cfg.get("workers", workers)), runner.SUITES, ctx)
+        env.deal()
+        env.processes = [ctx.Process(target=worker, args=(cfg, slot, env.queues, results, options),
+                                     name=f"{env.name}-{slot}", daemon=True)
+                         for slot in range(env.workers)]
+        for p in env.processes:
+            p.start()
+        running[env.name] = env
+
+    live = set(running)
+    while live:
+        try:
+            kind, name, slot, payload = results.get(timeout=1.0)
+        except queue.Empty:
+            kind = None
+        if kind == "done":
+            running[name].record(payload)
+        elif kind in ("teardown", "failed"):
+            # A worker that failed discovery leaves its queue to be stolen by its peers
+            running[name].exited[slot] = payload
+        for name in list(live):
+            env = running[name]
+            # Workers flush their messages before exiting, so dead + a quiet queue means nothing is left
+            if len(env.exited) == env.workers or (kind is None and not any(p.is_alive() for p in env.processes)):
+                env.finish()
+                live.discard(name)
+    for env in running.values():
+        for p in env.processes:
+            p.join(timeout=5)
+    return list(running.values())
+
+
+# -- Reports --
+
+def merge_environment(env: Environment) -> ResultCollector:
+    """Replay an environment's shards in (role, suite) order into one collector."""
+    collector = ResultCollector()
+    print(f"\n{'#'*50}\nEnvironment: {env.name} ({env.env.get('url') or env.env.get('backend', 'hosted')})")
+    if env.error:
+        print(f"  [ERROR] {env.error}")
+    for role in ROLES:
+        shards = [env.shards[(role, suite)] for suite in env.suites if (role, suite) in env.shards]
+        if not shards:
+            continue
+        if all(shard is None for shard in shards):
+            print(f"\n[SKIP] No user with role '{role}' in {env.name}.")
+            continue
+        print(f"\n{'='*50}\nTesting as: {role} [{env.name}]\n{'='*50}")
+        for shard in shards:
+            if shard is not None:
+                collector.merge(_shard_from(shard))
+    return collector
+
+
+def build_report(envs: list[Environment], collectors: dict, wall: float) -> dict:
+    rows = []
+    for env in envs:
+        c = collectors[env.name]
+        removed = [v for v in env.exited.values() if isinstance(v, int)]
+        rows.append({
+            "name": env.name,
+            "passed": c.passed,
+            "failed": c.failed,
+            "error": env.error,
+            "workers": env.workers,
+            "wall": (env.finished or env.started) - env.started,
+            "busy": env.busy,
+            "slowest_shard": env.slowest,
+            "stolen": env.stolen,
+            "torn_down": sum(removed),
+            "worker_failures": sum(1 for v in env.exited.values() if isinstance(v, str) and "Traceback" in v),
+            "failures": c.errors,
+            "latency_by_table": c.latency_by("table"),
+        })
+    return {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "wall": wall,
+                 "serial_estimate": sum(r["busy"] for r in rows)},
+        "environments": rows,
+    }
+
+
+def print_report(report: dict):
+    print(f"\n{'environment':<24}{'passed':>8}{'failed':>8}{'wall s':>9}{'busy s':>9}"
+          f"{'slowest':>9}{'stolen':>8}  status")
+    for r in report["environments"]:
+        status = r["error"] or ("ok" if not r["failed"] else "FAILED")
+        print(f"{r['name']:<24}{r['passed']:>8}{r['failed']:>8}{r['wall']:>9.1f}{r['busy']:>9.1f}"
+              f"{r['slowest_shard']:>9.1f}{r['stolen']:>8}  {status}")
+    meta = report["meta"]
+    print(f"\nWall {meta['wall']:.1f}s for {meta['serial_estimate']:.1f}s of shard work")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RLS suite across several environments")
+    parser.add_argument("environments", help="JSON list of environment configs")
+    parser.add_argument("--only", action="append", metavar="NAME", help="run only this environment; repeatable")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes per environment (default: 4)")
+    parser.add_argument("--leak-check", choices=["filter", "count", "stream"], default="filter")
+    parser.add_argument("--snapshot-rpc", action="store_true",
+                        help="discover fixtures with rls_fixture_snapshot() in every worker")
+    parser.add_argument("--token-cache-dir", help="keep each worker's sessions in <dir>/<env>-<slot>.json")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    envs = load_environments(args.environments, args.only)
+    if not envs:
+        raise SystemExit("no environments selected")
+    if args.token_cache_dir:
+        os.makedirs(args.token_cache_dir, exist_ok=True)
+    print(f"RLS Security Tests: {len(envs)} environments, up to {args.workers} workers each")
+
+    start = time.perf_counter()
+    ran = run_environments(envs, args.workers, {"leak_check": args.leak_check, "snapshot_rpc": args.snapshot_rpc,
+                                                "token_cache_dir": args.token_cache_dir})
+    wall = time.perf_counter() - start
+
+    collectors = {}
+    for env in ran:
+        collectors[env.name] = merge_environment(env)
+        collectors[env.name].summary()
+    report = build_report(ran, collectors, wall)
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    sys.exit(0 if all(not r["failed"] and not r["error"] for r in report["environments"]) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+Direct Postgres Backend
+=======================
+RLS_BACKEND=postgres answers the suite's PostgREST requests straight from
+Postgres (PG_DSN) instead of over HTTP, so a full run needs no logins, no
+PostgREST hop and no teardown.
+
+PgTransport stands in for HttpPool: SupabaseClient, RowStream and the
+admin helpers keep building the same URLs, and each request is compiled
+to SQL (pgrest_sql.py) and run on a pooled connection inside its own
+transaction:
+
+    BEGIN;
+    SELECT set_config('request.jwt.claims', <claims>, true), ...;
+    SET LOCAL ROLE authenticated;          -- or anon / service_role
+    <the SELECT / INSERT / UPDATE / DELETE / RPC>;
+    ROLLBACK;                              -- always
+
+The claims and role come from the request's bearer token, so auth.uid(),
+user_group_ids() and user_role() resolve exactly as they do behind
+PostgREST. session() mints an unsigned token for a profile instead of the
+magic-link login; the service-role key keeps meaning service_role.
+Database errors become the status codes PostgREST would return.
+Embedded resources resolve through the single-column foreign keys of the
+public schema, read from the catalog on first use.
+
+Nothing a request writes outlives it. Every suite check is a single
+request, so that is all the suite needs, and FixtureManager records
+nothing to clean up on this backend.
+
+    RLS_BACKEND=postgres python run_rls_tests.py --matrix
+
+Prerequisites:
+    pip install "psycopg[binary]"
+"""
+
+import base64
+import json
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+from config import PG_DSN, PG_POOL_SIZE
+from http_pool import AsyncResponse, PoolStats, get_pool
+from pgrest_sql import ident, read_sql, split_url, where_clause
+from tracing import jwt_claims, tracer
+
+ROLES = ("anon", "authenticated", "service_role")
+
+# SQLSTATE -> HTTP status, after PostgREST's error mapping
+ERROR_STATUS = {
+    "42501": 403,   # insufficient_privilege / RLS violation (401 for anon)
+    "P0001": 400,   # RAISE EXCEPTION
+    "23505": 409,
+    "23503": 409,
+    "23502": 400,
+    "23514": 400,
+    "22P02": 400,
+    "42703": 400,
+    "42P01": 404,
+    "42883": 404,
+    "25006": 405,
+}
+
+
+def _psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise ImportError('RLS_BACKEND=postgres needs psycopg: pip install "psycopg[binary]"') from e
+    return psycopg
+
+
+def _b64(data: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+
+
+def mint_token(claims: dict) -> str:
+    """Unsigned JWT carrying `claims`; only PgTransport reads it."""
+    return f"{_b64({'alg': 'none', 'typ': 'JWT'})}.{_b64(claims)}."
+
+
+class PgResponse(AsyncResponse):
+    """A request answered from Postgres, shaped like the Response the suite inspects."""
+
+
+class PgTransport:
+    """HttpPool stand-in that runs each request as SQL in a rolled-back transaction."""
+
+    def __init__(self, dsn: str = PG_DSN, pool_size: int = PG_POOL_SIZE, **_http_options):
+        self.psycopg = _psycopg()
+        self.dsn = dsn
+        self.pool_size = pool_size
+        self.stats = PoolStats()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._relations = None
+
+    def _acquire(self):
+        """An idle connection, a new one while below pool_size, or the next one returned."""
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                grow = self._created < self.pool_size
+                if grow:
+                    self._created += 1
+            if grow:
+                try:
+                    conn = self.psycopg.connect(self.dsn, autocommit=True)
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1  # give the slot back
+                    raise
+                self.stats.record_open()
+                return conn
+            try:
+                # Re-check now and then: a slot frees up without a put() when a
+                # closed connection is dropped or a connect() fails
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            if conn.closed:
+                with self._lock:
+                    self._created -= 1
+            else:
+                self._idle.put(conn)
+
+    @property
+    def relations(self) -> dict:
+        """(table, embedded table) -> [(embedded column, table column, to_many)], for pgrest_sql."""
+        if self._relations is None:
+            with self.connection() as conn:
+                self._relations = load_relations(conn)
+        return self._relations
+
+    def request(self, method: str, url: str, headers: dict = None, json: object = None, **_) -> PgResponse:
+        if not tracer.enabled:
+            return self._request(method, url, headers or {}, json)
+        event = tracer.start(method, url, headers, json)
+        try:
+            resp = self._request(method, url, headers or {}, json)
+        except Exception as e:
+            tracer.finish(event, error=e)
+            raise
+        tracer.finish(event, resp)
+        return resp
+
+    def _request(self, method: str, url: str, headers: dict, body) -> PgResponse:
+        self.stats.record_request()
+        start = time.perf_counter()
+        claims = jwt_claims(headers)
+        role = claims.get("role", "anon")
+        target, params = split_url(url)
+        try:
+            if role not in ROLES:
+                raise _Refused(401, "PGRST301", f"role {role!r} is not allowed")
+            if target is None:
+                raise _Refused(404, "PGRST000", "only /rest/v1 is served by the postgres backend")
+            statements, status = compile_request(method, target, params, headers, body, self.relations)
+            with self.connection() as conn, conn.transaction(force_rollback=True):
+                conn.execute("SELECT set_config('request.jwt.claims', %s, true), "
+                             "set_config('request.jwt.claim.sub', %s, true), "
+                             "set_config('request.method', %s, true)",
+                             (json_dumps(claims), claims.get("sub", ""), method))
+                conn.execute(f"SET LOCAL ROLE {ident(role)}")
+                results = [conn.execute(sql, args).fetchone() for sql, args in statements]
+        except _Refused as e:
+            return self._error(url, start, e.status, e.code, e.message)
+        except self.psycopg.Error as e:
+            status = ERROR_STATUS.get(e.sqlstate, 400 if (e.sqlstate or "")[:2] in ("22", "23") else 500)
+            if status == 403 and role == "anon":
+                status = 401
+            diag = e.diag
+            return self._error(url, start, status, e.sqlstate, diag.message_primary or str(e),
+                               diag.message_detail, diag.message_hint)
+        return self._answer(method, url, start, status, headers, results)
+
+    def _answer(self, method: str, url: str, start: float, status: int, headers: dict, results: list) -> PgResponse:
+        text = results[0][0] if results and results[0] else ""
+        out_headers = {"Content-Type": "application/json; charset=utf-8"}
+        if len(results) > 1:  # read with a count
+            total = results[1][0]
+            shown = len(json.loads(text)) if text else 0
+            offset = _range(headers)[0] or 0
+            out_headers["Content-Range"] = f"{offset}-{offset + shown - 1}/{total}" if shown else f"*/{total}"
+        if method == "HEAD":
+            text = ""
+        elif method != "GET" and "return=representation" not in headers.get("Prefer", ""):
+            text, status = "", 204 if status == 200 else status
+        return PgResponse(status, out_headers, text, url, timedelta(seconds=time.perf_counter() - start))
+
+    def _error(self, url: str, start: float, status: int, code: str, message: str,
+               details: str = None, hint: str = None) -> PgResponse:
+        body = json_dumps({"code": code, "message": message, "details": details, "hint": hint})
+        return PgResponse(status, {"Content-Type": "application/json; charset=utf-8"}, body, url,
+                          timedelta(seconds=time.perf_counter() - start))
+
+    def get(self, url: str, **kwargs) -> PgResponse:
+        return self.request("GET", url, **kwargs)
+
+    def head(self, url: str, **kwargs) -> PgResponse:
+        return self.request("HEAD", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> PgResponse:
+        return self.request("POST", url, **kwargs)
+
+    def patch(self, url: str, **kwargs) -> PgResponse:
+        return self.request("PATCH", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> PgResponse:
+        return self.request("DELETE", url, **kwargs)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class _Refused(Exception):
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+
+def json_dumps(value) -> str:
+    return json.dumps(value, default=str)
+
+
+def _range(headers: dict) -> tuple:
+    """'Range: 0-999' (Range-Unit: items) -> (0, 999); open end -> (n, None)."""
+    value = headers.get("Range")
+    if not value:
+        return None, None
+    first, _, last = value.partition("-")
+    return int(first), (int(last) if last else None)
+
+
+def _as_json(sql: str) -> str:
+    """Wrap a row-returning statement so it yields PostgREST's JSON array as text."""
+    return f"WITH _r AS ({sql}) SELECT coalesce(json_agg(_r), '[]')::text FROM _r"
+
+
+FOREIGN_KEYS_SQL = """
+SELECT t.relname, a.attname, r.relname, ra.attname
+FROM pg_constraint c
+JOIN pg_class t ON t.oid = c.conrelid
+JOIN pg_class r ON r.oid = c.confrelid
+JOIN pg_attribute a ON a.attrelid = c.conrelid AND a.attnum = c.conkey[1]
+JOIN pg_attribute ra ON ra.attrelid = c.confrelid AND ra.attnum = c.confkey[1]
+WHERE c.contype = 'f' AND cardinality(c.conkey) = 1
+  AND t.relnamespace = 'public'::regnamespace AND r.relnamespace = 'public'::regnamespace
+"""
+
+
+def load_relations(conn) -> dict:
+    """Both directions of every single-column foreign key in public."""
+    relations = {}
+    for table, column, referenced, referenced_column in conn.execute(FOREIGN_KEYS_SQL):
+        relations.setdefault((referenced, table), []).append((column, referenced_column, True))
+        relations.setdefault((table, referenced), []).append((referenced_column, column, False))
+    return relations
+
+
+def compile_request(method: str, target: str, params: list, headers: dict, body,
+                    relations: dict = None) -> tuple[list, int]:
+    """-> ([(sql, args)], success status). Raises _Refused for what pgrest_sql cannot express."""
+    if target.startswith("rpc/"):
+        if method != "POST":
+            raise _Refused(405, "PGRST101", "only POST is supported for RPC on the postgres backend")
+        args = body or {}
+        named = ", ".join(f"{ident(k)} => %s" for k in args)
+        values = [json_dumps(v) if isinstance(v, (dict, list)) else v for v in args.values()]
+        return [(f"SELECT to_json(public.{ident(target[4:])}({named}))::text", values)], 200
+
+    table = ident(target)
+    if method in ("GET", "HEAD"):
+        sql = read_sql(target, params, _range(headers), relations=relations)
+        if sql is None:
+            raise _Refused(400, "PGRST100", "query not supported by the postgres backend")
+        statements = [(_as_json(sql), None)]
+        if method == "HEAD" or "count=exact" in headers.get("Prefer", ""):
+            every = read_sql(target, params, paged=False, relations=relations)
+            statements.append((f"SELECT count(*) FROM ({every}) _c", None))
+        return statements, 200
+
+    where = where_clause(params, f"public.{table}")
+    if where is None:
+        raise _Refused(400, "PGRST100", "filter not supported by the postgres backend")
+    where = where.replace("%", "%%")  # the statements below also take parameters
+    if method == "POST":
+        rows = body if isinstance(body, list) else [body or {}]
+        columns = list(dict.fromkeys(k for row in rows for k in row))
+        cols = ", ".join(map(ident, columns))
+        sql = (f"INSERT INTO public.{table} ({cols}) "
+               f"SELECT {cols} FROM json_populate_recordset(NULL::public.{table}, %s::json) RETURNING *")
+        return [(_as_json(sql), [json_dumps(rows)])], 201
+    if method == "PATCH":
+        sets = ", ".join(f"{ident(c)} = _p.{ident(c)}" for c in (body or {}))
+        sql = (f"UPDATE public.{table} SET {sets} "
+               f"FROM json_populate_record(NULL::public.{table}, %s::json) _p{where} RETURNING public.{table}.*")
+        return [(_as_json(sql), [json_dumps(body or {})])], 200
+    if method == "DELETE":
+        return [(_as_json(f"DELETE FROM public.{table}{where} RETURNING *"), None)], 200
+    raise _Refused(405, "PGRST101", f"{method} is not supported by the postgres backend")
+
+
+def session(email: str, transport: PgTransport = None) -> dict:
+    """get_user_token() for this backend: a minted token for the profile with `email`."""
+    with (transport or get_pool()).connection() as conn:
+        row = conn.execute("SELECT id FROM public.profiles WHERE email = %s", (email,)).fetchone()
+    if row is None:
+        raise LookupError(f"no profile with email {email}")
+    user_id = str(row[0])
+    claims = {"sub": user_id, "email": email, "role": "authenticated", "aud": "authenticated",
+              "exp": int(time.time()) + 3600}
+    return {"access_token": mint_token(claims), "refresh_token": None, "expires_at": claims["exp"],
+            "user": {"id": user_id, "email": email}}
@@ -0,0 +1,166 @@
+"""
+PostgREST to SQL
+================
+Translates the PostgREST requests this suite makes into SQL, for
+pg_backend.py (which answers them straight from Postgres) and tracing.py
+(which EXPLAINs the slowest ones).
+
+Covered: plain column lists in `select`, the filters eq/neq/gt/gte/lt/lte/
+like/ilike/in/is (each optionally negated with not.), order, limit, offset
+and the Range header. Embedded resources (`rocks?select=id,milestones(id)`)
+are covered when the caller passes `relations`, the single-column foreign
+keys between the tables (pg_backend.py reads them from the catalog).
+Anything else (aliases, hints, casts, or/and groups, filters on embedded
+tables) yields None so callers can refuse it rather than guess. Filter
+values are inlined as quoted literals; Postgres casts them to the column
+type as it does for PostgREST's own query.
+"""
+
+from urllib.parse import parse_qsl, urlparse
+
+FILTER_OPS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<=",
+              "like": "LIKE", "ilike": "ILIKE"}
+RESERVED_PARAMS = {"select", "limit", "offset", "order", "columns", "on_conflict"}
+
+
+def ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def split_url(url: str) -> tuple[str | None, list]:
+    """-> ('rocks' | 'rpc/start_new_week' | None, [(param, value)])."""
+    parsed = urlparse(url)
+    if "/rest/v1/" not in parsed.path:
+        return None, []
+    return parsed.path.split("/rest/v1/", 1)[1] or None, parse_qsl(parsed.query, keep_blank_values=True)
+
+
+def condition(column: str, expr: str, qualifier: str = None) -> str | None:
+    """SQL for one PostgREST filter ('group_id', 'not.in.(a,b)'); None if unsupported."""
+    negate = expr.startswith("not.")
+    op, _, value = expr.removeprefix("not.").partition(".")
+    col = f"{qualifier}.{ident(column)}" if qualifier else ident(column)
+    if op in FILTER_OPS:
+        if op in ("like", "ilike"):
+            value = value.replace("*", "%")
+        cond = f"{col} {FILTER_OPS[op]} {literal(value)}"
+    elif op == "in" and value.startswith("(") and value.endswith(")"):
+        items = [v.strip().strip('"') for v in value[1:-1].split(",") if v.strip()]
+        cond = f"{col} IN ({', '.join(map(literal, items))})" if items else "false"
+    elif op == "is" and value.lower() in ("null", "true", "false"):
+        cond = f"{col} IS {value.upper()}"
+    else:
+        return None
+    return f"NOT ({cond})" if negate else cond
+
+
+def where_clause(params: list, qualifier: str = None) -> str | None:
+    """' WHERE a AND b' for the filter params ('' when there are none); None if any is unsupported."""
+    conds = []
+    for key, value in params:
+        if key in RESERVED_PARAMS:
+            continue
+        cond = condition(key, value, qualifier)
+        if cond is None:
+            return None
+        conds.append(cond)
+    return " WHERE " + " AND ".join(conds) if conds else ""
+
+
+def parse_select(select: str) -> list | None:
+    """'id,milestones(id,rock_id)' -> [('id', None), ('milestones', [('id', None), ('rock_id', None)])]."""
+    stack, name = [[]], ""
+    for ch in select + ",":
+        if ch == "(":
+            stack.append([])
+            stack[-2].append((name.strip(), stack[-1]))
+            name = ""
+        elif ch in ",)":
+            if name.strip():
+                stack[-1].append((name.strip(), None))
+            name = ""
+            if ch == ")":
+                if len(stack) == 1:
+                    return None
+                stack.pop()
+        else:
+            name += ch
+    return stack[0] if len(stack) == 1 else None
+
+
+def columns_clause(select: str, table: str = None, relations: dict = None) -> str | None:
+    items = parse_select(select or "*")
+    return _columns(items, table, relations or {}, 0) if items else None
+
+
+def _columns(items: list, table: str, relations: dict, depth: int) -> str | None:
+    alias, out = f"_t{depth}", []
+    for name, children in items:
+        if any(c in name for c in ":!") or "->" in name:
+            return None
+        if children is None:
+            out.append(f"{alias}.*" if name == "*" else f"{alias}.{ident(name)}")
+            continue
+        links = relations.get((table, name), [])
+        if len(links) != 1:  # unknown or ambiguous relationship
+            return None
+        column, parent_column, many = links[0]
+        inner = _columns(children or [("*", None)], name, relations, depth + 1)
+        if inner is None:
+            return None
+        child, row = f"_t{depth + 1}", f"_e{depth + 1}"
+        rows = (f"SELECT {inner} FROM public.{ident(name)} {child} "
+                f"WHERE {child}.{ident(column)} = {alias}.{ident(parent_column)}")
+        agg = f"coalesce(json_agg({row}), '[]')" if many else f"row_to_json({row})"
+        out.append(f"(SELECT {agg} FROM ({rows}) {row}) AS {ident(name)}")
+    return ", ".join(out)
+
+
+def order_clause(order: str) -> str:
+    terms = []
+    for term in order.split(","):
+        column, *mods = term.split(".")
+        terms.append(" ".join([ident(column)] + [m.upper().replace("NULLS", "NULLS ") for m in mods]))
+    return " ORDER BY " + ", ".join(terms)
+
+
+def read_sql(table: str, params: list, row_range: tuple = (None, None), paged: bool = True,
+             relations: dict = None) -> str | None:
+    """SELECT for a GET on `table`; paged=False drops limit/offset/Range (for counting)."""
+    query = dict(params)
+    columns = columns_clause(query.get("select", "*"), table, relations)
+    where = where_clause(params)
+    if columns is None or where is None:
+        return None
+    sql = f"SELECT {columns} FROM public.{ident(table)} _t0{where}"
+    if "order" in query:
+        sql += order_clause(query["order"])
+    if not paged:
+        return sql
+    first, last = row_range
+    limit = int(query["limit"]) if query.get("limit", "").isdigit() else None
+    offset = int(query["offset"]) if query.get("offset", "").isdigit() else 0
+    if first is not None:
+        offset += first
+        if last is not None:
+            limit = min(limit, last - first + 1) if limit is not None else last - first + 1
+    if limit is not None:
+        sql += f" LIMIT {limit}"
+    if offset:
+        sql += f" OFFSET {offset}"
+    return sql
+
+
+def postgrest_to_sql(method: str, url: str) -> str | None:
+    """SELECT equivalent to a GET/HEAD table read (HEAD -> count(*)); None for anything else."""
+    table, params = split_url(url)
+    if not table or table.startswith("rpc/") or method not in ("GET", "HEAD"):
+        return None
+    sql = read_sql(table, params)
+    if sql is not None and method == "HEAD":
+        sql = f"SELECT count(*) FROM ({sql}) t"
+    return sql
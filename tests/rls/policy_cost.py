@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Policy Cost
+===========
+EXPLAIN (ANALYZE, BUFFERS) of every SELECT policy, read as a user in many
+groups of the synthetic tenant (tenant_gen.py), before and after
+scripts/rls-initplan-helpers.sql.
+
+Everything runs in one transaction on PG_DSN that is rolled back. Each
+table is first read with the policies as they are in the database
+("before"); then the script is applied inside the transaction and the
+same reads are repeated ("after"). The database is left untouched, so run
+this before the script is applied in the SQL editor; once it is, both
+sides measure the same policies.
+
+Per policy and user:
+
+    ms            median execution time over --repeat reads (after one warm-up)
+    buffers       shared buffers hit + read by one read
+    helper calls  RLS helper function calls per read, from
+                  pg_stat_xact_user_functions; needs track_functions = all,
+                  which only a superuser may set ("-" otherwise)
+    rows          rows the user sees; must be the same before and after
+
+    python tenant_gen.py --scale 100 --memberships-per-user 25
+    python policy_cost.py                                    # busiest generated member
+    python policy_cost.py --table scorecard_entries --repeat 9 --out cost.json
+    python policy_cost.py --email demo.member@example.com --users 0
+
+Prerequisites:
+    pip install "psycopg[binary]"
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+from config import PG_DSN
+from impact import REPO_ROOT
+from pgrest_sql import ident
+from tenant_gen import GEN_EMAIL_DOMAIN
+from tracing import dominant_node
+
+SCRIPT = os.path.join(REPO_ROOT, "scripts", "rls-initplan-helpers.sql")
+
+# Functions counted in pg_stat_xact_user_functions: the helpers the policies
+# call today and the ones scripts/rls-initplan-helpers.sql adds
+HELPERS = (
+    "user_group_ids", "user_role", "is_admin_or_sysadmin", "is_group_lead_or_exec",
+    "scorecard_template_group", "scorecard_section_group", "scorecard_measure_group",
+    "scorecard_entry_owner", "user_lead_group_ids", "user_scorecard_templates",
+    "user_scorecard_sections", "user_scorecard_measures", "user_lead_scorecard_measures",
+)
+
+_SELECT_POLICY = re.compile(r'CREATE\s+POLICY\s+"([^"]+)"\s+ON\s+(?:public\.)?(\w+)\s+FOR\s+SELECT', re.IGNORECASE)
+_TRANSACTION = re.compile(r"^\s*(?:BEGIN|COMMIT)\s*;\s*$", re.IGNORECASE | re.MULTILINE)
+
+BUSIEST_SQL = """
+SELECT p.id, p.email, count(*)
+FROM public.profiles p
+JOIN public.group_members gm ON gm.user_id = p.id
+WHERE p.email LIKE %s AND p.role NOT IN ('executive', 'system_admin')
+GROUP BY p.id, p.email
+ORDER BY count(*) DESC, p.email
+LIMIT %s
+"""
+
+USER_SQL = """
+SELECT p.id, p.email, (SELECT count(*) FROM public.group_members gm WHERE gm.user_id = p.id)
+FROM public.profiles p
+WHERE p.email = %s
+"""
+
+
+def _psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise ImportError('policy_cost.py needs psycopg: pip install "psycopg[binary]"') from e
+    return psycopg
+
+
+def select_policies(sql: str) -> list[tuple[str, str]]:
+    """[(policy, table)] of the SELECT policies a script creates, in order."""
+    return _SELECT_POLICY.findall(sql)
+
+
+def script_body(sql: str) -> str:
+    """The script without its BEGIN; / COMMIT;, to run inside the caller's transaction."""
+    return _TRANSACTION.sub("", sql)
+
+
+def track_functions(conn) -> bool:
+    """Turn on function call counting for the transaction; False when not allowed."""
+    if conn.execute("SHOW track_functions").fetchone()[0] == "all":
+        return True
+    try:
+        with conn.transaction():
+            conn.execute("SET LOCAL track_functions = 'all'")
+    except _psycopg().Error:
+        return False
+    return True
+
+
+def helper_calls(conn) -> dict:
+    """{helper: calls so far in this transaction}."""
+    rows = conn.execute(
+        "SELECT funcname, sum(calls) FROM pg_stat_xact_user_functions "
+        "WHERE schemaname = 'public' AND funcname = ANY(%s) GROUP BY funcname",
+        (list(HELPERS),)).fetchall()
+    return {name: int(calls) for name, calls in rows}
+
+
+def pick_users(conn, emails: list, busiest: int) -> list[dict]:
+    """The users given by email, then the `busiest` generated members with the most groups."""
+    users = []
+    for email in emails or []:
+        row = conn.execute(USER_SQL, (email,)).fetchone()
+        if row is None:
+            raise LookupError(f"no profile with email {email}")
+        users.append(row)
+    if busiest:
+        users += conn.execute(BUSIEST_SQL, (f"%@{GEN_EMAIL_DOMAIN}", busiest)).fetchall()
+    return [{"id": str(uid), "email": email, "groups": groups} for uid, email, groups in users]
+
+
+def _node(plan: dict) -> str:
+    node = dominant_node(plan)
+    return f"{node['Node Type']}{' on ' + node['Relation Name'] if node.get('Relation Name') else ''}"
+
+
+def measure(conn, table: str, user: dict, repeat: int, tracking: bool) -> dict:
+    """Warm-up plus `repeat` EXPLAIN (ANALYZE, BUFFERS) reads of `table` as `user`."""
+    psycopg = _psycopg()
+    claims = {"sub": user["id"], "email": user["email"], "role": "authenticated", "aud": "authenticated"}
+    query = f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT * FROM public.{ident(table)}"
+    try:
+        with conn.transaction():  # savepoint: a failing read does not end the run
+            conn.execute("SELECT set_config('request.jwt.claims', %s, true), "
+                         "set_config('request.jwt.claim.sub', %s, true)",
+                         (json.dumps(claims), user["id"]))
+            conn.execute("SET LOCAL ROLE authenticated")
+            conn.execute(query)
+            start = helper_calls(conn) if tracking else None
+            plans = [conn.execute(query).fetchone()[0][0] for _ in range(repeat)]
+            end = helper_calls(conn) if tracking else None
+            conn.execute("RESET ROLE")
+    except psycopg.Error as e:
+        return {"error": f"{e.sqlstate}: {e.diag.message_primary or e}"}
+    calls = None
+    if tracking:
+        calls = {name: (n - start.get(name, 0)) // repeat for name, n in end.items() if n > start.get(name, 0)}
+    plan = plans[-1]
+    return {
+        "ms": round(statistics.median(p["Execution Time"] for p in plans), 3),
+        "planning_ms": round(statistics.median(p["Planning Time"] for p in plans), 3),
+        "rows": plan["Plan"]["Actual Rows"],
+        "buffers": plan["Plan"].get("Shared Hit Blocks", 0) + plan["Plan"].get("Shared Read Blocks", 0),
+        "helper_calls": calls,
+        "node": _node(plan["Plan"]),
+    }
+
+
+def compare(before: dict, after: dict) -> dict:
+    """Speedup and row check of one policy; None where either side failed."""
+    if "error" in before or "error" in after:
+        return {"speedup": None, "same_rows": None}
+    return {"speedup": round(before["ms"] / after["ms"], 2) if after["ms"] else None,
+            "same_rows": before["rows"] == after["rows"]}
+
+
+def run_policy_cost(dsn: str = PG_DSN, emails: list = None, busiest: int = 1, tables: list = None,
+                    repeat: int = 5, script: str = SCRIPT, progress: bool = True) -> dict:
+    """Measure every SELECT policy before and after `script`, rolled back; -> JSON-ready report."""
+    psycopg = _psycopg()
+    with open(script) as f:
+        sql = f.read()
+    policies = [(p, t) for p, t in select_policies(sql) if not tables or t in tables]
+
+    results = {}  # (policy, email) -> row
+    with psycopg.connect(dsn, autocommit=True) as conn, conn.transaction(force_rollback=True):
+        missing = [t for t in {t for _, t in select_policies(sql)}
+                   if conn.execute("SELECT to_regclass(%s)", (f"public.{t}",)).fetchone()[0] is None]
+        if missing:
+            raise RuntimeError(f"{os.path.basename(script)} needs tables missing from the database: "
+                               f"{', '.join(sorted(missing))} (scripts/scorecard-schema.sql?)")
+        users = pick_users(conn, emails, busiest)
+        if not users:
+            raise LookupError(f"no generated members (@{GEN_EMAIL_DOMAIN}); run tenant_gen.py or pass --email")
+        tracking = track_functions(conn)
+        for phase in ("before", "after"):
+            if phase == "after":
+                conn.execute(script_body(sql))
+            for user in users:
+                for policy, table in policies:
+                    row = results.setdefault((policy, user["email"]),
+                                             {"policy": policy, "table": table, "user": user["email"]})
+                    row[phase] = measure(conn, table, user, repeat, tracking)
+                    if progress:
+                        m = row[phase]
+                        print(f"  {phase:<7}{table:<30}{user['email']:<34}"
+                              f"{m['error'] if 'error' in m else format(m['ms'], '>9.2f') + ' ms'}")
+    for row in results.values():
+        row.update(compare(row["before"], row["after"]))
+
+    return {
+        "meta": {
+            "dsn": dsn.rsplit("@", 1)[-1],  # host/port/db, no credentials
+            "script": os.path.relpath(script, REPO_ROOT),
+            "repeat": repeat,
+            "track_functions": tracking,
+            "users": [{"email": u["email"], "groups": u["groups"]} for u in users],
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": list(results.values()),
+    }
+
+
+def _calls(m: dict) -> str:
+    if "error" in m or m["helper_calls"] is None:
+        return "-"
+    return str(sum(m["helper_calls"].values()))
+
+
+def _ms(m: dict) -> str:
+    return "error" if "error" in m else f"{m['ms']:.2f}"
+
+
+def print_report(report: dict):
+    meta = report["meta"]
+    users = ", ".join(f"{u['email']} ({u['groups']} groups)" for u in meta["users"])
+    print(f"\nPolicy cost before/after {meta['script']}, median of {meta['repeat']} reads as {users}")
+    print(f"{'policy':<34}{'user':<30}{'before ms':>11}{'after ms':>10}{'speedup':>9}"
+          f"{'helper calls':>16}{'buffers':>18}{'rows':>8}")
+    rows = sorted(report["results"], key=lambda r: -r["before"].get("ms", -1.0))
+    for r in rows:
+        before, after = r["before"], r["after"]
+        buffers = "-" if "error" in before or "error" in after else f"{before['buffers']} -> {after['buffers']}"
+        speedup = f"{r['speedup']:.1f}x" if r["speedup"] else "-"
+        print(f"{r['policy']:<34}{r['user'][:29]:<30}{_ms(before):>11}{_ms(after):>10}{speedup:>9}"
+              f"{_calls(before) + ' -> ' + _calls(after):>16}{buffers:>18}{before.get('rows', '-'):>8}")
+
+    ok = [r for r in rows if r["speedup"] is not None]
+    if ok:
+        total_before = sum(r["before"]["ms"] for r in ok)
+        total_after = sum(r["after"]["ms"] for r in ok)
+        print(f"\nAll reads: {total_before:.1f} ms -> {total_after:.1f} ms"
+              f"{f' ({total_before / total_after:.1f}x)' if total_after else ''}")
+    if not meta["track_functions"]:
+        print("Helper calls not counted: track_functions needs a superuser connection")
+    for r in rows:
+        for phase in ("before", "after"):
+            if "error" in r[phase]:
+                print(f"  {r['policy']} ({phase}): {r[phase]['error']}")
+        if r["same_rows"] is False:
+            print(f"  {r['policy']}: {r['before']['rows']} rows before, {r['after']['rows']} after "
+                  f"for {r['user']}: the rewrite changed what the policy allows")
+
+
+def write_report(report: dict, path: str = None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE every SELECT policy before and after "
+                                                 "scripts/rls-initplan-helpers.sql")
+    parser.add_argument("--dsn", default=PG_DSN, help="Postgres DSN (default: RLS_PG_DSN or local supabase)")
+    parser.add_argument("--email", action="append", help="read as this profile; repeatable")
+    parser.add_argument("--users", type=int, default=1,
+                        help="also read as the N generated members with the most groups (default: 1)")
+    parser.add_argument("--table", action="append", help="only this table's SELECT policy; repeatable")
+    parser.add_argument("--repeat", type=int, default=5, help="measured reads per policy, user and side")
+    parser.add_argument("--script", default=SCRIPT, help="policy rewrite applied for the 'after' side")
+    parser.add_argument("--out", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run_policy_cost(args.dsn, args.email, args.users, args.table, max(1, args.repeat), args.script)
+    print_report(report)
+    if args.out:
+        write_report(report, args.out)
+    sys.exit(1 if any(r["same_rows"] is False for r in report["results"]) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+"""
+RLS Policy Matrix
+=================
+Declarative table x role x operation -> expected outcome, compiled into
+one deduplicated request plan and executed concurrently.
+
+    python run_rls_tests.py --matrix
+
+Outcomes:
+    SELECT  ALL   the role sees every row (its count equals the service-role count)
+            OWN   no visible row falls outside the role's groups
+    INSERT  ALLOW a row for a group the user is NOT in is accepted (201)
+            DENY  that insert is rejected (401/403)
+
+Group scoping follows SCOPE: a table either carries the group column itself
+or points at a parent (milestones.rock_id -> rocks -> group_id). For
+child tables the ids allowed for a group set are resolved once with the
+service role and shared by every cell and role that needs them; the
+isolation check is then a server-side `<column>=not.in.(allowed)&limit=1`
+(or a client-side scan when the allowed set is too large for a URL).
+
+Running the plan:
+    1. resolve fixtures: service-role counts and allowed-id sets, deduplicated
+    2. send every distinct read concurrently, then every insert
+    3. evaluate cells in MATRIX order; rows ALLOW cells created are
+       tagged and removed in bulk by the FixtureManager
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
+from fixtures import Fixtures
+from http_pool import get_pool
+from result_collector import ResultCollector
+from fixture_manager import FixtureManager
+from supabase_client import admin_stream, content_range_total
+
+ALL, OWN = "all", "own"
+ALLOW, DENY = "allow", "deny"
+
+# Allowed values beyond this are checked client-side instead of in a not.in filter
+MAX_FILTER_VALUES = 200
+
+# table -> (column holding the scope, parent table the column points at or None)
+SCOPE = {
+    "groups": ("id", None),
+    "group_members": ("group_id", None),
+    "rocks": ("group_id", None),
+    "milestones": ("rock_id", "rocks"),
+    "milestone_collaborators": ("milestone_id", "milestones"),
+    "focus_snapshots": ("group_id", None),
+    "focus_items": ("snapshot_id", "focus_snapshots"),
+    "issues": ("group_id", None),
+    "todos": ("group_id", None),
+    "meetings": ("group_id", None),
+    "meeting_attendees": ("meeting_id", "meetings"),
+    "rock_ideas": ("group_id", None),
+    "scorecard_templates": ("group_id", None),
+    "scorecard_sections": ("template_id", "scorecard_templates"),
+    "scorecard_measures": ("section_id", "scorecard_sections"),
+    "scorecard_goals": ("measure_id", "scorecard_measures"),
+    "goal_change_log": ("goal_id", "scorecard_goals"),
+    "scorecard_entries": ("measure_id", "scorecard_measures"),
+    "scorecard_entry_details": ("entry_id", "scorecard_entries"),
+    "campaigns": ("group_id", None),
+    "campaign_weekly_data": ("campaign_id", "campaigns"),
+    "campaign_metric_definitions": ("group_id", None),
+    "scorecard_settings": ("group_id", None),
+}
+
+EVERYONE = {"team_member": ALL, "executive": ALL, "system_admin": ALL}
+# 00002_rls_policies.sql: executives and admins read every group
+CORE = {"team_member": OWN, "executive": ALL, "system_admin": ALL}
+# scorecard-rls.sql: only system_admin reads across groups
+SCORECARD = {"team_member": OWN, "executive": OWN, "system_admin": ALL}
+ADMIN_ONLY = {"team_member": DENY, "executive": DENY, "system_admin": ALLOW}
+MEMBERS_ONLY = {"team_member": DENY, "executive": DENY, "system_admin": DENY}
+
+MATRIX = [
+    ("profiles", "SELECT", EVERYONE),
+    ("quarters", "SELECT", EVERYONE),
+    ("groups", "SELECT", CORE),
+    ("group_members", "SELECT", CORE),
+    ("rocks", "SELECT", CORE),
+    ("milestones", "SELECT", CORE),
+    ("milestone_collaborators", "SELECT", CORE),
+    ("focus_snapshots", "SELECT", CORE),
+    ("focus_items", "SELECT", CORE),
+    ("issues", "SELECT", CORE),
+    ("todos", "SELECT", CORE),
+    ("meetings", "SELECT", CORE),
+    ("meeting_attendees", "SELECT", CORE),
+    ("rock_ideas", "SELECT", CORE),
+    ("scorecard_templates", "SELECT", SCORECARD),
+    ("scorecard_sections", "SELECT", SCORECARD),
+    ("scorecard_measures", "SELECT", SCORECARD),
+    ("scorecard_goals", "SELECT", SCORECARD),
+    ("goal_change_log", "SELECT", {"team_member": OWN, "executive": OWN, "system_admin": ALL}),
+    ("scorecard_entries", "SELECT", SCORECARD),
+    ("scorecard_entry_details", "SELECT", SCORECARD),
+    ("campaigns", "SELECT", SCORECARD),
+    ("campaign_weekly_data", "SELECT", SCORECARD),
+    ("campaign_metric_definitions", "SELECT", SCORECARD),
+    ("scorecard_settings", "SELECT", SCORECARD),
+
+    ("groups", "INSERT", ADMIN_ONLY),
+    ("quarters", "INSERT", ADMIN_ONLY),
+    ("rocks", "INSERT", ADMIN_ONLY),
+    ("issues", "INSERT", MEMBERS_ONLY),
+    ("todos", "INSERT", MEMBERS_ONLY),
+    ("rock_ideas", "INSERT", MEMBERS_ONLY),
+    ("meetings", "INSERT", ADMIN_ONLY),
+    ("scorecard_templates", "INSERT", ADMIN_ONLY),
+    ("campaigns", "INSERT", ADMIN_ONLY),
+    ("campaign_metric_definitions", "INSERT", ADMIN_ONLY),
+    ("scorecard_settings", "INSERT", ADMIN_ONLY),
+]
+
+# INSERT bodies: fn(data, user_id, group_id) -> row; group_id is a group the user is not in
+INSERT_ROWS = {
+    "groups": lambda d, uid, gid: {"name": "RLS Matrix Group"},
+    "quarters": lambda d, uid, gid: {"label": "RLS Matrix Q", "start_date": "2099-04-01", "end_date": "2099-06-30"},
+    "rocks": lambda d, uid, gid: {"title": "RLS Matrix Rock", "group_id": gid, "owner_id": uid,
+                                  "quarter_id": d.sample_quarter.id if d.sample_quarter else None},
+    "issues": lambda d, uid, gid: {"description": "RLS matrix issue", "group_id": gid, "raised_by": uid},
+    "todos": lambda d, uid, gid: {"description": "RLS matrix todo", "group_id": gid, "assigned_to_id": uid,
+                                  "due_date": "2099-01-01"},
+    "rock_ideas": lambda d, uid, gid: {"description": "RLS matrix idea", "group_id": gid},
+    "meetings": lambda d, uid, gid: {"group_id": gid, "meeting_date": "2099-01-05"},
+    "scorecard_templates": lambda d, uid, gid: {"group_id": gid, "name": "RLS Matrix Scorecard"},
+    "campaigns": lambda d, uid, gid: {"group_id": gid, "name": "RLS Matrix Campaign"},
+    "campaign_metric_definitions": lambda d, uid, gid: {"group_id": gid, "metric_key": "rls_matrix",
+                                                        "label": "RLS Matrix"},
+    "scorecard_settings": lambda d, uid, gid: {"group_id": gid, "setting_key": "rls_matrix",
+                                               "setting_value": "1"},
+}
+
+SERVICE = "service_role"
+
+
+class MatrixPlan:
+    """
+    Compiled matrix: distinct requests keyed by what they ask, plus the
+    cells that read them. Roles with the same groups share resolved ids.
+    """
+
+    def __init__(self, matrix: list, roles: list, data: Fixtures):
+        self.data = data
+        self.users = dict(roles)
+        self.cells = []     # (role, table, op, expected, request key or None, note)
+        self.requests = {}  # (role, method, table, params) -> same; insertion-ordered set
+        self._scope = {}    # (table, groups) -> allowed values of SCOPE[table] column
+        self._scope_locks = {}
+        self._lock = threading.Lock()
+        self._matrix = matrix
+
+    # -- fixtures (service role) --
+
+    def _key_lock(self, key) -> threading.Lock:
+        with self._lock:
+            return self._scope_locks.setdefault(key, threading.Lock())
+
+    def scope_values(self, table: str, groups: frozenset) -> frozenset:
+        """Values SCOPE[table]'s column may take for rows inside `groups`."""
+        column, parent = SCOPE[table]
+        if parent is None:
+            return groups
+        key = (table, groups)
+        with self._key_lock(key):
+            if key not in self._scope:
+                self._scope[key] = self._ids_within(parent, groups)
+            return self._scope[key]
+
+    def _ids_within(self, table: str, groups: frozenset) -> frozenset:
+        column, _ = SCOPE[table]
+        values = sorted(self.scope_values(table, groups))
+        ids = set()
+        for i in range(0, len(values), MAX_FILTER_VALUES):
+            chunk = ",".join(values[i:i + MAX_FILTER_VALUES])
+            ids.update(r["id"] for r in admin_stream(table, "id", f"{column}=in.({chunk})"))
+        return frozenset(ids)
+
+    # -- compile --
+
+    def compile(self):
+        for table, op, outcomes in self._matrix:
+            for role, user in self.users.items():
+                expected = outcomes.get(role)
+                if expected is None:
+                    continue
+                if op == "SELECT" and expected == ALL:
+                    self._need((SERVICE, "HEAD", table, ()))
+                    key = self._need((role, "HEAD", table, ()))
+                    self.cells.append((role, table, op, expected, key, None))
+                elif op == "SELECT":
+                    self.cells.append((role, table, op, expected, None, "pending"))
+                elif op == "INSERT":
+                    group = None
+                    if SCOPE.get(table, (None,))[0] == "group_id":
+                        group = self.data.group_not_containing(user.id)
+                        if group is None:
+                            self.cells.append((role, table, op, expected, None, "user is in every group"))
+                            continue
+                    body = INSERT_ROWS[table](self.data, user.id, group.id if group else None)
+                    key = self._need((role, "POST", table, tuple(sorted(body.items()))))
+                    self.cells.append((role, table, op, expected, key, None))
+        return self
+
+    def _need(self, key: tuple) -> tuple:
+        """Register a request; identical requests from different cells are sent once."""
+        self.requests.setdefault(key, key)
+        return key
+
+    def resolve_leak_checks(self, workers: int):
+        """Resolve allowed sets for OWN cells (shared across roles) and add their requests."""
+        pending = [(i, c) for i, c in enumerate(self.cells) if c[5] == "pending"]
+        targets = {(c[1], self.data.groups_of(self.users[c[0]].id)) for _, c in pending}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(lambda t: self.scope_values(*t), targets))
+        for i, (role, table, op, expected, _, _) in pending:
+            values = self.scope_values(table, self.data.groups_of(self.users[role].id))
+            column = SCOPE[table][0]
+            if len(values) <= MAX_FILTER_VALUES:
+                params = ((column, f"not.in.({','.join(sorted(values))})"), ("limit", "1"))
+                key = self._need((role, "GET", table, params))
+            else:
+                key = self._need((role, "SCAN", table, ((column, values),)))
+            self.cells[i] = (role, table, op, expected, key, None)
+
+
+def _send(key: tuple, clients: dict, fixtures: FixtureManager):
+    role, method, table, params = key
+    if role == SERVICE:
+        headers = {"apikey": SUPABASE_SERVICE_ROLE_KEY, "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+                   "Prefer": "count=exact"}
+        return get_pool().head(f"{SUPABASE_URL}/rest/v1/{table}?select=id", headers=headers)
+    client = clients[role]
+    if method == "HEAD":
+        return client.count(table)
+    if method == "GET":
+        column = params[0][0]
+        return client.select(table, f"id,{column}", dict(params))
+    if method == "SCAN":
+        (column, values), = params
+        stream = client.stream(table, f"id,{column}")
+        leak = next((r for r in stream if r[column] not in values), None) if stream.ok else None
+        return stream.resp, leak
+    if method == "POST":
+        return fixtures.create(client, table, dict(params))
+    raise ValueError(method)
+
+
+def _evaluate(cell: tuple, responses: dict, shard):
+    role, table, op, expected, key, note = cell
+    name = f"matrix {table} {op} {expected.upper()}"
+    if key is None:
+        shard.log(f"  [SKIP] {name} ({note})")
+        return
+    resp = responses[key]
+    if op == "SELECT" and expected == ALL:
+        total = content_range_total(responses[(SERVICE, "HEAD", table, ())])
+        seen = content_range_total(resp)
+        if seen is not None and seen == total:
+            shard.ok(name, resp)
+        else:
+            shard.fail(name, f"saw {seen} of {total} rows (status {resp.status_code})", resp)
+    elif op == "SELECT":
+        leak = None
+        if key[1] == "SCAN":
+            resp, leak = resp
+        elif resp.status_code == 200 and resp.json():
+            leak = resp.json()[0]
+        column = SCOPE[table][0]
+        if resp.status_code not in (200, 206):
+            shard.fail(name, f"status {resp.status_code}", resp)
+        elif leak:
+            shard.fail(name, f"saw {column} {leak[column]} (row {leak['id']})", resp)
+        else:
+            shard.ok(name, resp)
+    else:
+        if expected == ALLOW and resp.status_code == 201 or expected == DENY and resp.status_code in (401, 403):
+            shard.ok(name, resp)
+        else:
+            want = "201" if expected == ALLOW else "401/403"
+            shard.fail(name, f"expected {want}, got {resp.status_code}: {resp.text[:200]}", resp)
+
+
+def run_matrix(clients: dict, roles: list, data: Fixtures, collector: ResultCollector,
+               workers: int = 8, matrix: list = None, fixtures: FixtureManager = None,
+               tables: set = None) -> MatrixPlan:
+    """
+    clients: role -> SupabaseClient; roles: [(role, Profile)].
+    Records one result per cell in a per-role shard merged into collector.
+    Inserted rows go through `fixtures` (the caller tears down); without
+    one, a private manager removes them before returning. `tables`
+    restricts the run to those tables' rows (see impact.py).
+    """
+    own_fixtures = fixtures is None
+    fixtures = fixtures or FixtureManager()
+    matrix = [row for row in matrix or MATRIX if tables is None or row[0] in tables]
+    plan = MatrixPlan(matrix, roles, data).compile()
+    if not plan.cells:
+        print("\nPolicy matrix: no affected cells")
+        return plan
+    plan.resolve_leak_checks(workers)
+
+    # Reads first: ALLOW inserts would otherwise race the ALL row counts
+    reads = [k for k in plan.requests if k[1] != "POST"]
+    writes = [k for k in plan.requests if k[1] == "POST"]
+    responses = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for batch in (reads, writes):
+            responses.update(zip(batch, pool.map(lambda k: _send(k, clients, fixtures), batch)))
+
+    shards = {role: collector.shard(role) for role, _ in roles}
+    for role, user in roles:
+        shards[role].log(f"\n{'=' * 50}\nPolicy matrix: {role} ({user.email})\n{'=' * 50}")
+    for cell in plan.cells:
+        _evaluate(cell, responses, shards[cell[0]])
+    for role, _ in roles:
+        collector.merge(shards[role])
+    print(f"\nPolicy matrix: {len(plan.cells)} cells, {len(plan.requests)} requests")
+
+    if own_fixtures:
+        fixtures.teardown()
+    return plan
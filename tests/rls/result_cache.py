@@ -0,0 +1,122 @@
+"""
+RLS Result Cache
+================
+Replays passing suites whose outcome cannot have changed since they last
+ran, so repeated runs against an unchanged database skip them.
+
+A suite result is keyed by everything it depends on:
+
+- the definitions of the policies, functions and triggers that can reach
+  the suite's tables/RPCs (impact.affecting), read live from pg_policies,
+  pg_proc and pg_trigger through the rls_schema_objects() RPC
+  (scripts/rls-schema-objects.sql). The policies are applied to the live
+  project by hand, so the repo SQL does not identify them: when that RPC
+  is not installed or fails, the cache is off for the run
+- the fixture snapshot (Fixtures.digest)
+- the role and user, the leak-check mode and the harness source itself
+
+Only suites that leave nothing behind when they pass (the runner's
+non-exclusive suites) are cached, and only when every assertion passed;
+a failing suite always re-runs. Entries live in one JSON file, scoped to
+one SUPABASE_URL, and the least recently used are evicted beyond
+max_entries.
+
+    RLS_RESULT_CACHE=.rls-results.json python run_rls_tests.py
+"""
+
+import glob
+import hashlib
+import json
+import os
+import threading
+
+import requests
+
+import impact
+from supabase_client import admin_rpc
+
+HARNESS_FILES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")
+
+
+def fingerprint(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def harness_digest() -> str:
+    """Hash of the harness sources: editing a check invalidates its cached results."""
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(HARNESS_FILES)):
+        with open(path, "rb") as f:
+            h.update(os.path.basename(path).encode() + b"\0" + f.read())
+    return h.hexdigest()
+
+
+def schema_objects() -> tuple[dict | None, str]:
+    """-> (live objects in impact.parse_objects() shape, source), or (None, why) when the RPC fails."""
+    try:
+        return impact.catalog_objects(admin_rpc("rls_schema_objects")), "database catalog"
+    except requests.HTTPError as e:
+        return None, f"rls_schema_objects() failed ({e}); install scripts/rls-schema-objects.sql"
+
+
+def schema_fingerprint(objects: dict, targets: set) -> str:
+    """Fingerprint of the definitions that can affect `targets`."""
+    keys = sorted(impact.affecting(objects, targets))
+    return fingerprint([(list(key), objects[key]["text"]) for key in keys])
+
+
+class ResultCache:
+    """Key -> passing assertion records, LRU-evicted, with optional file backing."""
+
+    def __init__(self, base_url: str, path: str = None, max_entries: int = 2000):
+        self.base_url = base_url
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = {}   # dict order = least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("url") == self.base_url:
+            self.entries = stored.get("entries", {})
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            text = json.dumps({"url": self.base_url, "entries": self.entries})
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            f.write(text)
+        os.replace(tmp, self.path)
+
+    def get(self, key: str) -> list[dict] | None:
+        with self._lock:
+            records = self.entries.pop(key, None)
+            if records is None:
+                self.misses += 1
+                return None
+            self.entries[key] = records
+            self.hits += 1
+            return records
+
+    def put(self, key: str, records: list[dict]):
+        with self._lock:
+            self.entries.pop(key, None)
+            self.entries[key] = records
+            self.stored += 1
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "stored": self.stored, "entries": len(self.entries)}
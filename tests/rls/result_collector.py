@@ -0,0 +1,193 @@
+"""
+RLS Test Result Collector
+=========================
+Thread-safe pass/fail bookkeeping with per-assertion timing.
+
+Each worker writes into its own ResultShard (no locking on the hot path);
+shards are merged into the ResultCollector when the worker is done. Every
+assertion records the role, table, HTTP status and request duration of
+the response it checked, so summary() can report which policy is slow,
+not only which one failed.
+"""
+
+import math
+import threading
+from urllib.parse import urlparse
+
+
+class AssertionRecord:
+    """One PASS/FAIL line plus the request it was judged on."""
+
+    __slots__ = ("name", "passed", "detail", "role", "table", "status", "duration")
+
+    def __init__(self, name, passed, detail="", role=None, table=None, status=None, duration=None):
+        self.name = name
+        self.passed = passed
+        self.detail = detail
+        self.role = role
+        self.table = table
+        self.status = status
+        self.duration = duration  # seconds, None when no response was involved
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+def table_from_response(resp) -> str | None:
+    """'rocks' for /rest/v1/rocks, 'rpc/start_new_week' for /rest/v1/rpc/..."""
+    url = getattr(resp, "url", None)
+    return table_from_url(url) if url else None
+
+
+def table_from_url(url: str) -> str | None:
+    path = urlparse(url).path
+    marker = "/rest/v1/"
+    if marker not in path:
+        return path.rsplit("/", 1)[-1] or None
+    return path.split(marker, 1)[1] or None
+
+
+def _response_fields(resp) -> dict:
+    if resp is None:
+        return {}
+    elapsed = getattr(resp, "elapsed", None)
+    return {
+        "table": table_from_response(resp),
+        "status": getattr(resp, "status_code", None),
+        "duration": elapsed.total_seconds() if elapsed is not None else None,
+    }
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def log_latency(durations: list) -> dict:
+    """Mean and sample standard deviation of ln(milliseconds), for baseline.py's t-test."""
+    logs = [math.log(max(d * 1000, 1e-6)) for d in durations]
+    if not logs:
+        return {"mean": 0.0, "sd": 0.0}
+    mean = sum(logs) / len(logs)
+    var = sum((x - mean) ** 2 for x in logs) / (len(logs) - 1) if len(logs) > 1 else 0.0
+    return {"mean": mean, "sd": math.sqrt(var)}
+
+
+def latency_stats(durations: list) -> dict:
+    values = sorted(durations)
+    return {
+        "n": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": values[-1] if values else 0.0,
+    }
+
+
+class ResultShard:
+    """Results of one worker task. Not thread-safe; owned by one thread."""
+
+    def __init__(self, role: str = None, echo: bool = False):
+        self.role = role
+        self.echo = echo
+        self.records = []
+        self.lines = []
+
+    def log(self, line: str = ""):
+        """Print a line immediately when echoing, else hold it for merge()."""
+        if self.echo:
+            print(line)
+        else:
+            self.lines.append(line)
+
+    def ok(self, name: str, resp=None):
+        self.records.append(AssertionRecord(name, True, role=self.role, **_response_fields(resp)))
+        self.log(f"  [PASS] {name}")
+
+    def fail(self, name: str, detail: str = "", resp=None):
+        self.records.append(AssertionRecord(name, False, detail, role=self.role, **_response_fields(resp)))
+        msg = f"  [FAIL] {name}"
+        if detail:
+            msg += f" -- {detail}"
+        self.log(msg)
+
+    def replay(self, records: list[dict]):
+        """Re-record cached results (as_dict() form); no request was made, so no duration."""
+        for r in records:
+            self.records.append(AssertionRecord(**dict(r, duration=None)))
+            self.log(f"  [PASS] {r['name']} (cached)")
+
+    @property
+    def passed(self) -> int:
+        return sum(1 for r in self.records if r.passed)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.records if not r.passed)
+
+
+class ResultCollector:
+    """Merged results of every shard in a run."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = []
+
+    def shard(self, role: str = None, echo: bool = False) -> ResultShard:
+        return ResultShard(role, echo)
+
+    def merge(self, shard: ResultShard):
+        """Fold a finished shard in, replaying its buffered output as one block."""
+        with self._lock:
+            for line in shard.lines:
+                print(line)
+            self.records.extend(shard.records)
+
+    @property
+    def passed(self) -> int:
+        return sum(1 for r in self.records if r.passed)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.records if not r.passed)
+
+    @property
+    def errors(self) -> list[str]:
+        return [
+            f"  [FAIL] {r.name}" + (f" -- {r.detail}" if r.detail else "")
+            for r in self.records if not r.passed
+        ]
+
+    def latency_by(self, field: str) -> dict:
+        """{value of `field`: {n, p50, p95, max}} over timed assertions, in seconds."""
+        groups = {}
+        for r in self.records:
+            key = getattr(r, field)
+            if r.duration is None or key is None:
+                continue
+            groups.setdefault(key, []).append(r.duration)
+        return {key: latency_stats(groups[key]) for key in sorted(groups)}
+
+    def _print_latency(self, title: str, field: str):
+        stats = self.latency_by(field)
+        if not stats:
+            return
+        print(f"\n{title:<32}{'n':>5}{'p50':>9}{'p95':>9}{'max':>9}")
+        for key, s in stats.items():
+            print(f"  {key:<30}{s['n']:>5}{s['p50']*1000:>9.1f}{s['p95']*1000:>9.1f}{s['max']*1000:>9.1f}")
+
+    def summary(self) -> bool:
+        passed, failed = self.passed, self.failed
+        total = passed + failed
+        print(f"\n{'='*50}")
+        print(f"Summary: {passed}/{total} passed, {failed} failed")
+        self._print_latency("Latency by table (ms):", "table")
+        self._print_latency("Latency by role (ms):", "role")
+        errors = self.errors
+        if errors:
+            print(f"\nFailures:")
+            for e in errors:
+                print(f"  {e}")
+        return failed == 0
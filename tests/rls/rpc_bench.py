@@ -0,0 +1,491 @@
+#!/usr/bin/env python3
+"""
+RPC Throughput and Contention Benchmark
+=======================================
+Measures how start_new_week, roll_forward_rock and promote_rock_idea
+(supabase/migrations/00003_rpc_functions.sql) behave when many users call
+them at once, as they do at the Monday rollover.
+
+Runs against a local Postgres (PG_DSN, default: `supabase start` with the
+migrations and supabase/seed.sql applied) over direct connections, so the
+numbers are the functions' own cost and locking, not PostgREST's. A
+synthetic tenant is created first: groups, users (through auth.users, so
+handle_new_user makes their profiles), a current focus snapshot with items
+per user, a rock with milestones and collaborators per user, and a rock
+idea per user. Everything is removed again afterwards.
+
+Each RPC is driven closed-loop at rising concurrency levels, one connection
+per worker, one autocommit transaction per call. A worker's connection
+carries its user's JWT claims (request.jwt.claims), so auth.uid() and the
+RPCs' authorization checks see that user. Per level it reports
+throughput, latency percentiles, errors by kind (deadlock, lock timeout,
+serialization failure, ...), how often workers were waiting on a lock
+(sampled from pg_stat_activity) and the level at which throughput stops
+scaling. A level where more than half of the calls raise is marked
+FAILED and the run exits 1 without recording a baseline.
+
+--contention spread gives each worker its own user/rock/idea (the rollover
+case); --contention hot points every worker at the same one, which is the
+worst case for row locks.
+
+    python rpc_bench.py
+    python rpc_bench.py --groups 50 --users-per-group 20 --levels 1,2,4,8,16,32,64
+    python rpc_bench.py --rpc start_new_week --contention hot --duration 5 --out rpc.json
+    python rpc_bench.py --sweep   # only remove rows left by an interrupted run
+    python rpc_bench.py --baseline .rls-baseline.jsonl   # record + regression gate (baseline.py)
+
+Prerequisites:
+    pip install "psycopg[binary]"
+"""
+
+import argparse
+import itertools
+import json
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+from config import BASELINE_FILE, PG_DSN
+from result_collector import log_latency, percentile
+
+# Quarters from supabase/seed.sql: bench rocks live in the first and are
+# rolled forward / promoted into the second.
+SEED_QUARTER = "a0000000-0000-0000-0000-000000000001"
+NEXT_QUARTER = "a0000000-0000-0000-0000-000000000002"
+
+BENCH_TAG = "rls-rpc-bench"            # groups.description of bench groups
+BENCH_EMAIL_DOMAIN = "rpc-bench.invalid"
+APPLICATION_NAME = "rls-rpc-bench"     # lets the sampler find our backends
+
+DEFAULT_LEVELS = [1, 2, 4, 8, 16, 32]
+MAX_ERROR_SHARE = 0.5                  # a level with more errors than this fails
+
+# SQLSTATE -> error kind; anything else is "other"
+ERROR_KINDS = {
+    "40P01": "deadlock",
+    "55P03": "lock_timeout",
+    "40001": "serialization",
+    "57014": "statement_timeout",
+    "23505": "unique_violation",
+}
+
+
+def _psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise ImportError('rpc_bench.py needs psycopg: pip install "psycopg[binary]"') from e
+    return psycopg
+
+
+def _bench_week(n: int) -> str:
+    """Far-future Mondays, distinct from the ones bench.py and loadgen.py use."""
+    return (date(2300, 1, 4) + timedelta(weeks=n)).isoformat()
+
+
+class Target:
+    """One synthetic user and the rows the RPCs operate on for them."""
+
+    __slots__ = ("user_id", "group_id", "rock_id", "idea_id")
+
+    def __init__(self, user_id: str, group_id: str, rock_id: str, idea_id: str):
+        self.user_id = user_id
+        self.group_id = group_id
+        self.rock_id = rock_id
+        self.idea_id = idea_id
+
+
+# rpc -> (statement, fn(target, n) -> params); n is unique per call
+RPCS = {
+    "start_new_week": (
+        "SELECT start_new_week(%s, %s, %s)",
+        lambda t, n: (t.user_id, t.group_id, _bench_week(n)),
+    ),
+    "roll_forward_rock": (
+        "SELECT roll_forward_rock(%s, %s)",
+        lambda t, n: (t.rock_id, NEXT_QUARTER),
+    ),
+    "promote_rock_idea": (
+        "SELECT promote_rock_idea(%s, %s, %s)",
+        lambda t, n: (t.idea_id, NEXT_QUARTER, t.user_id),
+    ),
+}
+
+
+# -- Synthetic tenant --
+
+def setup_tenant(conn, groups: int, users_per_group: int, items: int, milestones: int) -> list[Target]:
+    """Create the bench tenant in one transaction; -> one Target per user."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT count(*) FROM quarters WHERE id IN (%s, %s)", (SEED_QUARTER, NEXT_QUARTER))
+        if cur.fetchone()[0] != 2:
+            raise RuntimeError("seed quarters missing: apply supabase/seed.sql (supabase db reset)")
+
+    group_ids = [str(uuid.uuid4()) for _ in range(groups)]
+    targets = [
+        Target(str(uuid.uuid4()), group_ids[n % groups], str(uuid.uuid4()), str(uuid.uuid4()))
+        for n in range(groups * users_per_group)
+    ]
+    user_ids = [t.user_id for t in targets]
+    member_groups = [t.group_id for t in targets]
+    snapshot_ids = [str(uuid.uuid4()) for _ in targets]
+
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO groups (id, name, description, meeting_cadence) "
+            "SELECT id, 'RPC Bench Group ' || ord, %s, 'weekly' "
+            "FROM unnest(%s::uuid[]) WITH ORDINALITY AS t(id, ord)",
+            (BENCH_TAG, group_ids))
+        cur.execute(
+            "INSERT INTO auth.users (id, aud, role, email, raw_user_meta_data, created_at, updated_at) "
+            "SELECT id, 'authenticated', 'authenticated', 'rpc-bench-' || ord || '@' || %s, "
+            "       jsonb_build_object('full_name', 'RPC Bench User ' || ord), now(), now() "
+            "FROM unnest(%s::uuid[]) WITH ORDINALITY AS t(id, ord)",
+            (BENCH_EMAIL_DOMAIN, user_ids))
+        cur.execute(
+            "INSERT INTO group_members (group_id, user_id) "
+            "SELECT * FROM unnest(%s::uuid[], %s::uuid[])",
+            (member_groups, user_ids))
+        cur.execute(
+            "INSERT INTO focus_snapshots (id, user_id, group_id, week_date, is_current) "
+            "SELECT s, u, g, %s, true FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[]) AS t(s, u, g)",
+            (_bench_week(-1), snapshot_ids, user_ids, member_groups))
+        cur.execute(
+            "INSERT INTO focus_items (snapshot_id, priority, company_subject, weekly_action, sort_order) "
+            "SELECT s, 'P' || i, 'Bench account ' || i, 'Follow up', i "
+            "FROM unnest(%s::uuid[]) AS t(s) CROSS JOIN generate_series(1, %s) AS i",
+            (snapshot_ids, items))
+        cur.execute(
+            "INSERT INTO rocks (id, title, owner_id, group_id, quarter_id) "
+            "SELECT r, 'RPC Bench Rock', u, g, %s FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[]) AS t(r, u, g)",
+            (SEED_QUARTER, [t.rock_id for t in targets], user_ids, member_groups))
+        cur.execute(
+            "INSERT INTO milestones (rock_id, title, sort_order) "
+            "SELECT r, 'Bench milestone ' || i, i "
+            "FROM unnest(%s::uuid[]) AS t(r) CROSS JOIN generate_series(1, %s) AS i",
+            ([t.rock_id for t in targets], milestones))
+        cur.execute(
+            "INSERT INTO milestone_collaborators (milestone_id, user_id) "
+            "SELECT m.id, r.owner_id FROM milestones m JOIN rocks r ON r.id = m.rock_id "
+            "WHERE r.id = ANY(%s::uuid[])",
+            ([t.rock_id for t in targets],))
+        cur.execute(
+            "INSERT INTO rock_ideas (id, group_id, description, suggested_owner_id) "
+            "SELECT i, g, 'RPC Bench Idea', u FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[]) AS t(i, g, u)",
+            ([t.idea_id for t in targets], member_groups, user_ids))
+    return targets
+
+
+def teardown_tenant(conn) -> int:
+    """Delete every bench group, user and the rows hanging off them; -> groups removed."""
+    with conn.transaction(), conn.cursor() as cur:
+        cur.execute("SELECT array_agg(id) FROM groups WHERE description = %s", (BENCH_TAG,))
+        group_ids = cur.fetchone()[0] or []
+        # focus_items, milestones and milestone_collaborators cascade
+        for table in ("focus_snapshots", "rock_ideas", "rocks", "group_members"):
+            cur.execute(f"DELETE FROM {table} WHERE group_id = ANY(%s::uuid[])", (group_ids,))
+        cur.execute("DELETE FROM groups WHERE id = ANY(%s::uuid[])", (group_ids,))
+        # profiles cascade from auth.users
+        cur.execute("DELETE FROM auth.users WHERE email LIKE %s", (f"%@{BENCH_EMAIL_DOMAIN}",))
+    return len(group_ids)
+
+
+def duplicate_current_snapshots(conn) -> int:
+    """(user, group) pairs in the bench tenant with more than one current snapshot."""
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT count(*) FROM ("
+            "  SELECT 1 FROM focus_snapshots s JOIN groups g ON g.id = s.group_id "
+            "  WHERE g.description = %s AND s.is_current "
+            "  GROUP BY s.user_id, s.group_id HAVING count(*) > 1) d",
+            (BENCH_TAG,))
+        return cur.fetchone()[0]
+
+
+# -- Lock-wait sampling --
+
+class LockSampler(threading.Thread):
+    """Polls pg_stat_activity for our backends while a level runs."""
+
+    def __init__(self, dsn: str, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.dsn = dsn
+        self.interval = interval
+        self.samples = 0
+        self.active = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.wait_events = {}
+        self._done = threading.Event()
+
+    def run(self):
+        with _psycopg().connect(self.dsn, autocommit=True) as conn, conn.cursor() as cur:
+            while not self._done.wait(self.interval):
+                cur.execute(
+                    "SELECT state, wait_event_type, wait_event FROM pg_stat_activity "
+                    "WHERE application_name = %s AND pid <> pg_backend_pid()",
+                    (APPLICATION_NAME,))
+                rows = cur.fetchall()
+                waiting = [r for r in rows if r[1] == "Lock"]
+                self.samples += 1
+                self.active += sum(1 for r in rows if r[0] == "active")
+                self.waiting += len(waiting)
+                self.max_waiting = max(self.max_waiting, len(waiting))
+                for r in waiting:
+                    self.wait_events[r[2]] = self.wait_events.get(r[2], 0) + 1
+
+    def stop(self) -> dict:
+        self._done.set()
+        self.join()
+        return {
+            "samples": self.samples,
+            "mean_waiting": self.waiting / self.samples if self.samples else 0.0,
+            "max_waiting": self.max_waiting,
+            "wait_ratio": self.waiting / self.active if self.active else 0.0,
+            "wait_events": self.wait_events,
+        }
+
+
+# -- Driver --
+
+def run_level(dsn: str, rpc: str, targets: list, concurrency: int, duration: float, warmup: int,
+              contention: str, lock_timeout: str, counter) -> dict:
+    """Drive `rpc` from `concurrency` connections for `duration` seconds."""
+    psycopg = _psycopg()
+    statement, params = RPCS[rpc]
+    conns = []
+    for _ in range(concurrency):
+        conn = psycopg.connect(dsn, autocommit=True, application_name=APPLICATION_NAME)
+        conn.execute(f"SET lock_timeout = '{lock_timeout}'")
+        conns.append(conn)
+
+    samples = []
+    errors = {}
+    lock = threading.Lock()
+    ready = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker(w: int, conn):
+        target = targets[0] if contention == "hot" else targets[w % len(targets)]
+        # Call as the target user, the way PostgREST would: auth.uid() and
+        # user_group_ids() inside the RPCs read these claims
+        conn.execute("SELECT set_config('request.jwt.claims', %s, false), "
+                     "set_config('request.jwt.claim.sub', %s, false)",
+                     (json.dumps({"sub": target.user_id, "role": "authenticated"}), target.user_id))
+        local, local_errors = [], {}
+        for _ in range(warmup):
+            try:
+                conn.execute(statement, params(target, next(counter)))
+            except psycopg.Error:
+                pass
+        ready.wait()
+        while time.perf_counter() < deadline[0]:
+            start = time.perf_counter()
+            try:
+                conn.execute(statement, params(target, next(counter)))
+                kind = None
+            except psycopg.Error as e:
+                kind = ERROR_KINDS.get(e.sqlstate, "other")
+            local.append((time.perf_counter() - start, kind))
+            if kind:
+                local_errors[kind] = local_errors.get(kind, 0) + 1
+        with lock:
+            samples.extend(local)
+            for kind, n in local_errors.items():
+                errors[kind] = errors.get(kind, 0) + n
+
+    threads = [threading.Thread(target=worker, args=(w, c)) for w, c in enumerate(conns)]
+    for t in threads:
+        t.start()
+    sampler = LockSampler(dsn)
+    ready.wait()  # every worker warmed up and connected
+    deadline[0] = time.perf_counter() + duration
+    start = time.perf_counter()
+    sampler.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+    locks = sampler.stop()
+    for conn in conns:
+        conn.close()
+
+    ok = sorted(d for d, kind in samples if kind is None)
+    error_rate = (len(samples) - len(ok)) / len(samples) if samples else 0.0
+    return {
+        "rpc": rpc,
+        "concurrency": concurrency,
+        "calls": len(samples),
+        "ok": len(ok),
+        "errors": errors,
+        "error_rate": error_rate,
+        # mostly errors: the level timed failure paths (auth checks, missing rows), not the RPC
+        "failed": not samples or error_rate > MAX_ERROR_SHARE,
+        "throughput_cps": len(ok) / wall if wall else 0.0,
+        "latency_ms": {
+            "mean": sum(ok) / len(ok) * 1000 if ok else 0.0,
+            "p50": percentile(ok, 50) * 1000,
+            "p95": percentile(ok, 95) * 1000,
+            "p99": percentile(ok, 99) * 1000,
+            "max": (ok[-1] if ok else 0.0) * 1000,
+        },
+        "log_ms": log_latency(ok),
+        "locks": locks,
+    }
+
+
+def scaling_limit(levels: list[dict], min_efficiency: float = 0.5, max_error_rate: float = 0.01) -> dict:
+    """
+    Highest level that still scaled. A step from level a to b scales when it
+    gains at least `min_efficiency` of the ideal b/a speed-up and keeps the
+    error rate under `max_error_rate`.
+    """
+    best = levels[0]["concurrency"] if levels else None
+    for prev, cur in zip(levels, levels[1:]):
+        if cur["error_rate"] > max_error_rate:
+            return {"scales_to": best, "stopped_at": cur["concurrency"], "reason": "errors"}
+        ideal = cur["concurrency"] / prev["concurrency"]
+        gain = cur["throughput_cps"] / prev["throughput_cps"] if prev["throughput_cps"] else 0.0
+        if gain < 1 + min_efficiency * (ideal - 1):
+            reason = "lock waits" if cur["locks"]["wait_ratio"] > 0.2 else "throughput"
+            return {"scales_to": best, "stopped_at": cur["concurrency"], "reason": reason}
+        best = cur["concurrency"]
+    return {"scales_to": best, "stopped_at": None, "reason": None}
+
+
+def run_rpc_bench(dsn: str = PG_DSN, rpcs: list = None, levels: list = None, duration: float = 10.0,
+                  warmup: int = 3, contention: str = "spread", lock_timeout: str = "5s",
+                  groups: int = 10, users_per_group: int = 10, items: int = 8, milestones: int = 5,
+                  progress: bool = True) -> dict:
+    """Set up the tenant, run every RPC at every level, tear down; -> JSON-ready report."""
+    psycopg = _psycopg()
+    rpcs = rpcs or list(RPCS)
+    levels = sorted(levels or DEFAULT_LEVELS)
+    counter = itertools.count()
+
+    with psycopg.connect(dsn, autocommit=True) as admin:
+        teardown_tenant(admin)  # leftovers from an interrupted run
+        targets = setup_tenant(admin, groups, users_per_group, items, milestones)
+        if contention == "spread" and levels[-1] > len(targets):
+            print(f"  note: {levels[-1]} workers share {len(targets)} users; raise --users-per-group")
+        results = []
+        try:
+            for rpc in rpcs:
+                rows = []
+                for level in levels:
+                    before = duplicate_current_snapshots(admin) if rpc == "start_new_week" else 0
+                    row = run_level(dsn, rpc, targets, level, duration, warmup, contention,
+                                    lock_timeout, counter)
+                    if rpc == "start_new_week":
+                        row["duplicate_current_snapshots"] = duplicate_current_snapshots(admin) - before
+                    rows.append(row)
+                    if progress:
+                        _print_level(row)
+                results.append({"rpc": rpc, "levels": rows, "scaling": scaling_limit(rows)})
+        finally:
+            teardown_tenant(admin)
+
+    return {
+        "meta": {
+            "dsn": dsn.rsplit("@", 1)[-1],  # host/port/db, no credentials
+            "levels": levels,
+            "duration": duration,
+            "warmup": warmup,
+            "contention": contention,
+            "lock_timeout": lock_timeout,
+            "tenant": {"groups": groups, "users": len(targets), "focus_items": items, "milestones": milestones},
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "results": results,
+    }
+
+
+def _print_level(row: dict):
+    lat = row["latency_ms"]
+    print(f"  {row['rpc']:<18} c={row['concurrency']:<4} {row['throughput_cps']:>8.1f} calls/s  "
+          f"p50 {lat['p50']:>7.1f}  p99 {lat['p99']:>7.1f} ms  "
+          f"lock-wait {row['locks']['wait_ratio']:>5.1%}  errors {row['errors'] or '-'}"
+          f"{'  FAILED' if row['failed'] else ''}")
+
+
+def print_report(report: dict):
+    print(f"\n{'rpc':<20}{'conc':>5}{'calls/s':>10}{'p50':>9}{'p95':>9}{'p99':>9}{'wait%':>7}{'err%':>7}  errors")
+    for r in report["results"]:
+        for row in r["levels"]:
+            lat = row["latency_ms"]
+            print(f"{row['rpc']:<20}{row['concurrency']:>5}{row['throughput_cps']:>10.1f}"
+                  f"{lat['p50']:>9.1f}{lat['p95']:>9.1f}{lat['p99']:>9.1f}"
+                  f"{row['locks']['wait_ratio'] * 100:>7.1f}{row['error_rate'] * 100:>7.1f}  {row['errors'] or ''}")
+
+    print("\nScaling")
+    for r in report["results"]:
+        s = r["scaling"]
+        if s["stopped_at"] is None:
+            print(f"  {r['rpc']:<20} scaled through c={s['scales_to']}")
+        else:
+            print(f"  {r['rpc']:<20} scales to c={s['scales_to']}, stops at c={s['stopped_at']} ({s['reason']})")
+        failed = [row["concurrency"] for row in r["levels"] if row["failed"]]
+        if failed:
+            print(f"  {'':<20} FAILED at c={failed}: over {MAX_ERROR_SHARE:.0%} of calls raised "
+                  f"(is the caller a member of the bench group?)")
+        dupes = sum(row.get("duplicate_current_snapshots", 0) for row in r["levels"])
+        if dupes:
+            print(f"  {'':<20} {dupes} users ended up with more than one current focus snapshot")
+
+
+def write_report(report: dict, path: str = None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RPC throughput and contention benchmark")
+    parser.add_argument("--dsn", default=PG_DSN, help="Postgres DSN (default: RLS_PG_DSN or local supabase)")
+    parser.add_argument("--rpc", action="append", choices=list(RPCS),
+                        help="RPC to benchmark; repeatable (default: all)")
+    parser.add_argument("--levels", default=",".join(map(str, DEFAULT_LEVELS)),
+                        help="comma-separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per level")
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured calls per worker")
+    parser.add_argument("--contention", choices=["spread", "hot"], default="spread")
+    parser.add_argument("--lock-timeout", default="5s", help="per-session lock_timeout")
+    parser.add_argument("--groups", type=int, default=10)
+    parser.add_argument("--users-per-group", type=int, default=10)
+    parser.add_argument("--focus-items", type=int, default=8, help="items per focus snapshot")
+    parser.add_argument("--milestones", type=int, default=5, help="milestones per rock")
+    parser.add_argument("--out", help="write the JSON report here")
+    parser.add_argument("--baseline", metavar="PATH", default=BASELINE_FILE,
+                        help="record the run in this store and fail on regressions (default: $RLS_BASELINE)")
+    parser.add_argument("--sweep", action="store_true", help="remove leftover bench rows and exit")
+    args = parser.parse_args()
+
+    if args.sweep:
+        with _psycopg().connect(args.dsn, autocommit=True) as conn:
+            print(f"Removed {teardown_tenant(conn)} bench groups")
+        return
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    print(f"RPC bench: {args.groups} groups x {args.users_per_group} users, "
+          f"levels {levels}, {args.duration}s each, {args.contention} contention")
+    report = run_rpc_bench(args.dsn, args.rpc, levels, args.duration, args.warmup, args.contention,
+                           args.lock_timeout, args.groups, args.users_per_group, args.focus_items,
+                           args.milestones)
+    print_report(report)
+    if args.out:
+        write_report(report, args.out)
+    if any(row["failed"] for r in report["results"] for row in r["levels"]):
+        sys.exit(1)  # the timings are of failing calls: do not record them as a baseline
+    if args.baseline:
+        import baseline
+        verdict = baseline.gate(baseline.BaselineStore(args.baseline), baseline.report_run(report))
+        baseline.print_verdict(verdict)
+        sys.exit(1 if verdict["regressions"] else 0)
+
+
+if __name__ == "__main__":
+    main()
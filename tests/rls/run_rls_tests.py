@@ -8,474 +8,747 @@ RPC authorization, and privilege escalation trigger.
 Usage:
     cd tests/rls
     python run_rls_tests.py
+    python run_rls_tests.py --workers 8    # roles and read-only suites in parallel
+    python run_rls_tests.py --snapshot-rpc # fixtures via scripts/rls-fixture-snapshot.sql
+    python run_rls_tests.py --leak-check count    # isolation via HEAD + Prefer: count=exact
+    python run_rls_tests.py --matrix       # also run the table x role matrix (policy_matrix.py)
+    python run_rls_tests.py --sweep        # delete rows left behind by crashed runs
+    python run_rls_tests.py --result-cache .rls-results.json   # replay unchanged suites (result_cache.py)
+    python run_rls_tests.py --changed-since origin/main --matrix   # only what policy edits affect
+    python run_rls_tests.py --bench --bench-out bench.json   # policy latency (bench.py)
+    python run_rls_tests.py --bench --baseline .rls-baseline.jsonl   # + regression gate (baseline.py)
+    python run_rls_tests.py --load --load-rps 50 --load-duration 120   # soak (loadgen.py)
+    python run_rls_tests.py --trace run.json --explain-slowest 5   # timeline + plans (tracing.py)
+    python policy_cost.py                  # policy EXPLAIN ANALYZE before/after rls-initplan-helpers.sql
+    python multi_env.py environments.json  # staging, previews, replicas side by side (multi_env.py)
 
 Prerequisites:
     pip install requests
+
+Set RLS_TOKEN_CACHE=/path/to/tokens.json to reuse sessions across runs.
+Set RLS_RESULT_CACHE=/path/to/results.json to replay suites whose policies
+and fixtures have not changed (same as --result-cache).
+Set RLS_BACKEND=local to run offline against local_stack.py, or
+RLS_BACKEND=postgres to check policies straight in PG_DSN (pg_backend.py).
 """
 
 import sys
 import json
+import argparse
+import atexit
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from supabase_client import (
-    get_user_token, SupabaseClient, admin_query, admin_update,
+    get_user_token, SupabaseClient, RowStream, content_range_total, admin_query,
+    admin_rpc, token_cache,
 )
+from http_pool import get_pool, configure_pool
+from result_collector import ResultCollector, ResultShard
+from fixtures import Fixtures, Profile
+from fixture_manager import FixtureManager, TeardownError, sweep
+from result_cache import ResultCache, fingerprint, harness_digest, schema_fingerprint, schema_objects
+from tracing import RunTrace, context as trace_context
+from embedded import TREES as EMBED_TREES, allowed_groups, check_tree, savings as embed_savings
+from config import BASELINE_FILE, HTTP_POOL_SIZE, RESULT_CACHE_FILE, RESULT_CACHE_SIZE, RLS_BACKEND, SUPABASE_URL
 
 
 # -- Test infrastructure --
 
-class TestResult:
-    def __init__(self):
-        self.passed = 0
-        self.failed = 0
-        self.errors = []
-
-    def ok(self, name: str):
-        self.passed += 1
-        print(f"  [PASS] {name}")
-
-    def fail(self, name: str, detail: str = ""):
-        self.failed += 1
-        msg = f"  [FAIL] {name}"
-        if detail:
-            msg += f" -- {detail}"
-        self.errors.append(msg)
-        print(msg)
-
-    def summary(self):
-        total = self.passed + self.failed
-        print(f"\n{'='*50}")
-        print(f"Summary: {self.passed}/{total} passed, {self.failed} failed")
-        if self.errors:
-            print(f"\nFailures:")
-            for e in self.errors:
-                print(f"  {e}")
-        return self.failed == 0
+results = ResultCollector()
+fixtures = FixtureManager()
+result_cache = None     # ResultCache when --result-cache / RLS_RESULT_CACHE is set
+suite_schema = {}       # cacheable suite -> fingerprint of the definitions it depends on
+_local = threading.local()
 
 
-results = TestResult()
+def current_result() -> ResultShard:
+    """Result shard bound to the calling thread by run_shard()/run_tests_for_role()."""
+    return _local.result
 
 
 def assert_status(name: str, resp, expected_codes: list[int]):
     """Check response status code is in expected list."""
     if resp.status_code in expected_codes:
-        results.ok(name)
+        current_result().ok(name, resp)
     else:
         body = resp.text[:200] if resp.text else ""
-        results.fail(name, f"expected {expected_codes}, got {resp.status_code}: {body}")
+        current_result().fail(name, f"expected {expected_codes}, got {resp.status_code}: {body}", resp)
 
 
 def assert_rows(name: str, resp, expect_rows: bool):
-    """Check whether response returns rows or empty."""
-    if resp.status_code != 200:
-        results.fail(name, f"expected 200, got {resp.status_code}")
-        return
-    data = resp.json()
-    has_rows = len(data) > 0
+    """Check whether response returns rows or empty. A RowStream stops after one row."""
+    if isinstance(resp, RowStream):
+        stream, resp = resp, resp.resp
+        if not stream.ok:
+            current_result().fail(name, f"expected 200, got {resp.status_code}", resp)
+            return
+        has_rows = stream.first() is not None
+        shown = "at least 1" if has_rows else "0"
+    else:
+        if resp.status_code != 200:
+            current_result().fail(name, f"expected 200, got {resp.status_code}", resp)
+            return
+        data = resp.json()
+        has_rows = len(data) > 0
+        shown = str(len(data))
     if has_rows == expect_rows:
-        results.ok(name)
+        current_result().ok(name, resp)
     else:
-        results.fail(name, f"expected {'rows' if expect_rows else 'empty'}, got {len(data)} rows")
+        current_result().fail(name, f"expected {'rows' if expect_rows else 'empty'}, got {shown} rows", resp)
 
 
 def assert_row_count_lte(name: str, resp, max_count: int):
-    """Check response has at most max_count rows."""
-    if resp.status_code != 200:
-        results.fail(name, f"expected 200, got {resp.status_code}")
-        return
-    data = resp.json()
-    if len(data) <= max_count:
-        results.ok(name)
+    """Check response has at most max_count rows. A RowStream stops at max_count + 1."""
+    if isinstance(resp, RowStream):
+        stream, resp = resp, resp.resp
+        if not stream.ok:
+            current_result().fail(name, f"expected 200, got {resp.status_code}", resp)
+            return
+        count = sum(1 for _ in itertools.islice(stream, max_count + 1))
+        shown = f"more than {max_count}" if count > max_count else str(count)
     else:
-        results.fail(name, f"expected <= {max_count} rows, got {len(data)}")
-
-
-# -- Discovery --
-
-def discover_test_data():
-    """Find users by role, groups, rocks, issues for test references."""
-    print("Discovering test data...\n")
-
-    profiles = admin_query("profiles", "id,email,full_name,role")
-    print(f"  Found {len(profiles)} profiles")
+        if resp.status_code != 200:
+            current_result().fail(name, f"expected 200, got {resp.status_code}", resp)
+            return
+        count = len(resp.json())
+        shown = str(count)
+    if count <= max_count:
+        current_result().ok(name, resp)
+    else:
+        current_result().fail(name, f"expected <= {max_count} rows, got {shown}", resp)
 
-    groups = admin_query("groups", "id,name")
-    print(f"  Found {len(groups)} groups")
 
-    members = admin_query("group_members", "id,group_id,user_id,role_in_group")
-    print(f"  Found {len(members)} group memberships")
+def assert_only_groups(name: str, stream: RowStream, allowed: frozenset, column: str = "group_id"):
+    """Check every streamed row's `column` is in allowed; stops at the first row that is not."""
+    if not stream.ok:
+        current_result().fail(name, f"status {stream.status_code}", stream.resp)
+        return
+    for row in stream:
+        if row[column] not in allowed:
+            current_result().fail(name, f"saw group {row[column]} (row {row.get('id')})", stream.resp)
+            return
+    current_result().ok(name, stream.resp)
 
-    rocks = admin_query("rocks", "id,title,group_id,owner_id", "limit=10")
-    print(f"  Found {len(rocks)} rocks (sample)")
 
-    issues = admin_query("issues", "id,description,group_id,raised_by", "limit=5")
-    print(f"  Found {len(issues)} issues (sample)")
+# How assert_no_leak verifies isolation; set from --leak-check
+LEAK_CHECK_MODES = ("filter", "count", "stream")
+leak_check_mode = "filter"
 
-    meetings = admin_query("meetings", "id,meeting_date,group_id", "limit=5")
 
-    quarters = admin_query("quarters", "id,label,is_current", "limit=5")
+def assert_no_leak(name: str, client: SupabaseClient, table: str, allowed: frozenset, column: str = "group_id"):
+    """
+    Check the client sees no `table` row whose `column` is outside allowed.
 
-    rock_ideas = admin_query("rock_ideas", "id,description,group_id", "limit=5")
+    filter: the server applies `column=not.in.(allowed)&limit=1`, so at most
+            one violating row is transferred.
+    count:  HEAD with Prefer: count=exact under the same filter; only
+            headers are transferred.
+    stream: page through every visible row and compare client-side.
 
-    user_groups = {}
-    for m in members:
-        uid = m["user_id"]
-        if uid not in user_groups:
-            user_groups[uid] = []
-        user_groups[uid].append(m["group_id"])
+    The filter modes follow SQL: a NULL `column` never matches not.in, so
+    they rely on the group-scoped tables declaring it NOT NULL.
+    """
+    if leak_check_mode == "stream":
+        assert_only_groups(name, client.stream(table, f"id,{column}"), allowed, column)
+        return
+    params = {column: f"not.in.({','.join(sorted(allowed))})"}
+    if leak_check_mode == "count":
+        resp = client.count(table, params)
+        leaked = content_range_total(resp) if resp.status_code in (200, 206) else None
+        if leaked is None:
+            current_result().fail(name, f"status {resp.status_code}, no count", resp)
+        elif leaked:
+            current_result().fail(name, f"{leaked} rows outside own groups", resp)
+        else:
+            current_result().ok(name, resp)
+        return
+    resp = client.select(table, f"id,{column}", dict(params, limit=1))
+    if resp.status_code != 200:
+        current_result().fail(name, f"status {resp.status_code}", resp)
+    elif resp.json():
+        row = resp.json()[0]
+        current_result().fail(name, f"saw group {row[column]} (row {row['id']})", resp)
+    else:
+        current_result().ok(name, resp)
 
-    return {
-        "profiles": profiles,
-        "groups": groups,
-        "members": members,
-        "rocks": rocks,
-        "issues": issues,
-        "meetings": meetings,
-        "quarters": quarters,
-        "rock_ideas": rock_ideas,
-        "user_groups": user_groups,
-    }
 
+# -- Discovery --
 
-def find_user_by_role(profiles: list, role: str) -> dict | None:
-    """Find first user with the given role."""
-    for p in profiles:
-        if p["role"] == role:
-            return p
-    return None
+# (key, table, select, params) -- one admin_query per fixture list
+DISCOVERY_QUERIES = [
+    ("profiles", "profiles", "id,email,full_name,role", ""),
+    ("groups", "groups", "id,name", ""),
+    ("members", "group_members", "id,group_id,user_id,role_in_group", ""),
+    ("rocks", "rocks", "id,title,group_id,owner_id", "limit=10"),
+    ("issues", "issues", "id,description,group_id,raised_by", "limit=5"),
+    ("meetings", "meetings", "id,meeting_date,group_id", "limit=5"),
+    ("quarters", "quarters", "id,label,is_current", "limit=5"),
+    ("rock_ideas", "rock_ideas", "id,description,group_id", "limit=5"),
+]
+
+
+def fetch_fixtures(use_rpc: bool = False) -> dict:
+    """
+    Fetch every fixture list at once: either the rls_fixture_snapshot() RPC
+    (scripts/rls-fixture-snapshot.sql) or a concurrent admin_query fan-out.
+    """
+    if use_rpc:
+        return admin_rpc("rls_fixture_snapshot")
+    with ThreadPoolExecutor(max_workers=len(DISCOVERY_QUERIES)) as pool:
+        futures = {
+            key: pool.submit(admin_query, table, select, params)
+            for key, table, select, params in DISCOVERY_QUERIES
+        }
+        return {key: future.result() for key, future in futures.items()}
+
+
+def discover_test_data(use_rpc: bool = False) -> Fixtures:
+    """Find users by role, groups, rocks, issues for test references."""
+    print("Discovering test data...\n")
 
+    data = fetch_fixtures(use_rpc)
+    print(f"  Found {len(data['profiles'])} profiles")
+    print(f"  Found {len(data['groups'])} groups")
+    print(f"  Found {len(data['members'])} group memberships")
+    print(f"  Found {len(data['rocks'])} rocks (sample)")
+    print(f"  Found {len(data['issues'])} issues (sample)")
 
-def find_group_not_containing(user_id: str, user_groups: dict, all_groups: list) -> dict | None:
-    """Find a group the user is NOT a member of."""
-    user_gids = set(user_groups.get(user_id, []))
-    for g in all_groups:
-        if g["id"] not in user_gids:
-            return g
-    return None
+    return Fixtures(data)
 
 
 # -- Test suites --
 
-def test_profiles(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_profiles(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test profiles table RLS."""
-    print(f"\n--- profiles ({role}) ---")
+    current_result().log(f"\n--- profiles ({role}) ---")
 
-    resp = client.select("profiles")
-    assert_rows(f"profiles SELECT all", resp, True)
+    assert_rows(f"profiles SELECT all", client.stream("profiles", page_size=1), True)
 
     if role == "team_member":
+        fixtures.revert("profiles", user_id, {"full_name": data.profiles_by_id[user_id].full_name})
         resp = client.update("profiles", {"full_name": "Test Name Temp"}, {"id": user_id})
         assert_status("profiles UPDATE own name", resp, [200])
-        client.update("profiles", {"full_name": data["_original_name"]}, {"id": user_id})
 
     if role == "team_member":
         resp = client.update("profiles", {"role": "system_admin"}, {"id": user_id})
         assert_status("profiles UPDATE role BLOCKED (trigger)", resp, [400, 403, 409, 500])
 
     if role == "system_admin":
-        tm = find_user_by_role(data["profiles"], "team_member")
+        tm = data.first_user("team_member")
         if tm:
-            resp = client.update("profiles", {"role": "executive"}, {"id": tm["id"]})
+            fixtures.revert("profiles", tm.id, {"role": tm.role})
+            resp = client.update("profiles", {"role": "executive"}, {"id": tm.id})
             assert_status("profiles UPDATE other role ALLOWED", resp, [200])
-            client.update("profiles", {"role": "team_member"}, {"id": tm["id"]})
         else:
-            print("  [SKIP] No team_member user to test role update on")
+            current_result().log("  [SKIP] No team_member user to test role update on")
 
 
-def test_groups(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_groups(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test groups table RLS."""
-    print(f"\n--- groups ({role}) ---")
+    current_result().log(f"\n--- groups ({role}) ---")
 
-    resp = client.select("groups")
     if role == "team_member":
-        user_gids = set(data["user_groups"].get(user_id, []))
-        if resp.status_code == 200:
-            returned_gids = {g["id"] for g in resp.json()}
-            if returned_gids.issubset(user_gids | set()):
-                results.ok("groups SELECT: only own groups")
-            else:
-                extra = returned_gids - user_gids
-                results.fail("groups SELECT: only own groups", f"saw extra groups: {extra}")
-        else:
-            results.fail("groups SELECT", f"status {resp.status_code}")
+        assert_no_leak("groups SELECT: only own groups", client, "groups", data.groups_of(user_id), column="id")
     else:
+        resp = client.select("groups")
         assert_rows("groups SELECT all", resp, True)
         if resp.status_code == 200:
-            if len(resp.json()) == len(data["groups"]):
-                results.ok("groups SELECT: sees ALL groups")
+            if len(resp.json()) == len(data.groups):
+                current_result().ok("groups SELECT: sees ALL groups", resp)
             else:
-                results.fail("groups SELECT: sees ALL groups",
-                           f"expected {len(data['groups'])}, got {len(resp.json())}")
+                current_result().fail("groups SELECT: sees ALL groups",
+                           f"expected {len(data.groups)}, got {len(resp.json())}", resp)
 
     if role == "team_member":
-        resp = client.insert("groups", {"name": "RLS Test Group"})
+        resp = fixtures.create(client, "groups", {"name": "RLS Test Group"})
         assert_status("groups INSERT BLOCKED", resp, [403, 401])
     elif role == "system_admin":
-        resp = client.insert("groups", {"name": "RLS Test Group"})
+        resp = fixtures.create(client, "groups", {"name": "RLS Test Group"})
         assert_status("groups INSERT ALLOWED", resp, [201])
-        if resp.status_code == 201:
-            gid = resp.json()[0]["id"]
-            import requests as req
-            headers = {
-                "apikey": data["_service_key"],
-                "Authorization": f"Bearer {data['_service_key']}",
-            }
-            req.delete(f"{data['_supabase_url']}/rest/v1/groups?id=eq.{gid}", headers=headers)
 
 
-def test_rocks(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_rocks(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test rocks table RLS."""
-    print(f"\n--- rocks ({role}) ---")
+    current_result().log(f"\n--- rocks ({role}) ---")
 
-    resp = client.select("rocks")
     if role == "team_member":
-        user_gids = set(data["user_groups"].get(user_id, []))
-        if resp.status_code == 200:
-            rocks = resp.json()
-            rock_gids = {r["group_id"] for r in rocks}
-            if rock_gids.issubset(user_gids):
-                results.ok("rocks SELECT: only own group")
-            else:
-                extra = rock_gids - user_gids
-                results.fail("rocks SELECT: only own group", f"saw groups: {extra}")
-        else:
-            results.fail("rocks SELECT", f"status {resp.status_code}")
+        assert_no_leak("rocks SELECT: only own group", client, "rocks", data.groups_of(user_id))
 
-        other_group = find_group_not_containing(user_id, data["user_groups"], data["groups"])
+        other_group = data.group_not_containing(user_id)
         if other_group:
-            resp = client.insert("rocks", {
+            quarter = data.sample_quarter
+            resp = fixtures.create(client, "rocks", {
                 "title": "RLS Test Rock",
-                "group_id": other_group["id"],
+                "group_id": other_group.id,
                 "owner_id": user_id,
-                "quarter_id": data["quarters"][0]["id"] if data["quarters"] else None,
+                "quarter_id": quarter.id if quarter else None,
             })
             assert_status("rocks INSERT other group BLOCKED", resp, [403, 401])
         else:
-            print("  [SKIP] User is in all groups, cannot test cross-group insert denial")
+            current_result().log("  [SKIP] User is in all groups, cannot test cross-group insert denial")
 
     elif role in ("executive", "system_admin"):
-        assert_rows("rocks SELECT all groups", resp, True)
+        assert_rows("rocks SELECT all groups", client.stream("rocks", "id", page_size=1), True)
 
-    if role == "system_admin" and len(data["groups"]) > 0:
-        target_group = data["groups"][0]
-        quarter = data["quarters"][0] if data["quarters"] else None
+    if role == "system_admin" and len(data.groups) > 0:
+        target_group = data.groups[0]
+        quarter = data.sample_quarter
         if quarter:
-            resp = client.insert("rocks", {
+            resp = fixtures.create(client, "rocks", {
                 "title": "RLS Admin Test Rock",
-                "group_id": target_group["id"],
+                "group_id": target_group.id,
                 "owner_id": user_id,
-                "quarter_id": quarter["id"],
+                "quarter_id": quarter.id,
             })
             assert_status("rocks INSERT any group (admin bypass)", resp, [201])
-            if resp.status_code == 201:
-                rock_id = resp.json()[0]["id"]
-                client.delete("rocks", {"id": rock_id})
 
 
-def test_issues(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_issues(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test issues table RLS."""
-    print(f"\n--- issues ({role}) ---")
+    current_result().log(f"\n--- issues ({role}) ---")
 
-    resp = client.select("issues")
     if role == "team_member":
-        user_gids = set(data["user_groups"].get(user_id, []))
-        if resp.status_code == 200:
-            issue_gids = {i["group_id"] for i in resp.json()}
-            if issue_gids.issubset(user_gids):
-                results.ok("issues SELECT: only own group")
-            else:
-                results.fail("issues SELECT: only own group",
-                           f"saw groups: {issue_gids - user_gids}")
-        else:
-            results.fail("issues SELECT", f"status {resp.status_code}")
+        assert_no_leak("issues SELECT: only own group", client, "issues", data.groups_of(user_id))
 
-        other_group = find_group_not_containing(user_id, data["user_groups"], data["groups"])
+        other_group = data.group_not_containing(user_id)
         if other_group:
-            resp = client.insert("issues", {
+            resp = fixtures.create(client, "issues", {
                 "description": "RLS test issue",
-                "group_id": other_group["id"],
+                "group_id": other_group.id,
                 "raised_by": user_id,
             })
             assert_status("issues INSERT other group BLOCKED", resp, [403, 401])
     else:
-        assert_rows("issues SELECT all", resp, True)
+        assert_rows("issues SELECT all", client.stream("issues", "id", page_size=1), True)
 
 
-def test_focus(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_focus(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test focus_snapshots and focus_items RLS."""
-    print(f"\n--- focus_snapshots ({role}) ---")
+    current_result().log(f"\n--- focus_snapshots ({role}) ---")
 
-    resp = client.select("focus_snapshots")
     if role == "team_member":
-        user_gids = set(data["user_groups"].get(user_id, []))
-        if resp.status_code == 200:
-            snap_gids = {s["group_id"] for s in resp.json()}
-            if snap_gids.issubset(user_gids):
-                results.ok("focus_snapshots SELECT: only own group")
-            else:
-                results.fail("focus_snapshots SELECT: only own group",
-                           f"saw groups: {snap_gids - user_gids}")
+        assert_no_leak("focus_snapshots SELECT: only own group", client, "focus_snapshots",
+                       data.groups_of(user_id))
     else:
-        assert_rows("focus_snapshots SELECT all", resp, True)
+        assert_rows("focus_snapshots SELECT all", client.stream("focus_snapshots", "id", page_size=1), True)
 
 
-def test_meetings(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_meetings(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test meetings table RLS."""
-    print(f"\n--- meetings ({role}) ---")
+    current_result().log(f"\n--- meetings ({role}) ---")
 
-    resp = client.select("meetings")
     if role == "team_member":
-        user_gids = set(data["user_groups"].get(user_id, []))
-        if resp.status_code == 200:
-            mtg_gids = {m["group_id"] for m in resp.json()}
-            if mtg_gids.issubset(user_gids):
-                results.ok("meetings SELECT: only own group")
-            else:
-                results.fail("meetings SELECT: only own group",
-                           f"saw groups: {mtg_gids - user_gids}")
+        assert_no_leak("meetings SELECT: only own group", client, "meetings", data.groups_of(user_id))
     else:
-        assert_rows("meetings SELECT all", resp, True)
+        assert_rows("meetings SELECT all", client.stream("meetings", "id", page_size=1), True)
 
 
-def test_quarters(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_quarters(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test quarters table RLS."""
-    print(f"\n--- quarters ({role}) ---")
+    current_result().log(f"\n--- quarters ({role}) ---")
 
-    resp = client.select("quarters")
-    assert_rows("quarters SELECT", resp, True)
+    assert_rows("quarters SELECT", client.stream("quarters", "id", page_size=1), True)
 
+    quarter = {"label": "RLS Test Q", "start_date": "2099-01-01", "end_date": "2099-03-31"}
     if role == "team_member":
-        resp = client.insert("quarters", {"label": "RLS Test Q", "start_date": "2099-01-01", "end_date": "2099-03-31"})
+        resp = fixtures.create(client, "quarters", quarter)
         assert_status("quarters INSERT BLOCKED", resp, [403, 401])
     elif role == "system_admin":
-        resp = client.insert("quarters", {"label": "RLS Test Q", "start_date": "2099-01-01", "end_date": "2099-03-31"})
+        resp = fixtures.create(client, "quarters", quarter)
         assert_status("quarters INSERT ALLOWED", resp, [201])
-        if resp.status_code == 201:
-            qid = resp.json()[0]["id"]
-            client.delete("quarters", {"id": qid})
 
 
-def test_rpc_start_new_week(client: SupabaseClient, role: str, user_id: str, data: dict):
-    """Test start_new_week RPC authorization: p_user_id must match auth.uid()."""
-    print(f"\n--- RPC: start_new_week ({role}) ---")
+def test_child_tables(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
+    """Test child-table RLS with one embedded read per parent tree (embedded.py)."""
+    current_result().log(f"\n--- child tables, embedded ({role}) ---")
+
+    for tree in EMBED_TREES:
+        name = f"{tree.table} + children SELECT: embedded isolation"
+        resp, problems = check_tree(client, tree, allowed_groups(tree, role, user_id, data))
+        if problems is None:
+            current_result().log(f"  [SKIP] {tree.table} tree not readable by the service role")
+        elif problems:
+            current_result().fail(name, "; ".join(problems), resp)
+        else:
+            current_result().ok(name, resp)
 
-    other_user = None
-    for p in data["profiles"]:
-        if p["id"] != user_id:
-            other_user = p
-            break
 
-    if other_user and data["user_groups"].get(user_id):
+def test_rpc_start_new_week(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
+    """Test start_new_week RPC authorization: p_user_id must match auth.uid()."""
+    current_result().log(f"\n--- RPC: start_new_week ({role}) ---")
+
+    other_user = data.other_user(user_id)
+    if other_user and data.user_groups.get(user_id):
         resp = client.rpc("start_new_week", {
-            "p_user_id": other_user["id"],
-            "p_group_id": data["user_groups"][user_id][0],
+            "p_user_id": other_user.id,
+            "p_group_id": data.user_groups[user_id][0],
             "p_new_week_date": "2099-01-06",
         })
         assert_status("start_new_week with other user_id BLOCKED", resp, [400, 403, 500])
 
 
-def test_rpc_roll_forward_rock(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_rpc_roll_forward_rock(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test roll_forward_rock RPC authorization."""
-    print(f"\n--- RPC: roll_forward_rock ({role}) ---")
+    current_result().log(f"\n--- RPC: roll_forward_rock ({role}) ---")
 
     if role != "team_member":
-        print("  [SKIP] Only testing cross-group denial for team_member")
+        current_result().log("  [SKIP] Only testing cross-group denial for team_member")
         return
 
-    user_gids = set(data["user_groups"].get(user_id, []))
-    other_rock = None
-    for r in data["rocks"]:
-        if r["group_id"] not in user_gids:
-            other_rock = r
-            break
-
-    quarter = data["quarters"][0] if data["quarters"] else None
+    other_rock = data.foreign_rock(user_id)
+    quarter = data.sample_quarter
     if other_rock and quarter:
         resp = client.rpc("roll_forward_rock", {
-            "p_rock_id": other_rock["id"],
-            "p_new_quarter_id": quarter["id"],
+            "p_rock_id": other_rock.id,
+            "p_new_quarter_id": quarter.id,
         })
         assert_status("roll_forward_rock other group BLOCKED", resp, [400, 403, 500])
     else:
-        print("  [SKIP] No cross-group rock found to test")
+        current_result().log("  [SKIP] No cross-group rock found to test")
 
 
-def test_rpc_promote_rock_idea(client: SupabaseClient, role: str, user_id: str, data: dict):
+def test_rpc_promote_rock_idea(client: SupabaseClient, role: str, user_id: str, data: Fixtures):
     """Test promote_rock_idea RPC authorization."""
-    print(f"\n--- RPC: promote_rock_idea ({role}) ---")
+    current_result().log(f"\n--- RPC: promote_rock_idea ({role}) ---")
 
     if role != "team_member":
-        print("  [SKIP] Only testing cross-group denial for team_member")
+        current_result().log("  [SKIP] Only testing cross-group denial for team_member")
         return
 
-    user_gids = set(data["user_groups"].get(user_id, []))
-    other_idea = None
-    for ri in data.get("rock_ideas", []):
-        if ri["group_id"] not in user_gids:
-            other_idea = ri
-            break
-
-    quarter = data["quarters"][0] if data["quarters"] else None
+    other_idea = data.foreign_idea(user_id)
+    quarter = data.sample_quarter
     if other_idea and quarter:
         resp = client.rpc("promote_rock_idea", {
-            "p_idea_id": other_idea["id"],
-            "p_quarter_id": quarter["id"],
+            "p_idea_id": other_idea.id,
+            "p_quarter_id": quarter.id,
             "p_owner_id": user_id,
         })
         assert_status("promote_rock_idea other group BLOCKED", resp, [400, 403, 500])
     else:
-        print("  [SKIP] No cross-group rock idea found to test")
+        current_result().log("  [SKIP] No cross-group rock idea found to test")
 
 
 # -- Main --
 
-def run_tests_for_role(role: str, user: dict, data: dict):
-    """Run all test suites for a given role."""
+# (suite, exclusive) -- exclusive suites make writes that other roles can
+# observe (role changes, new groups/rocks/quarters), so the parallel
+# executor runs them serially after every read-only suite has finished.
+SUITES = [
+    (test_profiles, True),
+    (test_groups, True),
+    (test_rocks, True),
+    (test_issues, False),
+    (test_focus, False),
+    (test_meetings, False),
+    (test_quarters, True),
+    (test_child_tables, False),
+    (test_rpc_start_new_week, False),
+    (test_rpc_roll_forward_rock, False),
+    (test_rpc_promote_rock_idea, False),
+]
+
+# What each suite exercises, in impact.py terms (table or "rpc:<function>")
+SUITE_TARGETS = {
+    test_profiles: {"profiles"},
+    test_groups: {"groups"},
+    test_rocks: {"rocks"},
+    test_issues: {"issues"},
+    test_focus: {"focus_snapshots"},
+    test_meetings: {"meetings"},
+    test_quarters: {"quarters"},
+    test_child_tables: {table for tree in EMBED_TREES for table in tree.tables()},
+    test_rpc_start_new_week: {"rpc:start_new_week"},
+    test_rpc_roll_forward_rock: {"rpc:roll_forward_rock"},
+    test_rpc_promote_rock_idea: {"rpc:promote_rock_idea"},
+}
+
+
+def cache_key(suite, role: str, user_id: str, data: Fixtures) -> str | None:
+    if result_cache is None or suite not in suite_schema:
+        return None
+    return fingerprint(SUPABASE_URL, suite.__name__, role, user_id, leak_check_mode,
+                       suite_schema[suite], data.digest)
+
+
+def run_suite(suite, client: SupabaseClient, role: str, user_id: str, data: Fixtures):
+    """Run one suite into the current shard, or replay its cached passes."""
+    shard = current_result()
+    key = cache_key(suite, role, user_id, data)
+    cached = result_cache.get(key) if key else None
+    if cached is not None:
+        shard.log(f"\n--- {suite.__name__.removeprefix('test_')} ({role}, cached) ---")
+        shard.replay(cached)
+        return
+    start = len(shard.records)
+    try:
+        with trace_context(role=role, suite=suite.__name__):
+            suite(client, role, user_id, data)
+    finally:
+        fixtures.apply_reverts()
+    if key and all(r.passed for r in shard.records[start:]):
+        result_cache.put(key, [r.as_dict() for r in shard.records[start:]])
+
+
+def print_role_header(role: str, user: Profile, data: Fixtures):
     print(f"\n{'='*50}")
-    print(f"Testing as: {user['email']} ({role})")
-    print(f"Groups: {data['user_groups'].get(user['id'], [])}")
+    print(f"Testing as: {user.email} ({role})")
+    print(f"Groups: {data.user_groups.get(user.id, [])}")
     print(f"{'='*50}")
 
-    session = get_user_token(user["email"])
-    client = SupabaseClient(session["access_token"])
 
-    data["_original_name"] = user["full_name"]
+def run_tests_for_role(role: str, user: Profile, data: Fixtures):
+    """Run all test suites for a given role."""
+    print_role_header(role, user, data)
+
+    session = get_user_token(user.email)
+    client = SupabaseClient(session["access_token"])
 
-    test_profiles(client, role, user["id"], data)
-    test_groups(client, role, user["id"], data)
-    test_rocks(client, role, user["id"], data)
-    test_issues(client, role, user["id"], data)
-    test_focus(client, role, user["id"], data)
-    test_meetings(client, role, user["id"], data)
-    test_quarters(client, role, user["id"], data)
-    test_rpc_start_new_week(client, role, user["id"], data)
-    test_rpc_roll_forward_rock(client, role, user["id"], data)
-    test_rpc_promote_rock_idea(client, role, user["id"], data)
+    _local.result = results.shard(role, echo=True)
+    try:
+        for suite, _ in SUITES:
+            run_suite(suite, client, role, user.id, data)
+    finally:
+        results.merge(_local.result)
+        del _local.result
+
+
+def run_shard(suite, client: SupabaseClient, role: str, user_id: str, data: Fixtures) -> ResultShard:
+    """Run one suite into its own buffered shard."""
+    shard = results.shard(role)
+    _local.result = shard
+    try:
+        run_suite(suite, client, role, user_id, data)
+    finally:
+        del _local.result
+    return shard
+
+
+def run_parallel(roles: list[tuple[str, Profile]], data: Fixtures, workers: int):
+    """Run roles and their read-only suites concurrently.
+
+    Logins and non-exclusive suites fan out over a thread pool; exclusive
+    suites then run one at a time in role order. Every suite records into
+    its own ResultShard, and shards are merged in the serial (role, suite)
+    order, so output and totals match a --workers 1 run.
+    """
+    shards = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        sessions = list(pool.map(lambda ru: get_user_token(ru[1].email), roles))
+        clients = {role: SupabaseClient(s["access_token"]) for (role, _), s in zip(roles, sessions)}
+
+        futures = {}
+        for role, user in roles:
+            for suite, exclusive in SUITES:
+                if not exclusive:
+                    futures[(role, suite)] = pool.submit(
+                        run_shard, suite, clients[role], role, user.id, data)
+        for key, future in futures.items():
+            shards[key] = future.result()
+
+    for role, user in roles:
+        for suite, exclusive in SUITES:
+            if exclusive:
+                shards[(role, suite)] = run_shard(
+                    suite, clients[role], role, user.id, data)
+
+    for role, user in roles:
+        print_role_header(role, user, data)
+        for suite, _ in SUITES:
+            results.merge(shards[(role, suite)])
+
+
+def positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be > 0, got {value}")
+    return number
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="RLS security test runner")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent roles/suites (default: 1, fully serial)")
+    parser.add_argument("--bench", action="store_true",
+                        help="benchmark per-table/per-role policy latency instead of testing")
+    parser.add_argument("--bench-iterations", type=int, default=50)
+    parser.add_argument("--bench-warmup", type=int, default=5)
+    parser.add_argument("--bench-concurrency", type=int, default=1)
+    parser.add_argument("--bench-out", help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", metavar="PATH", default=BASELINE_FILE,
+                        help="record the --bench run in this store and fail on regressions against "
+                             "its rolling baseline (default: $RLS_BASELINE; baseline.py)")
+    parser.add_argument("--load", action="store_true",
+                        help="replay a weighted per-role operation mix at a fixed rate instead of testing")
+    parser.add_argument("--load-rps", type=positive_float, default=20.0)
+    parser.add_argument("--load-duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--load-mix", help="op=weight,... applied to every role (default: per-role mix)")
+    parser.add_argument("--load-workers", type=int, default=16, help="max requests in flight")
+    parser.add_argument("--load-interval", type=positive_float, default=5.0, help="seconds per timeline bucket")
+    parser.add_argument("--load-seed", type=int, default=0)
+    parser.add_argument("--load-out", help="write the JSON report here")
+    parser.add_argument("--leak-check", choices=LEAK_CHECK_MODES, default="filter",
+                        help="cross-group isolation checks: server-side not.in filter (default), "
+                             "HEAD count, or client-side streaming")
+    parser.add_argument("--matrix", action="store_true",
+                        help="also check the declarative table x role policy matrix (policy_matrix.py)")
+    parser.add_argument("--sweep", action="store_true",
+                        help="delete rows tagged by earlier (e.g. crashed) runs, then exit")
+    parser.add_argument("--changed-since", metavar="REF",
+                        help="run only suites/matrix cells affected by policy SQL changes since git REF (impact.py)")
+    parser.add_argument("--result-cache", metavar="PATH", default=RESULT_CACHE_FILE,
+                        help="replay passing read-only suites whose policies and fixtures are unchanged "
+                             "(default: $RLS_RESULT_CACHE; result_cache.py)")
+    parser.add_argument("--snapshot-rpc", action="store_true",
+                        help="discover fixtures with one rls_fixture_snapshot() call "
+                             "(scripts/rls-fixture-snapshot.sql)")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="record every request: Chrome trace for .json, JSON lines otherwise (tracing.py)")
+    parser.add_argument("--explain-slowest", type=int, default=0, metavar="N",
+                        help="EXPLAIN ANALYZE the N slowest reads at the end via rls_explain() "
+                             "(scripts/rls-explain.sql)")
+    return parser.parse_args(argv)
 
 
 def main():
+    global leak_check_mode, SUITES, result_cache
+    args = parse_args()
+    leak_check_mode = args.leak_check
+
     print("RLS Security Tests")
     print("=" * 50)
 
-    data = discover_test_data()
-
-    from config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
-    data["_service_key"] = SUPABASE_SERVICE_ROLE_KEY
-    data["_supabase_url"] = SUPABASE_URL
+    targets = None
+    if args.changed_since:
+        import impact
+        targets, changed = impact.impact(args.changed_since)
+        print(f"Changed since {args.changed_since}: "
+              f"{', '.join(impact.describe(k) for k in sorted(changed)) or 'no policy objects'}")
+        if targets is impact.EVERYTHING:
+            print("Running everything (test harness changed or ref unreadable)")
+        else:
+            SUITES = [(suite, exclusive) for suite, exclusive in SUITES if SUITE_TARGETS[suite] & targets]
+            print(f"Affected: {', '.join(sorted(targets)) or 'nothing'}")
+            if not SUITES and not args.matrix:
+                print("No affected suites; nothing to run.")
+                sys.exit(0)
+
+    concurrency = max(args.workers, args.bench_concurrency if args.bench else 1,
+                      args.load_workers if args.load else 1)
+    if concurrency > HTTP_POOL_SIZE:
+        configure_pool(pool_size=concurrency)
+
+    if RLS_BACKEND == "local":
+        import local_stack
+        if local_stack.ensure_running(SUPABASE_URL):
+            print(f"Started local Supabase stand-in at {SUPABASE_URL}")
+
+    if args.sweep:
+        for table, status in sweep().items():
+            print(f"  swept {table}: {status}")
+        sys.exit(0)
+
+    if args.trace or args.explain_slowest:
+        atexit.register(RunTrace(args.trace, args.explain_slowest).close)
+
+    data = discover_test_data(args.snapshot_rpc)
+
+    if args.result_cache:
+        objects, source = schema_objects()
+        if objects is None:
+            print(f"\n  Result cache: off, the live policies cannot be read: {source}")
+        else:
+            result_cache = ResultCache(SUPABASE_URL, args.result_cache, RESULT_CACHE_SIZE)
+            harness = harness_digest()
+            for suite, exclusive in SUITES:
+                if not exclusive:
+                    suite_schema[suite] = (harness, schema_fingerprint(objects, SUITE_TARGETS[suite]))
+            print(f"\n  Result cache: {len(result_cache.entries)} entries, "
+                  f"{len(objects)} policy objects from the {source}")
 
     roles_to_test = ["team_member", "system_admin"]
 
-    exec_user = find_user_by_role(data["profiles"], "executive")
+    exec_user = data.first_user("executive")
     if exec_user:
         roles_to_test.insert(1, "executive")
 
+    roles = []
     for role in roles_to_test:
-        user = find_user_by_role(data["profiles"], role)
+        user = data.first_user(role)
         if not user:
             print(f"\n[SKIP] No user with role '{role}' found. "
                   f"Create one in admin panel or Supabase dashboard.")
             continue
-        run_tests_for_role(role, user, data)
-
-    all_passed = results.summary()
+        roles.append((role, user))
+
+    if args.bench:
+        import bench
+        clients = {role: SupabaseClient(get_user_token(user.email)["access_token"]) for role, user in roles}
+        report = bench.run_bench(clients, roles, data, args.bench_iterations, args.bench_warmup,
+                                 args.bench_concurrency)
+        bench.print_report(report)
+        bench.write_report(report, args.bench_out)
+        if args.baseline:
+            import baseline
+            objects, _ = schema_objects()
+            schema = baseline.schema_key(objects) if objects is not None else baseline.sql_schema_fingerprint()
+            run = baseline.report_run(report, schema)
+            verdict = baseline.gate(baseline.BaselineStore(args.baseline), run)
+            baseline.print_verdict(verdict)
+            sys.exit(1 if verdict["regressions"] else 0)
+        sys.exit(0)
+
+    if args.load:
+        import loadgen
+        mix = loadgen.parse_mix(args.load_mix) if args.load_mix else None
+        clients = {role: SupabaseClient(get_user_token(user.email)["access_token"]) for role, user in roles}
+        print(f"\nLoad: {args.load_rps} rps for {args.load_duration}s across {len(roles)} roles")
+        report = loadgen.run_load(clients, roles, data, args.load_rps, args.load_duration, mix,
+                                  args.load_workers, args.load_interval, args.load_seed)
+        loadgen.print_report(report)
+        if args.load_out:
+            loadgen.write_report(report, args.load_out)
+        sys.exit(0 if report["overall"]["errors"] == 0 else 1)
+
+    try:
+        if SUITES and args.workers > 1:
+            run_parallel(roles, data, args.workers)
+        elif SUITES:
+            for role, user in roles:
+                run_tests_for_role(role, user, data)
+
+        if args.matrix:
+            import policy_matrix
+            clients = {role: SupabaseClient(get_user_token(user.email)["access_token"]) for role, user in roles}
+            policy_matrix.run_matrix(clients, roles, data, results, max(args.workers, 8), fixtures=fixtures,
+                                     tables=targets)
+    finally:
+        teardown_ok = True
+        try:
+            removed = fixtures.teardown()
+            print(f"\nTeardown: removed {removed} rows tagged {fixtures.run_id}")
+        except TeardownError as e:
+            teardown_ok = False
+            print(f"\nTeardown FAILED: {e}\n  remove the leftovers with: python run_rls_tests.py --sweep")
+        if result_cache is not None:
+            result_cache.save()
+
+    all_passed = results.summary() and teardown_ok
+    stats = get_pool().stats.snapshot()
+    print(f"HTTP: {stats['requests']} requests, {stats['opened']} connections opened, "
+          f"{stats['reused']} reused")
+    tokens = token_cache.stats()
+    print(f"Auth: {tokens['hits']} cached sessions, {tokens['refreshes']} refreshed, "
+          f"{tokens['logins']} magic-link logins")
+    embed = embed_savings()
+    if embed["requests"]:
+        print(f"Embedded: {embed['requests']} requests covered {embed['separate']} table reads "
+              f"({embed['saved']} requests saved)")
+    if result_cache is not None:
+        cached = result_cache.stats()
+        print(f"Result cache: {cached['hits']} suites replayed, {cached['misses']} re-run, "
+              f"{cached['stored']} stored")
     sys.exit(0 if all_passed else 1)
 
 
@@ -3,13 +3,65 @@ Supabase REST Client for RLS Testing
 =====================================
 Authenticates as different users via generate_link and provides
 a REST client that mirrors how the app calls PostgREST.
+
+All requests go through the shared keep-alive pool in http_pool.py, and
+sessions are reused across calls (and runs) through token_cache.py.
+
+stream() and admin_stream() read a table page by page (RowStream) instead
+of materialising the whole result, so checks can stop at the first row
+that answers them.
+
+AsyncSupabaseClient is the same client on asyncio (aiohttp), for checks
+that want hundreds of requests in flight at once:
+
+    async with AsyncHttpPool() as pool:
+        session = await async_get_user_token(email, pool)
+        client = AsyncSupabaseClient(session["access_token"], pool)
+        responses = await asyncio.gather(*(client.select(t, "id") for t in tables))
 """
 
 import requests
-from config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_ANON_KEY
+from config import (
+    SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, SUPABASE_ANON_KEY,
+    TOKEN_CACHE_FILE, TOKEN_REFRESH_MARGIN, PAGE_SIZE, RLS_BACKEND,
+)
+from http_pool import HttpPool, AsyncHttpPool, AsyncResponse, get_pool, get_async_pool
+from pgrest_sql import parse_select
+from token_cache import TokenCache
+
+token_cache = TokenCache(SUPABASE_URL, TOKEN_CACHE_FILE, TOKEN_REFRESH_MARGIN)
+
+ADMIN_HEADERS = {
+    "apikey": SUPABASE_SERVICE_ROLE_KEY,
+    "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    "Content-Type": "application/json",
+}
 
 
 def get_user_token(email: str) -> dict:
+    """
+    Return session tokens for email, reusing or refreshing a cached session.
+    Returns dict with {access_token, refresh_token, user}.
+    With RLS_BACKEND=postgres the token is minted locally (pg_backend.session).
+    """
+    if RLS_BACKEND == "postgres":
+        import pg_backend
+        return pg_backend.session(email)
+    return token_cache.get(email, magic_link_session, refresh_session)
+
+
+def refresh_session(refresh_token: str) -> dict:
+    """Exchange a refresh token for a new session (refresh_token grant)."""
+    resp = get_pool().post(
+        f"{SUPABASE_URL}/auth/v1/token?grant_type=refresh_token",
+        headers={"apikey": SUPABASE_ANON_KEY, "Content-Type": "application/json"},
+        json={"refresh_token": refresh_token},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def magic_link_session(email: str) -> dict:
     """
     Generate magic link + verify to get session tokens.
     Returns dict with {access_token, refresh_token, user}.
@@ -20,8 +72,10 @@ def get_user_token(email: str) -> dict:
         "Content-Type": "application/json",
     }
 
+    http = get_pool()
+
     # Generate magic link
-    resp = requests.post(
+    resp = http.post(
         f"{SUPABASE_URL}/auth/v1/admin/generate_link",
         headers=admin_headers,
         json={"type": "magiclink", "email": email},
@@ -30,7 +84,7 @@ def get_user_token(email: str) -> dict:
     hashed_token = resp.json()["hashed_token"]
 
     # Verify to get session
-    resp = requests.post(
+    resp = http.post(
         f"{SUPABASE_URL}/auth/v1/verify",
         headers={"apikey": SUPABASE_SERVICE_ROLE_KEY, "Content-Type": "application/json"},
         json={"type": "magiclink", "token_hash": hashed_token},
@@ -39,53 +93,228 @@ def get_user_token(email: str) -> dict:
     return resp.json()
 
 
+def select_url(base: str, table: str, select: str = "*", params: dict = None) -> str:
+    url = f"{base}/{table}?select={select}"
+    if params:
+        for k, v in params.items():
+            url += f"&{k}={v}"
+    return url
+
+
+def match_url(base: str, table: str, match: dict) -> str:
+    url = f"{base}/{table}"
+    for k, v in match.items():
+        url += f"?{k}=eq.{v}"
+    return url
+
+
+class RowStream:
+    """
+    Rows of a SELECT, fetched one page at a time as they are iterated.
+
+    Keyset paging (the default) orders by `key` and asks each following
+    page for `key=gt.<last key seen>`, which stays cheap however deep the
+    table is. With key=None (or when the caller passes its own `order`)
+    pages are requested with the Range header instead. Nothing is sent
+    until the stream is iterated or its status is read; a consumer that
+    stops early never fetches the remaining pages.
+    """
+
+    def __init__(self, get, url: str, headers: dict, page_size: int = PAGE_SIZE, key: str = "id"):
+        self._get = get
+        self.url = url
+        self.headers = headers
+        self.page_size = page_size
+        self.key = key
+        self.pages = 0
+        self._first = None
+
+    def _fetch(self, after=None, offset: int = 0):
+        self.pages += 1
+        if self.key:
+            url = f"{self.url}&order={self.key}.asc&limit={self.page_size}"
+            if after is not None:
+                url += f"&{self.key}=gt.{after}"
+            return self._get(url, headers=self.headers)
+        headers = dict(self.headers, **{"Range-Unit": "items",
+                                        "Range": f"{offset}-{offset + self.page_size - 1}"})
+        return self._get(self.url, headers=headers)
+
+    @property
+    def resp(self):
+        """Response for the first page (fetched on first access)."""
+        if self._first is None:
+            self._first = self._fetch()
+        return self._first
+
+    @property
+    def status_code(self) -> int:
+        return self.resp.status_code
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code in (200, 206)
+
+    def __iter__(self):
+        resp, offset = self.resp, 0
+        while True:
+            if resp.status_code not in (200, 206):
+                # A failed later page must not look like the end of the table
+                resp.raise_for_status()
+                return
+            page = resp.json()
+            yield from page
+            if len(page) < self.page_size:
+                return
+            offset += len(page)
+            resp = self._fetch(page[-1][self.key] if self.key else None, offset)
+
+    def first(self) -> dict | None:
+        return next(iter(self), None)
+
+
+def stream_url(url: str, select: str, key: str | None, has_order: bool) -> tuple[str, str | None]:
+    """Make sure keyset paging can see its key column; fall back to Range paging under a custom order."""
+    if has_order:
+        return url, None
+    columns = [name for name, embedded in parse_select(select) or [] if embedded is None]
+    if key and "*" not in columns and key not in columns:
+        url = url.replace(f"select={select}", f"select={select},{key}", 1)
+    return url, key
+
+
+def content_range_total(resp) -> int | None:
+    """Total from 'Content-Range: 0-24/318' (needs Prefer: count=exact); None when not counted."""
+    total = resp.headers.get("Content-Range", "").rpartition("/")[2]
+    return int(total) if total.isdigit() else None
+
+
+def user_headers(access_token: str) -> dict:
+    return {
+        "apikey": SUPABASE_ANON_KEY,
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
+        "Prefer": "return=representation",
+    }
+
+
 class SupabaseClient:
     """REST client that calls PostgREST with a user's JWT (same path as the app)."""
 
-    def __init__(self, access_token: str):
-        self.headers = {
-            "apikey": SUPABASE_ANON_KEY,
-            "Authorization": f"Bearer {access_token}",
-            "Content-Type": "application/json",
-            "Prefer": "return=representation",
-        }
+    def __init__(self, access_token: str, pool: HttpPool = None):
+        self.http = pool or get_pool()
+        self.headers = user_headers(access_token)
         self.base = f"{SUPABASE_URL}/rest/v1"
 
     def select(self, table: str, select: str = "*", params: dict = None) -> requests.Response:
-        """GET request (SELECT). Returns raw Response for status code inspection."""
-        url = f"{self.base}/{table}?select={select}"
-        if params:
-            for k, v in params.items():
-                url += f"&{k}={v}"
-        return requests.get(url, headers=self.headers)
+        """
+        GET request (SELECT). Returns raw Response for status code inspection.
+
+        `select` may embed related tables (PostgREST resource embedding),
+        e.g. "id,group_id,milestones(id,rock_id)"; each embedded table is
+        filtered by its own policies.
+        """
+        return self.http.get(select_url(self.base, table, select, params), headers=self.headers)
+
+    def stream(self, table: str, select: str = "*", params: dict = None,
+               page_size: int = PAGE_SIZE, key: str = "id") -> RowStream:
+        """Paged SELECT: a RowStream yielding rows as pages arrive."""
+        url, key = stream_url(select_url(self.base, table, select, params), select, key,
+                              bool(params and "order" in params))
+        return RowStream(self.http.get, url, self.headers, page_size, key)
+
+    def count(self, table: str, params: dict = None) -> requests.Response:
+        """HEAD with Prefer: count=exact; the row count is in Content-Range (content_range_total)."""
+        headers = dict(self.headers, Prefer="count=exact")
+        return self.http.head(select_url(self.base, table, "id", params), headers=headers)
 
     def insert(self, table: str, data: dict) -> requests.Response:
         """POST request (INSERT)."""
-        return requests.post(f"{self.base}/{table}", headers=self.headers, json=data)
+        return self.http.post(f"{self.base}/{table}", headers=self.headers, json=data)
 
     def update(self, table: str, data: dict, match: dict) -> requests.Response:
         """PATCH request (UPDATE)."""
-        url = f"{self.base}/{table}"
-        for k, v in match.items():
-            url += f"?{k}=eq.{v}"
-        return requests.patch(url, headers=self.headers, json=data)
+        return self.http.patch(match_url(self.base, table, match), headers=self.headers, json=data)
 
     def delete(self, table: str, match: dict) -> requests.Response:
         """DELETE request."""
-        url = f"{self.base}/{table}"
-        for k, v in match.items():
-            url += f"?{k}=eq.{v}"
-        return requests.delete(url, headers=self.headers)
+        return self.http.delete(match_url(self.base, table, match), headers=self.headers)
 
     def rpc(self, function_name: str, params: dict) -> requests.Response:
         """POST to /rpc/ endpoint."""
-        return requests.post(
+        return self.http.post(
             f"{self.base}/rpc/{function_name}",
             headers=self.headers,
             json=params,
         )
 
 
+class AsyncSupabaseClient:
+    """SupabaseClient on asyncio: same requests, awaited, over an AsyncHttpPool."""
+
+    def __init__(self, access_token: str, pool: AsyncHttpPool = None):
+        self.http = pool or get_async_pool()
+        self.headers = user_headers(access_token)
+        self.base = f"{SUPABASE_URL}/rest/v1"
+
+    async def select(self, table: str, select: str = "*", params: dict = None) -> AsyncResponse:
+        """GET request (SELECT)."""
+        return await self.http.get(select_url(self.base, table, select, params), headers=self.headers)
+
+    async def insert(self, table: str, data: dict) -> AsyncResponse:
+        """POST request (INSERT)."""
+        return await self.http.post(f"{self.base}/{table}", headers=self.headers, json=data)
+
+    async def update(self, table: str, data: dict, match: dict) -> AsyncResponse:
+        """PATCH request (UPDATE)."""
+        return await self.http.patch(match_url(self.base, table, match), headers=self.headers, json=data)
+
+    async def delete(self, table: str, match: dict) -> AsyncResponse:
+        """DELETE request."""
+        return await self.http.delete(match_url(self.base, table, match), headers=self.headers)
+
+    async def rpc(self, function_name: str, params: dict) -> AsyncResponse:
+        """POST to /rpc/ endpoint."""
+        return await self.http.post(f"{self.base}/rpc/{function_name}", headers=self.headers, json=params)
+
+
+async def async_refresh_session(refresh_token: str, pool: AsyncHttpPool = None) -> dict:
+    http = pool or get_async_pool()
+    resp = await http.post(
+        f"{SUPABASE_URL}/auth/v1/token?grant_type=refresh_token",
+        headers={"apikey": SUPABASE_ANON_KEY, "Content-Type": "application/json"},
+        json={"refresh_token": refresh_token},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def async_magic_link_session(email: str, pool: AsyncHttpPool = None) -> dict:
+    http = pool or get_async_pool()
+    resp = await http.post(
+        f"{SUPABASE_URL}/auth/v1/admin/generate_link",
+        headers=ADMIN_HEADERS,
+        json={"type": "magiclink", "email": email},
+    )
+    resp.raise_for_status()
+    resp = await http.post(
+        f"{SUPABASE_URL}/auth/v1/verify",
+        headers={"apikey": SUPABASE_SERVICE_ROLE_KEY, "Content-Type": "application/json"},
+        json={"type": "magiclink", "token_hash": resp.json()["hashed_token"]},
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+async def async_get_user_token(email: str, pool: AsyncHttpPool = None) -> dict:
+    """get_user_token() for asyncio; shares the same token cache."""
+    return await token_cache.aget(
+        email,
+        lambda e: async_magic_link_session(e, pool),
+        lambda t: async_refresh_session(t, pool),
+    )
+
+
 def admin_query(table: str, select: str = "*", params: str = "") -> list:
     """Query using service role key (bypasses RLS)."""
     headers = {
@@ -95,7 +324,43 @@ def admin_query(table: str, select: str = "*", params: str = "") -> list:
     url = f"{SUPABASE_URL}/rest/v1/{table}?select={select}"
     if params:
         url += f"&{params}"
-    resp = requests.get(url, headers=headers)
+    resp = get_pool().get(url, headers=headers)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def admin_stream(table: str, select: str = "*", params: str = "",
+                 page_size: int = PAGE_SIZE, key: str = "id") -> RowStream:
+    """Paged admin_query(): a RowStream over the service-role view of the table."""
+    headers = {
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    }
+    url = f"{SUPABASE_URL}/rest/v1/{table}?select={select}"
+    if params:
+        url += f"&{params}"
+    url, key = stream_url(url, select, key, "order=" in params)
+    return RowStream(get_pool().get, url, headers, page_size, key)
+
+
+async def async_admin_query(table: str, select: str = "*", params: str = "", pool: AsyncHttpPool = None) -> list:
+    """admin_query() for asyncio."""
+    url = f"{SUPABASE_URL}/rest/v1/{table}?select={select}"
+    if params:
+        url += f"&{params}"
+    resp = await (pool or get_async_pool()).get(url, headers=ADMIN_HEADERS)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def admin_rpc(function_name: str, params: dict = None):
+    """Call an RPC with the service role key (bypasses RLS)."""
+    headers = {
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+        "Content-Type": "application/json",
+    }
+    resp = get_pool().post(f"{SUPABASE_URL}/rest/v1/rpc/{function_name}", headers=headers, json=params or {})
     resp.raise_for_status()
     return resp.json()
 
@@ -111,4 +376,38 @@ def admin_update(table: str, data: dict, match: dict) -> requests.Response:
     url = f"{SUPABASE_URL}/rest/v1/{table}"
     for k, v in match.items():
         url += f"?{k}=eq.{v}"
-    return requests.patch(url, headers=headers, json=data)
+    return get_pool().patch(url, headers=headers, json=data)
+
+
+async def async_admin_update(table: str, data: dict, match: dict, pool: AsyncHttpPool = None) -> AsyncResponse:
+    """admin_update() for asyncio."""
+    headers = dict(ADMIN_HEADERS, Prefer="return=representation")
+    return await (pool or get_async_pool()).patch(
+        match_url(f"{SUPABASE_URL}/rest/v1", table, match), headers=headers, json=data)
+
+
+def admin_delete(table: str, match: dict) -> requests.Response:
+    """Delete using service role key (bypasses RLS). For test teardown."""
+    headers = {
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    }
+    url = f"{SUPABASE_URL}/rest/v1/{table}"
+    for k, v in match.items():
+        url += f"?{k}=eq.{v}"
+    return get_pool().delete(url, headers=headers)
+
+
+def admin_delete_where(table: str, filters: str, returning: bool = False) -> requests.Response:
+    """
+    Delete every row matching raw PostgREST filters (bypasses RLS), e.g. 'id=in.(a,b)'.
+    returning=True asks for the deleted ids back (200 with [{"id": ...}]).
+    """
+    headers = {
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    }
+    if returning:
+        headers["Prefer"] = "return=representation"
+        filters = f"{filters}&select=id"
+    return get_pool().delete(f"{SUPABASE_URL}/rest/v1/{table}?{filters}", headers=headers)
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Synthetic Tenant Generator
+==========================
+Bulk-loads a large, deterministic tenant into a local Postgres (PG_DSN) so
+the RLS suite and benchmarks can run against 10x, 100x or 1000x the demo
+data (scripts/seed-demo-data.sql) and show how user_group_ids(),
+scorecard_measure_group() and is_group_lead_or_exec() scale.
+
+Every table is loaded with COPY in one transaction; nothing goes through
+PostgREST. Ids and values come from random.Random(seed), so the same
+parameters and seed always produce the same rows. Generated rows are
+tagged (groups.description, the users' email domain and the quarter
+labels) and the previous generated tenant is removed before a new one is
+loaded, so the generator can be re-run at a different size in place.
+
+Loaded: auth users (handle_new_user creates their profiles), groups,
+memberships, quarters, rocks per user per quarter with milestones, weekly
+focus snapshots with items, and, when scripts/scorecard-schema.sql is
+applied, a scorecard per group with goals and weekly entries per member.
+
+    python tenant_gen.py --scale 100                 # 100x the demo tenant
+    python tenant_gen.py --users 2000 --groups 200 --memberships-per-user 3 --seed 7
+    python tenant_gen.py --scale 10 --attach 5       # also put existing users in 5 generated groups
+    python tenant_gen.py --drop                      # remove the generated tenant
+
+The runner, --bench and rpc_bench.py then run against the larger tenant.
+
+Prerequisites:
+    pip install "psycopg[binary]"
+"""
+
+import argparse
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from config import PG_DSN
+
+GEN_TAG = "rls-tenant-gen"               # groups.description of generated groups
+GEN_EMAIL_DOMAIN = "tenant-gen.invalid"
+GEN_QUARTER_PREFIX = "[gen] "            # quarters.label prefix
+
+FIRST_QUARTER = date(2300, 1, 1)         # far future: clear of real and bench data
+FOCUS_PRIORITIES = ["P1", "P2", "P3", "P4"]
+PIPELINE_STATUSES = ["Prospecting", "Submitted proposal", "Negotiation", "Activated", None]
+MEASURE_TYPES = ["count", "currency", "percentage", "decimal"]
+
+
+class TenantSpec:
+    """Size of a generated tenant. The defaults are the demo tenant."""
+
+    __slots__ = ("users", "groups", "memberships_per_user", "quarters", "rocks_per_quarter",
+                 "milestones_per_rock", "focus_weeks", "focus_items", "measures_per_group",
+                 "scorecard_weeks")
+
+    def __init__(self, users: int = 5, groups: int = 1, memberships_per_user: int = 1, quarters: int = 2,
+                 rocks_per_quarter: int = 2, milestones_per_rock: int = 3, focus_weeks: int = 2,
+                 focus_items: int = 8, measures_per_group: int = 10, scorecard_weeks: int = 13):
+        self.users = users
+        self.groups = groups
+        self.memberships_per_user = min(memberships_per_user, groups)
+        self.quarters = quarters
+        self.rocks_per_quarter = rocks_per_quarter     # per user
+        self.milestones_per_rock = milestones_per_rock
+        self.focus_weeks = focus_weeks
+        self.focus_items = focus_items                 # per snapshot
+        self.measures_per_group = measures_per_group
+        self.scorecard_weeks = scorecard_weeks         # entries per measure per member
+
+    def scaled(self, factor: int) -> "TenantSpec":
+        """Same per-user volumes with `factor` times the users and groups."""
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values["users"] *= factor
+        values["groups"] *= factor
+        return TenantSpec(**values)
+
+    def as_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Generator:
+    """Deterministic rows for one spec and seed, table by table."""
+
+    def __init__(self, spec: TenantSpec, seed: int = 0):
+        self.spec = spec
+        self.rng = random.Random(seed)
+
+    def uid(self) -> str:
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def build(self, scorecard: bool = True) -> dict:
+        """-> {table: (columns, rows)} in load order (parents first)."""
+        spec, rng = self.spec, self.rng
+        out = {}
+
+        group_ids = [self.uid() for _ in range(spec.groups)]
+        out["groups"] = (("id", "name", "description", "meeting_cadence"), [
+            (gid, f"Gen Group {n + 1}", GEN_TAG, "weekly") for n, gid in enumerate(group_ids)
+        ])
+
+        user_ids = [self.uid() for _ in range(spec.users)]
+        out["auth.users"] = (("id", "aud", "role", "email", "raw_user_meta_data"), [
+            (uid, "authenticated", "authenticated", f"gen-{n + 1}@{GEN_EMAIL_DOMAIN}",
+             f'{{"full_name": "Gen User {n + 1}"}}')
+            for n, uid in enumerate(user_ids)
+        ])
+
+        # Primary group round-robin so every group has members, extra ones at random
+        members = {gid: [] for gid in group_ids}
+        membership_rows = []
+        for n, uid in enumerate(user_ids):
+            primary = group_ids[n % spec.groups]
+            extra = rng.sample([g for g in group_ids if g != primary], spec.memberships_per_user - 1)
+            for gid in [primary] + extra:
+                role_in_group = "admin" if not members[gid] else "member"
+                members[gid].append(uid)
+                membership_rows.append((self.uid(), gid, uid, role_in_group))
+        out["group_members"] = (("id", "group_id", "user_id", "role_in_group"), membership_rows)
+        self.members = members
+        self.user_ids = user_ids
+        self.group_ids = group_ids
+
+        quarter_ids = [self.uid() for _ in range(spec.quarters)]
+        quarter_starts = [_add_months(FIRST_QUARTER, 3 * q) for q in range(spec.quarters)]
+        out["quarters"] = (("id", "label", "start_date", "end_date", "is_current"), [
+            (qid, f"{GEN_QUARTER_PREFIX}Q{q % 4 + 1} {start.year}", start,
+             _add_months(start, 3) - timedelta(days=1), False)
+            for q, (qid, start) in enumerate(zip(quarter_ids, quarter_starts))
+        ])
+
+        rocks, milestones = [], []
+        for gid in group_ids:
+            for uid in members[gid]:
+                for qid in quarter_ids:
+                    for r in range(spec.rocks_per_quarter):
+                        rid = self.uid()
+                        rocks.append((rid, f"Gen rock {r + 1}", uid, gid, qid,
+                                      rng.choice(["on_track", "off_track"])))
+                        milestones.extend(
+                            (self.uid(), rid, f"Gen milestone {m + 1}",
+                             rng.choice(["not_started", "wip", "done", "delayed"]), m)
+                            for m in range(spec.milestones_per_rock))
+        out["rocks"] = (("id", "title", "owner_id", "group_id", "quarter_id", "status"), rocks)
+        out["milestones"] = (("id", "rock_id", "title", "status", "sort_order"), milestones)
+
+        snapshots, items = [], []
+        last_week = quarter_starts[-1] if quarter_starts else FIRST_QUARTER
+        last_week -= timedelta(days=last_week.weekday())  # Monday
+        for gid in group_ids:
+            for uid in members[gid]:
+                for w in range(spec.focus_weeks):
+                    sid = self.uid()
+                    week = last_week - timedelta(weeks=spec.focus_weeks - 1 - w)
+                    snapshots.append((sid, uid, gid, week, w == spec.focus_weeks - 1))
+                    items.extend(
+                        (self.uid(), sid, rng.choice(FOCUS_PRIORITIES), f"Gen account {rng.randrange(10000)}",
+                         rng.randrange(1, 200) * 1000, rng.choice(PIPELINE_STATUSES), i)
+                        for i in range(spec.focus_items))
+        out["focus_snapshots"] = (("id", "user_id", "group_id", "week_date", "is_current"), snapshots)
+        out["focus_items"] = (("id", "snapshot_id", "priority", "company_subject", "prospect_value",
+                               "pipeline_status", "sort_order"), items)
+
+        if scorecard:
+            self._build_scorecard(out, quarter_starts, last_week)
+        return out
+
+    def _build_scorecard(self, out: dict, quarter_starts: list, last_week: date):
+        spec, rng = self.spec, self.rng
+        templates, sections, measures, goals, entries = [], [], [], [], []
+        last_friday = last_week + timedelta(days=4)
+        for gid in self.group_ids:
+            tid, sid = self.uid(), self.uid()
+            templates.append((tid, gid, "Gen Scorecard"))
+            sections.append((sid, tid, "Gen Team", 0, "team_pipeline"))
+            lead = self.members[gid][0]
+            for m in range(spec.measures_per_group):
+                mid = self.uid()
+                measures.append((mid, sid, f"Gen measure {m + 1}", m, rng.choice(MEASURE_TYPES),
+                                 rng.choice(self.members[gid])))
+                goals.extend((self.uid(), mid, f"{start.year}-Q{(start.month - 1) // 3 + 1}",
+                              rng.randrange(1, 100), lead) for start in quarter_starts)
+                for uid in self.members[gid]:
+                    entries.extend(
+                        (self.uid(), mid, uid, last_friday - timedelta(weeks=w), rng.randrange(0, 50))
+                        for w in range(spec.scorecard_weeks))
+        out["scorecard_templates"] = (("id", "group_id", "name"), templates)
+        out["scorecard_sections"] = (("id", "template_id", "name", "display_order", "section_type"), sections)
+        out["scorecard_measures"] = (("id", "section_id", "name", "display_order", "data_type",
+                                      "owner_user_id"), measures)
+        out["scorecard_goals"] = (("id", "measure_id", "quarter", "goal_value", "set_by"), goals)
+        out["scorecard_entries"] = (("id", "measure_id", "user_id", "week_ending", "value"), entries)
+
+
+def _add_months(day: date, months: int) -> date:
+    month = day.month - 1 + months
+    return date(day.year + month // 12, month % 12 + 1, 1)
+
+
+def _psycopg():
+    try:
+        import psycopg
+    except ImportError as e:
+        raise ImportError('tenant_gen.py needs psycopg: pip install "psycopg[binary]"') from e
+    return psycopg
+
+
+def has_scorecard(conn) -> bool:
+    return conn.execute("SELECT to_regclass('public.scorecard_entries') IS NOT NULL").fetchone()[0]
+
+
+def drop_tenant(conn) -> int:
+    """Delete the generated tenant; -> groups removed."""
+    with conn.transaction():
+        group_ids = conn.execute(
+            "SELECT coalesce(array_agg(id), '{}') FROM groups WHERE description = %s", (GEN_TAG,)).fetchone()[0]
+        # focus_items and milestones cascade; scorecard tables and memberships
+        # cascade from groups once nothing else references them
+        for table in ("focus_snapshots", "rock_ideas", "rocks"):
+            conn.execute(f"DELETE FROM {table} WHERE group_id = ANY(%s::uuid[])", (group_ids,))
+        conn.execute("DELETE FROM groups WHERE id = ANY(%s::uuid[])", (group_ids,))
+        # profiles cascade from auth.users
+        conn.execute("DELETE FROM auth.users WHERE email LIKE %s", (f"%@{GEN_EMAIL_DOMAIN}",))
+        conn.execute("DELETE FROM quarters WHERE label LIKE %s", (f"{GEN_QUARTER_PREFIX}%",))
+    return len(group_ids)
+
+
+def copy_rows(conn, table: str, columns: tuple, rows: list):
+    with conn.cursor().copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+        for row in rows:
+            copy.write_row(row)
+
+
+def assign_roles(conn, user_ids: list, seed: int):
+    """Give roughly 5% of users the executive and 5% the group_admin role."""
+    rng = random.Random(seed)
+    roles = [("executive" if r < 0.05 else "group_admin" if r < 0.10 else "team_member")
+             for r in (rng.random() for _ in user_ids)]
+    conn.execute(
+        "UPDATE profiles p SET role = t.role FROM unnest(%s::uuid[], %s::text[]) AS t(id, role) "
+        "WHERE p.id = t.id AND t.role <> 'team_member'",
+        (user_ids, roles))
+
+
+def attach_existing(conn, group_ids: list, per_user: int, seed: int) -> int:
+    """Add every non-generated profile to `per_user` generated groups; -> memberships added."""
+    rng = random.Random(seed)
+    existing = [r[0] for r in conn.execute(
+        "SELECT id FROM profiles WHERE email NOT LIKE %s ORDER BY id", (f"%@{GEN_EMAIL_DOMAIN}",))]
+    rows = [(uid, gid) for uid in existing for gid in rng.sample(group_ids, min(per_user, len(group_ids)))]
+    copy_rows(conn, "group_members", ("user_id", "group_id"), rows)
+    return len(rows)
+
+
+def generate(spec: TenantSpec, seed: int = 0, dsn: str = PG_DSN, attach: int = 0,
+             progress: bool = True) -> dict:
+    """Replace the generated tenant with one built from spec and seed; -> {table: rows}."""
+    psycopg = _psycopg()
+    counts = {}
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        scorecard = has_scorecard(conn)
+        if not scorecard and progress:
+            print("  scorecard tables missing (scripts/scorecard-schema.sql): skipping scorecard data")
+        gen = Generator(spec, seed)
+        tables = gen.build(scorecard)
+        dropped = drop_tenant(conn)
+        if dropped and progress:
+            print(f"  removed previous generated tenant ({dropped} groups)")
+        with conn.transaction():
+            for table, (columns, rows) in tables.items():
+                start = time.perf_counter()
+                copy_rows(conn, table, columns, rows)
+                counts[table] = len(rows)
+                if progress:
+                    print(f"  {table:<22}{len(rows):>10} rows  {time.perf_counter() - start:>7.2f}s")
+            assign_roles(conn, gen.user_ids, seed)
+            if attach:
+                counts["group_members (attached)"] = attach_existing(conn, gen.group_ids, attach, seed)
+        conn.execute("ANALYZE")  # fresh planner statistics for the new data volume
+    return counts
+
+
+def main():
+    demo = TenantSpec()
+    parser = argparse.ArgumentParser(description="Bulk-load a deterministic synthetic tenant")
+    parser.add_argument("--dsn", default=PG_DSN, help="Postgres DSN (default: RLS_PG_DSN or local supabase)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=int, default=1, help="multiply users and groups of the spec")
+    for name in TenantSpec.__slots__:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=getattr(demo, name))
+    parser.add_argument("--attach", type=int, default=0, metavar="N",
+                        help="also add every existing user to N generated groups")
+    parser.add_argument("--drop", action="store_true", help="remove the generated tenant and exit")
+    args = parser.parse_args()
+
+    if args.drop:
+        with _psycopg().connect(args.dsn, autocommit=True) as conn:
+            print(f"Removed {drop_tenant(conn)} generated groups")
+        return
+
+    spec = TenantSpec(**{name: getattr(args, name) for name in TenantSpec.__slots__}).scaled(args.scale)
+    print(f"Generating tenant (seed {args.seed}): {spec.as_dict()}")
+    start = time.perf_counter()
+    counts = generate(spec, args.seed, args.dsn, args.attach)
+    print(f"\nLoaded {sum(counts.values())} rows in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
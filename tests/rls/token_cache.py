@@ -0,0 +1,142 @@
+"""
+Session Token Cache
+===================
+Keeps GoTrue sessions per email so repeated runs skip the
+generate_link + verify round-trips.
+
+A cached access_token is reused while it has more than `refresh_margin`
+seconds left. Closer to expiry the session is renewed through the
+refresh_token grant; only when that fails (or nothing is cached) does
+the caller's login function run the magic-link flow. Sessions can be
+persisted to a JSON file, which is scoped to one SUPABASE_URL.
+
+aget() is the same lookup for asyncio callers, with coroutine login and
+refresh functions; both share one session store and counters. Its
+per-email locks are kept per event loop, so the cache survives repeated
+asyncio.run() calls.
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+import weakref
+
+
+def session_expiry(session: dict) -> float:
+    """Absolute expiry (unix seconds) of a GoTrue session."""
+    if session.get("expires_at"):
+        return float(session["expires_at"])
+    return time.time() + float(session.get("expires_in", 3600))
+
+
+class TokenCache:
+    """Email -> session cache with expiry-aware refresh and optional file backing."""
+
+    def __init__(self, base_url: str, path: str = None, refresh_margin: int = 60):
+        self.base_url = base_url
+        self.path = path
+        self.refresh_margin = refresh_margin
+        self.sessions = {}
+        self.hits = 0
+        self.refreshes = 0
+        self.logins = 0
+        self._lock = threading.Lock()
+        self._email_locks = {}
+        self._async_locks = weakref.WeakKeyDictionary()  # event loop -> {email: asyncio.Lock}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if stored.get("url") == self.base_url:
+            self.sessions = stored.get("sessions", {})
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"url": self.base_url, "sessions": self.sessions}, f)
+        os.replace(tmp, self.path)
+
+    def _email_lock(self, email: str) -> threading.Lock:
+        with self._lock:
+            return self._email_locks.setdefault(email, threading.Lock())
+
+    def _async_lock(self, email: str) -> asyncio.Lock:
+        """Per-email lock of the running event loop; a lock cannot be shared across loops."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            return self._async_locks.setdefault(loop, {}).setdefault(email, asyncio.Lock())
+
+    def _count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _store(self, email: str, session: dict):
+        session = dict(session, expires_at=session_expiry(session))
+        with self._lock:
+            self.sessions[email] = session
+            self._save()
+        return session
+
+    def get(self, email: str, login, refresh) -> dict:
+        """
+        Return a usable session for `email`.
+        `login(email)` runs the full magic-link flow; `refresh(refresh_token)`
+        exchanges a refresh token and may raise on failure.
+        """
+        with self._email_lock(email):
+            session = self.sessions.get(email)
+            if session and session["expires_at"] - time.time() > self.refresh_margin:
+                self._count("hits")
+                return session
+
+            if session and session.get("refresh_token"):
+                try:
+                    renewed = refresh(session["refresh_token"])
+                except Exception:
+                    renewed = None
+                if renewed:
+                    self._count("refreshes")
+                    return self._store(email, renewed)
+
+            self._count("logins")
+            return self._store(email, login(email))
+
+    async def aget(self, email: str, login, refresh) -> dict:
+        """get() for asyncio: `login` and `refresh` are coroutine functions."""
+        async with self._async_lock(email):
+            session = self.sessions.get(email)
+            if session and session["expires_at"] - time.time() > self.refresh_margin:
+                self._count("hits")
+                return session
+
+            if session and session.get("refresh_token"):
+                try:
+                    renewed = await refresh(session["refresh_token"])
+                except Exception:
+                    renewed = None
+                if renewed:
+                    self._count("refreshes")
+                    return self._store(email, renewed)
+
+            self._count("logins")
+            return self._store(email, await login(email))
+
+    def invalidate(self, email: str):
+        with self._lock:
+            if self.sessions.pop(email, None) is not None:
+                self._save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "refreshes": self.refreshes, "logins": self.logins}
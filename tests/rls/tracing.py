@@ -0,0 +1,352 @@
+"""
+Request Tracing
+===============
+Instrumentation surface for every request HttpPool and AsyncHttpPool send
+(SupabaseClient, AsyncSupabaseClient and the admin helpers all go through
+them).
+
+Hooks are plain callables registered on the process-wide `tracer`:
+pre-hooks get the RequestEvent before it is sent, post-hooks get it back
+with the status, bytes, PostgREST Server-Timing phases and wall time
+filled in. With no hooks registered the pools skip tracing entirely.
+
+Exporters are post-hooks that write a run to disk:
+
+    ChromeTraceExporter  one JSON file for chrome://tracing or Perfetto,
+                         one lane per worker thread
+    JsonLinesExporter    one JSON object per request, written as it ends
+
+SlowestQueries keeps the N slowest table reads and, at the end of the run,
+asks the service-role rls_explain() RPC (scripts/rls-explain.sql) for an
+EXPLAIN (ANALYZE) plan of each, replayed with the caller's JWT claims so
+the plan includes the RLS predicates. The node with the largest self time
+is reported with its filter, which is usually the policy predicate that
+dominates.
+
+    python run_rls_tests.py --trace run.json                 # Chrome trace
+    python run_rls_tests.py --trace run.jsonl --explain-slowest 5
+"""
+
+import base64
+import heapq
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pgrest_sql import postgrest_to_sql
+from result_collector import table_from_url
+
+
+class RequestEvent:
+    """One HTTP request: what was asked, by whom, and what came back."""
+
+    __slots__ = ("method", "url", "table", "role", "user", "suite", "thread", "start", "wall",
+                 "status", "bytes_sent", "bytes_received", "server_timing", "error", "auth", "plan")
+
+    def __init__(self, method: str, url: str, headers: dict, body):
+        claims = jwt_claims(headers)
+        context = _context()
+        self.method = method
+        self.url = url
+        self.table = table_from_url(url)
+        self.role = context.get("role") or claims.get("role")
+        self.user = claims.get("email") or claims.get("sub")
+        self.suite = context.get("suite")
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.wall = None
+        self.status = None
+        self.bytes_sent = len(json.dumps(body).encode()) if body is not None else 0
+        self.bytes_received = None
+        self.server_timing = {}
+        self.error = None
+        self.auth = (headers or {}).get("Authorization")
+        self.plan = None
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__ if k != "auth"}
+
+
+def jwt_claims(headers: dict) -> dict:
+    """Unverified payload of the bearer token in headers ({} when absent or opaque)."""
+    token = (headers or {}).get("Authorization", "").removeprefix("Bearer ")
+    parts = token.split(".")
+    if len(parts) != 3:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(parts[1] + "=" * (-len(parts[1]) % 4)))
+    except ValueError:
+        return {}
+
+
+def parse_server_timing(header: str) -> dict:
+    """'jwt;dur=1.2, plan;dur=3.4' -> {'jwt': 1.2, 'plan': 3.4} (milliseconds)."""
+    phases = {}
+    for metric in filter(None, (m.strip() for m in (header or "").split(","))):
+        name, *params = (p.strip() for p in metric.split(";"))
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                try:
+                    phases[name] = float(value)
+                except ValueError:
+                    pass
+    return phases
+
+
+def _body_size(resp) -> int:
+    content = getattr(resp, "content", None)
+    if content is not None:
+        return len(content)
+    return len((getattr(resp, "text", None) or "").encode())
+
+
+# -- Context labels (role, suite) for the calling thread --
+
+_local = threading.local()
+
+
+def _context() -> dict:
+    return getattr(_local, "context", {})
+
+
+@contextmanager
+def context(**labels):
+    """Label every request the calling thread makes inside the block."""
+    previous = _context()
+    _local.context = dict(previous, **labels)
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+# -- Tracer --
+
+class Tracer:
+    """Pre/post request hooks, shared by every pool in the process."""
+
+    def __init__(self):
+        self.pre_hooks = []
+        self.post_hooks = []
+        self._suspended = threading.local()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.pre_hooks or self.post_hooks) and not getattr(self._suspended, "on", False)
+
+    def add_hook(self, pre=None, post=None):
+        if pre:
+            self.pre_hooks.append(pre)
+        if post:
+            self.post_hooks.append(post)
+
+    def remove_hook(self, hook):
+        for hooks in (self.pre_hooks, self.post_hooks):
+            if hook in hooks:
+                hooks.remove(hook)
+
+    @contextmanager
+    def suspended(self):
+        """Requests the calling thread makes inside the block are not traced."""
+        self._suspended.on = True
+        try:
+            yield
+        finally:
+            self._suspended.on = False
+
+    def start(self, method: str, url: str, headers: dict = None, body=None) -> RequestEvent:
+        event = RequestEvent(method, url, headers, body)
+        for hook in self.pre_hooks:
+            hook(event)
+        event.wall = time.perf_counter()
+        return event
+
+    def finish(self, event: RequestEvent, resp=None, error: Exception = None):
+        event.wall = time.perf_counter() - event.wall
+        if resp is not None:
+            event.status = resp.status_code
+            event.bytes_received = _body_size(resp)
+            event.server_timing = parse_server_timing(resp.headers.get("Server-Timing"))
+        if error is not None:
+            event.error = f"{type(error).__name__}: {error}"
+        for hook in self.post_hooks:
+            hook(event)
+
+
+tracer = Tracer()
+
+
+# -- Exporters --
+
+class JsonLinesExporter:
+    """Appends one JSON object per finished request to `path`."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w")
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent):
+        line = json.dumps(event.as_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def write_plans(self, events: list):
+        with self._lock:
+            for e in events:
+                self._file.write(json.dumps({"explain": e.url, "role": e.role, "wall": e.wall,
+                                             "plan": e.plan}, default=str) + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ChromeTraceExporter:
+    """Collects complete ("X") events and writes the Trace Event Format file on close()."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent):
+        with self._lock:
+            self.threads.setdefault(event.thread, len(self.threads) + 1)
+            self.events.append(event)
+
+    def write_plans(self, events: list):
+        pass  # plans are attached to the events and written by close()
+
+    def close(self):
+        with self._lock:
+            events, threads = list(self.events), dict(self.threads)
+        origin = min((e.start for e in events), default=0.0)
+        trace = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                 for name, tid in threads.items()]
+        for e in events:
+            args = {k: v for k, v in e.as_dict().items() if v not in (None, {}) and k not in ("start", "wall")}
+            trace.append({
+                "name": f"{e.method} {e.table}",
+                "cat": e.role or "unknown",
+                "ph": "X",
+                "ts": (e.start - origin) * 1e6,
+                "dur": (e.wall or 0.0) * 1e6,
+                "pid": os.getpid(),
+                "tid": threads[e.thread],
+                "args": args,
+            })
+        with open(self.path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def exporter_for(path: str):
+    """ChromeTraceExporter for .json, JsonLinesExporter for anything else (.jsonl)."""
+    return ChromeTraceExporter(path) if path.endswith(".json") else JsonLinesExporter(path)
+
+
+# -- EXPLAIN (ANALYZE) of the slowest reads --
+
+def dominant_node(plan: dict) -> dict:
+    """Plan node with the largest self time (its own time minus its children's)."""
+    best, best_self = plan, -1.0
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        children = node.get("Plans", [])
+        loops = node.get("Actual Loops", 1) or 1
+        own = node.get("Actual Total Time", 0.0) * loops - sum(
+            c.get("Actual Total Time", 0.0) * (c.get("Actual Loops", 1) or 1) for c in children)
+        if own > best_self:
+            best, best_self = node, own
+        stack.extend(children)
+    return dict(best, **{"Self Time": best_self})
+
+
+class SlowestQueries:
+    """Post-hook keeping the `n` slowest user-role table reads for explain()."""
+
+    def __init__(self, n: int = 10):
+        self.n = n
+        self._heap = []    # (wall, seq, event)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, event: RequestEvent):
+        if event.wall is None or event.role == "service_role" or postgrest_to_sql(event.method, event.url) is None:
+            return
+        with self._lock:
+            self._seq += 1
+            item = (event.wall, self._seq, event)
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, item)
+            elif item > self._heap[0]:
+                heapq.heapreplace(self._heap, item)
+
+    def events(self) -> list:
+        with self._lock:
+            return [e for _, _, e in sorted(self._heap, reverse=True)]
+
+    def explain(self) -> list:
+        """Attach an EXPLAIN (ANALYZE) plan to each kept event via rls_explain(); -> events."""
+        from supabase_client import admin_rpc
+
+        events = self.events()
+        with tracer.suspended():
+            for e in events:
+                claims = jwt_claims({"Authorization": e.auth})
+                try:
+                    result = admin_rpc("rls_explain", {"p_claims": claims,
+                                                       "p_query": postgrest_to_sql(e.method, e.url)})
+                    e.plan = result[0] if isinstance(result, list) else result
+                except Exception as err:
+                    e.plan = {"error": str(err)}
+        return events
+
+
+def print_slowest(events: list):
+    print("\nSlowest reads (EXPLAIN ANALYZE via rls_explain)")
+    for e in events:
+        print(f"  {e.wall * 1000:>8.1f} ms  {e.role or '?':<14}{e.method} {e.table}  [{e.suite or '-'}]")
+        plan = (e.plan or {}).get("Plan")
+        if not plan:
+            print(f"              no plan: {(e.plan or {}).get('error', 'not explained')}")
+            continue
+        node = dominant_node(plan)
+        where = node.get("Filter") or node.get("Index Cond") or node.get("Recheck Cond") or ""
+        print(f"              server {e.plan.get('Execution Time', 0.0):.1f} ms; "
+              f"hottest node {node['Node Type']}"
+              f"{' on ' + node['Relation Name'] if node.get('Relation Name') else ''} "
+              f"({node['Self Time']:.1f} ms self)")
+        if where:
+            print(f"              {where[:160]}")
+
+
+# -- Run-level setup used by run_rls_tests.py --
+
+class RunTrace:
+    """Exporter and optional slow-query explainer installed for one run."""
+
+    def __init__(self, path: str = None, explain_slowest: int = 0):
+        self.exporter = exporter_for(path) if path else None
+        self.slowest = SlowestQueries(explain_slowest) if explain_slowest else None
+        for hook in (self.exporter, self.slowest):
+            if hook:
+                tracer.add_hook(post=hook)
+
+    def close(self):
+        for hook in (self.exporter, self.slowest):
+            if hook:
+                tracer.remove_hook(hook)
+        if self.slowest:
+            events = self.slowest.explain()
+            print_slowest(events)
+            if self.exporter:
+                self.exporter.write_plans(events)
+        if self.exporter:
+            self.exporter.close()
+            print(f"Trace: wrote {self.exporter.path}")